@@ -4,9 +4,20 @@ import os
 
 # Database settings
 DATABASE_PATH = "patents.db"
+PATENT_REFRESH_DAYS = 30  # stored patents older than this get their citations re-fetched
 
 # NER Model settings
 NER_MODEL_PATH = "./ner_results/saved_model"
+NER_ENCODER_NAME = "dmis-lab/biobert-v1.1"
+NER_CHECKPOINT_PATH = "model/ner_model.pt"  # fine-tuned weights
+NER_SNAPSHOT_DIR = "model/ner_snapshot"  # memory-mappable copy of the weights, with the encoder config and tokenizer
+NER_CHUNK_SIZE = 512  # tokens per encoder pass; longer texts are split into overlapping chunks
+NER_BATCH_SIZE = 16  # most chunks, from any number of texts, run through the encoder at once
+NER_BATCH_TOKENS = 8192  # most padded tokens per batch; tune with python -m src.ner.batching
+NER_BACKEND = os.environ.get("PATENTS_NER_BACKEND", "torch")  # torch (fp32), int8 or onnx; see src/ner/backends.py
+NER_F1_TOLERANCE = 0.01  # most entity F1 a backend may lose against fp32 on chemu_sample/ner
+NER_WORKERS = 0  # processes running NER batches; 0 runs them in the main process
+NER_WORKER_THREADS = 0  # torch threads per NER worker; 0 splits the cores evenly between workers
 ENTITY_TYPES = [
     "STARTING_MATERIAL", "REAGENT_CATALYST", "REACTION_PRODUCT", "SOLVENT", 
     "OTHER_COMPOUND", "TIME", "TEMPERATURE", "YIELD_PERCENT", "YIELD_OTHER", 
@@ -30,6 +41,77 @@ ENTITY_STYLES = {
 # Scraping settings
 DEFAULT_PATENT_LIMIT = 10
 SCRAPING_DELAY = 2  # seconds between requests
+SCRAPING_RATE = 1 / SCRAPING_DELAY  # sustained requests per second to Google Patents
+SCRAPING_BURST = 3  # requests allowed back-to-back before the rate applies
+SCRAPING_MIN_RATE = 0.05  # the adaptive rate never drops below this (requests per second)
+SCRAPING_MAX_RATE = 2.0  # ...nor rises above this while responses are healthy
+SCRAPING_RATE_INCREASE = 0.02  # requests per second added after each healthy response
+SCRAPING_RATE_DECREASE = 0.5  # rate multiplier after a 429/503
+CIRCUIT_BREAKER_THRESHOLD = 3  # consecutive 429/503 responses that pause the crawl
+CIRCUIT_BREAKER_COOLDOWN = 30  # seconds of the first pause; doubled on every consecutive trip
+CIRCUIT_BREAKER_MAX_COOLDOWN = 600
+SCRAPING_MAX_WORKERS = 4  # concurrent patent page requests
+LANGDETECT_SEED = 0  # makes the fallback language detector deterministic
+SEARCH_PREFETCH_PAGES = 1  # search result pages fetched ahead of the one being processed
+SEARCH_OR_QUERIES = True  # merge the keywords of a tendency bucket into OR-queries
+SEARCH_MAX_OR_TERMS = 8  # keywords per OR-query
+SEARCH_MAX_PAGES = 3  # search result pages read per planned tendency search
+SEARCH_DATE_TYPE = "publication"  # date that before/after search filters apply to: priority, filing or publication
+PATENT_HTML_PARSER = "lxml"  # falls back to html.parser when lxml is not installed
+PARSE_WORKERS = 0  # processes parsing patent pages; 0 parses them in the main process
+PARSE_CHUNKSIZE = 4  # patent pages sent to a parse process at a time
+
+# LLM summary settings
+OLLAMA_MODEL = "qwen2.5:7b"
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434")
+SUMMARY_CONCURRENCY = 2  # generations in flight at once; match OLLAMA_NUM_PARALLEL on the server
+SUMMARY_TIMEOUT = 600  # seconds without any data from the server before a request fails
+SUMMARY_DEADLINE = 300  # seconds a single generation may stream before it is abandoned
+SUMMARY_MAX_TOKENS = 512  # output token budget of a generation (num_predict)
+SUMMARY_ERROR_PREFIX = "Error generating summary"  # legacy failed summaries stored with this prefix are retried
+SUMMARY_DONE = "done"  # summary_status values of patents
+SUMMARY_FAILED = "failed"
+SUMMARY_TIMED_OUT = "timeout"
+SUMMARY_METRICS_PATH = os.environ.get("PATENTS_LLM_METRICS",
+                                      os.path.join(os.path.dirname(DATABASE_PATH), "llm_metrics.jsonl"))
+SUMMARY_NUM_CTX = 8192  # context window requested from the model, in tokens
+SUMMARY_RESPONSE_TOKENS = 1024  # part of the context window kept free for the generated summary
+SUMMARY_CHARS_PER_TOKEN = 4  # rough characters per token, for budgeting prompts without a tokenizer
+SUMMARY_CHUNK_TOKENS = 3000  # texts too long for one prompt are summarized in chunks of this size
+SUMMARY_MAX_CHUNKS = 16  # chunks beyond this are discarded (and counted as such)
+SUMMARY_SKIP_SECTIONS = ("cross-reference", "cross reference", "related application",
+                         "description of the drawings", "description of drawings",
+                         "incorporation by reference", "federally sponsored")  # boilerplate full text sections
+SUMMARY_CACHE_PATH = os.path.join(os.path.dirname(DATABASE_PATH), "summary_cache.db")
+SUMMARY_CACHE_ENABLED = os.environ.get("PATENTS_SUMMARY_CACHE", "1") != "0"
+SUMMARY_CACHE_MAX_AGE_DAYS = 365  # summaries unused for longer are evicted
+SUMMARY_CACHE_MAX_MB = 100  # least recently used summaries are evicted above this size
+NER_CACHE_PATH = os.path.join(os.path.dirname(DATABASE_PATH), "ner_cache.db")
+NER_CACHE_ENABLED = os.environ.get("PATENTS_NER_CACHE", "1") != "0"
+NER_CACHE_MAX_AGE_DAYS = 365  # entities unused for longer are evicted
+NER_CACHE_MAX_MB = 200  # least recently used entities are evicted above this size
+
+# HTTP session settings
+GOOGLE_PATENTS_URL = os.environ.get("PATENTS_BASE_URL", "https://patents.google.com").rstrip("/")  # e.g. a local stand-in server
+HTTP_TIMEOUT = (5, 30)  # (connect, read) seconds per request
+HTTP_RETRIES = 4
+HTTP_BACKOFF_FACTOR = 1.0  # seconds; doubled on every retry
+HTTP_BACKOFF_JITTER = 0.5  # seconds of random jitter added to each backoff
+HTTP_RETRY_STATUSES = (500, 502, 504)  # retried by the session itself
+HTTP_THROTTLE_STATUSES = (429, 503)  # retried through the adaptive rate limiter
+
+# HTTP cache settings
+HTTP_CACHE_DIR = ".http_cache"
+HTTP_CACHE_ENABLED = os.environ.get("PATENTS_HTTP_CACHE", "1") != "0"
+HTTP_CACHE_OFFLINE = os.environ.get("PATENTS_OFFLINE", "0") == "1"  # serve only from the cache
+HTTP_CACHE_TTL = {
+    "query": 24 * 3600,  # search result pages change daily
+    "patent": 30 * 24 * 3600,  # patent pages rarely change, except citation counts
+}
+
+# Google Patents stand-in server (offline benchmarks)
+STANDIN_FIXTURES_DIR = "fixtures/google_patents"
+STANDIN_PAGE_SIZE = 10  # results per synthesized search page
 
 # Report settings
 REPORTS_OUTPUT_DIR = "reports_output"
@@ -3,11 +3,17 @@
 from .models import create_database, get_database_info
 from .operations import (
     insert_patent, insert_ner_results, get_patents, 
-    get_ner_results, get_patents_with_ner, get_database_stats
+    get_ner_results, get_patents_with_ner, get_database_stats,
+    get_known_patents, refresh_patent, update_patent_summary,
+    get_patents_without_summary, get_unsummarized_patents, get_ner_keys
 )
+from .journal import CrawlJournal
+from .lru_cache import SQLiteLRUCache
 
 __all__ = [
     'create_database', 'get_database_info', 'insert_patent', 
     'insert_ner_results', 'get_patents', 'get_ner_results', 
-    'get_patents_with_ner', 'get_database_stats'
+    'get_patents_with_ner', 'get_database_stats', 'get_known_patents',
+    'refresh_patent', 'update_patent_summary', 'get_patents_without_summary',
+    'get_unsummarized_patents', 'get_ner_keys', 'CrawlJournal', 'SQLiteLRUCache'
 ]
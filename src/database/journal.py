@@ -0,0 +1,104 @@
+"""Crawl journal for resuming interrupted fetch and tendency runs."""
+
+import hashlib
+import json
+import sqlite3
+from typing import Any, Dict, Iterable, Optional
+from ..config import DATABASE_PATH
+from .models import create_journal_tables
+
+# Per-patent states, in pipeline order
+DISCOVERED = "discovered"
+FETCHED = "fetched"
+FILTERED = "filtered"
+KNOWN = "known"
+NER_DONE = "ner_done"
+
+class CrawlJournal:
+    """Journal of one crawl, identified by its kind and query arguments.
+    
+    Opening a journal for the same arguments as an unfinished run resumes it:
+    its cursor (e.g. the next search page) and per-patent states and data are
+    available again. Once a run is marked complete, the next run with the
+    same arguments starts from scratch.
+    """
+    def __init__(self, kind: str, query: Dict[str, Any], db_path: str = DATABASE_PATH):
+        self.kind = kind
+        self.query = query
+        self.db_path = db_path
+        self.run_key = hashlib.sha1(json.dumps([kind, query], sort_keys=True).encode("utf-8")).hexdigest()
+        
+        conn = sqlite3.connect(self.db_path)
+        create_journal_tables(conn)
+        c = conn.cursor()
+        c.execute("SELECT cursor, status FROM crawl_runs WHERE run_key = ?", (self.run_key,))
+        row = c.fetchone()
+        self.resumed = row is not None and row[1] != "completed"
+        if self.resumed:
+            self.cursor = json.loads(row[0] or "{}")
+        else:
+            self.cursor = {}
+            c.execute("DELETE FROM crawl_patents WHERE run_key = ?", (self.run_key,))
+            c.execute('''INSERT OR REPLACE INTO crawl_runs
+                         (run_key, kind, query, cursor, status, started_date, updated_date)
+                         VALUES (?, ?, ?, '{}', 'running', datetime('now'), datetime('now'))''',
+                      (self.run_key, kind, json.dumps(query, sort_keys=True)))
+        conn.commit()
+        conn.close()
+    
+    def save_cursor(self, **values) -> None:
+        """Merge values into the run cursor and persist it."""
+        self.cursor.update(values)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE crawl_runs SET cursor = ?, updated_date = datetime('now') WHERE run_key = ?",
+                     (json.dumps(self.cursor), self.run_key))
+        conn.commit()
+        conn.close()
+    
+    def record(self, patent_number: str, state: str, data: Optional[Dict[str, Any]] = None,
+               bucket: str = "") -> None:
+        """Record the state of a patent; data, when given, replaces the stored data."""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''INSERT INTO crawl_patents (run_key, bucket, patent_number, state, data, updated_date)
+                        VALUES (?, ?, ?, ?, ?, datetime('now'))
+                        ON CONFLICT (run_key, bucket, patent_number) DO UPDATE SET
+                        state = excluded.state,
+                        data = COALESCE(excluded.data, crawl_patents.data),
+                        updated_date = excluded.updated_date''',
+                     (self.run_key, bucket, patent_number, state,
+                      json.dumps(data) if data is not None else None))
+        conn.commit()
+        conn.close()
+    
+    def record_many(self, patent_numbers: Iterable[str], state: str, bucket: str = "") -> None:
+        """Record the same state for several patents, keeping their stored data."""
+        conn = sqlite3.connect(self.db_path)
+        conn.executemany('''INSERT INTO crawl_patents (run_key, bucket, patent_number, state, data, updated_date)
+                            VALUES (?, ?, ?, ?, NULL, datetime('now'))
+                            ON CONFLICT (run_key, bucket, patent_number) DO UPDATE SET
+                            state = excluded.state,
+                            updated_date = excluded.updated_date''',
+                         [(self.run_key, bucket, pn, state) for pn in patent_numbers])
+        conn.commit()
+        conn.close()
+    
+    def entries(self, states: Optional[Iterable[str]] = None, bucket: str = "") -> Dict[str, Dict[str, Any]]:
+        """Return {patent_number: {'state': ..., 'data': ...}} in recording order, optionally by state."""
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute('''SELECT patent_number, state, data FROM crawl_patents 
+                     WHERE run_key = ? AND bucket = ? ORDER BY rowid''', (self.run_key, bucket))
+        states = set(states) if states is not None else None
+        results = {pn: {'state': state, 'data': json.loads(data) if data else None}
+                   for pn, state, data in c.fetchall() if states is None or state in states}
+        conn.close()
+        return results
+    
+    def complete(self) -> None:
+        """Mark the run finished so the next run with the same arguments starts fresh."""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE crawl_runs SET status = 'completed', updated_date = datetime('now') WHERE run_key = ?",
+                     (self.run_key,))
+        conn.execute("DELETE FROM crawl_patents WHERE run_key = ?", (self.run_key,))
+        conn.commit()
+        conn.close()
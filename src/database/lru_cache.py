@@ -0,0 +1,156 @@
+"""Least-recently-used caches stored in SQLite, the base of the summary and NER caches.
+
+Each entry is a row holding a key computed by the subclass, the encoded value,
+its size in bytes, a use count and its creation and last-use dates, plus any
+columns the subclass adds (e.g. the model that produced the value). Entries
+unused for `max_age_days` are evicted, then the least recently used ones until
+the values fit in `max_mb`. Hits and misses are counted for the process and,
+in a second table, over the cache's lifetime.
+"""
+
+import sqlite3
+import threading
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+class SQLiteLRUCache:
+    """SQLite cache with use counts and age/size eviction.
+
+    Subclasses name the tables, the value column and their extra columns, and
+    override `encode`/`decode` for values that are not strings.
+    """
+    table: str = None
+    stats_table: str = None
+    value_column: str = "value"
+    # (name, SQL type) of the columns stored besides the key and value, and those to index
+    columns: Tuple[Tuple[str, str], ...] = ()
+    indexed: Tuple[str, ...] = ()
+
+    def __init__(self, path: str, enabled: bool = True, max_age_days: Optional[float] = None,
+                 max_mb: Optional[float] = None):
+        self.path = path
+        self.enabled = enabled
+        self.max_age_days = max_age_days
+        self.max_mb = max_mb
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if self.enabled:
+            columns = "".join(f"{name} {sql_type},\n" for name, sql_type in self.columns)
+            conn = self.connect()
+            conn.execute(f'''CREATE TABLE IF NOT EXISTS {self.table}
+                             (key TEXT PRIMARY KEY,
+                              {columns}{self.value_column} TEXT,
+                              size INTEGER,
+                              hits INTEGER DEFAULT 0,
+                              created_date TEXT,
+                              used_date TEXT)''')
+            for name in self.indexed:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_{name} ON {self.table} ({name})")
+            conn.execute(f'''CREATE TABLE IF NOT EXISTS {self.stats_table}
+                             (name TEXT PRIMARY KEY,
+                              value INTEGER)''')
+            conn.commit()
+            conn.close()
+
+    def connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path)
+
+    def encode(self, value: Any) -> str:
+        return value
+
+    def decode(self, stored: str) -> Any:
+        return stored
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Any]:
+        """Return the cached values of the keys that have one."""
+        if not self.enabled or not keys:
+            return {}
+        conn = self.connect()
+        found = {}
+        keys = list(dict.fromkeys(keys))
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            for key, value in conn.execute(f"SELECT key, {self.value_column} FROM {self.table} "
+                                           f"WHERE key IN ({placeholders})", chunk):
+                found[key] = self.decode(value)
+        conn.executemany(f"UPDATE {self.table} SET hits = hits + 1, used_date = datetime('now') WHERE key = ?",
+                         [(key,) for key in found])
+        with self.lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        conn.executemany(f'''INSERT INTO {self.stats_table} (name, value) VALUES (?, ?)
+                             ON CONFLICT (name) DO UPDATE SET value = value + excluded.value''',
+                         [("hits", len(found)), ("misses", len(keys) - len(found))])
+        conn.commit()
+        conn.close()
+        return found
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for a key, or None."""
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: Sequence[Tuple[str, Any]], **columns: Any) -> None:
+        """Store the values of several keys, with the same extra column values."""
+        if not self.enabled or not items:
+            return
+        names = [name for name, _ in self.columns]
+        rows = []
+        for key, value in items:
+            value = self.encode(value)
+            rows.append((key, *(columns.get(name) for name in names), value, len(value.encode("utf-8"))))
+        placeholders = ", ".join("?" * (len(names) + 3))
+        conn = self.connect()
+        conn.executemany(f'''INSERT OR REPLACE INTO {self.table}
+                             (key, {"".join(name + ", " for name in names)}{self.value_column}, size, hits,
+                              created_date, used_date)
+                             VALUES ({placeholders}, 0, datetime('now'), datetime('now'))''', rows)
+        conn.commit()
+        conn.close()
+
+    def put(self, key: str, value: Any, **columns: Any) -> None:
+        """Store the value of a key."""
+        self.put_many([(key, value)], **columns)
+
+    def evict(self) -> int:
+        """Drop entries unused for `max_age_days`, then least recently used ones above `max_mb`.
+
+        Returns the number of entries removed.
+        """
+        if not self.enabled:
+            return 0
+        conn = self.connect()
+        c = conn.cursor()
+        removed = 0
+        if self.max_age_days is not None:
+            c.execute(f"DELETE FROM {self.table} WHERE julianday('now') - julianday(used_date) > ?",
+                      (self.max_age_days,))
+            removed += c.rowcount
+        if self.max_mb is not None:
+            budget = int(self.max_mb * 1024 * 1024)
+            total = c.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+            if total > budget:
+                stale = []
+                for key, size in c.execute(f"SELECT key, size FROM {self.table} ORDER BY used_date, hits"):
+                    if total <= budget:
+                        break
+                    stale.append((key,))
+                    total -= size
+                c.executemany(f"DELETE FROM {self.table} WHERE key = ?", stale)
+                removed += len(stale)
+        conn.commit()
+        conn.close()
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters of this process and of the cache's lifetime, and its size."""
+        stats = {"hits": self.hits, "misses": self.misses}
+        if not self.enabled:
+            return stats
+        conn = self.connect()
+        totals = dict(conn.execute(f"SELECT name, value FROM {self.stats_table}").fetchall())
+        entries, size = conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}").fetchone()
+        conn.close()
+        stats.update({"total_hits": totals.get("hits", 0), "total_misses": totals.get("misses", 0),
+                      "entries": entries, "bytes": size})
+        return stats
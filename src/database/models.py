@@ -28,7 +28,10 @@ def create_database():
                   jurisdiction TEXT,
                   international_family TEXT,
                   citation_count INTEGER,
-                  ai_summary TEXT)''')
+                  ai_summary TEXT,
+                  summary_status TEXT,
+                  summary_error TEXT,
+                  ner_key TEXT)''')
     
     c.execute('''CREATE TABLE IF NOT EXISTS ner_results
                  (id INTEGER PRIMARY KEY,
@@ -42,9 +45,35 @@ def create_database():
                   FOREIGN KEY (patent_number) REFERENCES patents (patent_number))''')
     
     conn.commit()
+    create_journal_tables(conn)
     conn.close()
     migrate_database()
 
+def create_journal_tables(conn: sqlite3.Connection) -> None:
+    """Create the crawl journal tables used to resume interrupted runs."""
+    c = conn.cursor()
+    
+    c.execute('''CREATE TABLE IF NOT EXISTS crawl_runs
+                 (run_key TEXT PRIMARY KEY,
+                  kind TEXT,
+                  query TEXT,
+                  cursor TEXT,
+                  status TEXT,
+                  started_date TEXT,
+                  updated_date TEXT)''')
+    
+    c.execute('''CREATE TABLE IF NOT EXISTS crawl_patents
+                 (run_key TEXT,
+                  bucket TEXT,
+                  patent_number TEXT,
+                  state TEXT,
+                  data TEXT,
+                  updated_date TEXT,
+                  PRIMARY KEY (run_key, bucket, patent_number),
+                  FOREIGN KEY (run_key) REFERENCES crawl_runs (run_key))''')
+    
+    conn.commit()
+
 def migrate_database():
     """Ensure the patents table has all required columns."""
     conn = sqlite3.connect(DATABASE_PATH)
@@ -60,7 +89,10 @@ def migrate_database():
         "full_text": "TEXT",
         "jurisdiction": "TEXT",
         "international_family": "TEXT",
-        "citation_count": "INTEGER"
+        "citation_count": "INTEGER",
+        "summary_status": "TEXT",
+        "summary_error": "TEXT",
+        "ner_key": "TEXT"
     }
     
     for col, dtype in missing_columns.items():
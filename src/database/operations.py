@@ -3,7 +3,8 @@
 import sqlite3
 from datetime import datetime
 from typing import List, Dict, Any, Optional
-from ..config import DATABASE_PATH
+from ..config import (DATABASE_PATH, PATENT_REFRESH_DAYS, SUMMARY_ERROR_PREFIX, SUMMARY_DONE, SUMMARY_FAILED,
+                      SUMMARY_TIMED_OUT)
 
 def insert_patent(patent_data: Dict[str, Any], keyword: str, ipc_filter: str) -> bool:
     """Insert a patent into the database."""
@@ -32,13 +33,132 @@ def insert_patent(patent_data: Dict[str, Any], keyword: str, ipc_filter: str) ->
     finally:
         conn.close()
 
-def insert_ner_results(patent_number: str, entities: List[Dict[str, Any]]) -> bool:
-    """Insert NER results for a patent."""
+def get_known_patents(patent_numbers: List[str], 
+                      refresh_days: Optional[int] = PATENT_REFRESH_DAYS) -> Dict[str, Dict[str, Any]]:
+    """Look up which patents are already stored and whether they are due for a refresh.
+    
+    Returns {patent_number: {'fetch_date': ..., 'stale': bool}} for the stored ones.
+    With refresh_days=None stored patents are never considered stale.
+    """
+    known = {}
+    if not patent_numbers:
+        return known
+    
+    conn = sqlite3.connect(DATABASE_PATH)
+    c = conn.cursor()
+    
+    patent_numbers = list(patent_numbers)
+    for i in range(0, len(patent_numbers), 500):
+        chunk = patent_numbers[i:i + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        c.execute(f"""SELECT patent_number, fetch_date, julianday('now') - julianday(fetch_date)
+                      FROM patents 
+                      WHERE patent_number IN ({placeholders})""", chunk)
+        for patent_number, fetch_date, age_days in c.fetchall():
+            stale = refresh_days is not None and (age_days is None or age_days > refresh_days)
+            known[patent_number] = {'fetch_date': fetch_date, 'stale': stale}
+    
+    conn.close()
+    return known
+
+def refresh_patent(patent_data: Dict[str, Any]) -> bool:
+    """Update the citation data of a stored patent without touching its summary or NER results."""
+    conn = sqlite3.connect(DATABASE_PATH)
+    c = conn.cursor()
+    
+    try:
+        c.execute('''UPDATE patents 
+                     SET citation_count = ?, international_family = ?, fetch_date = datetime('now')
+                     WHERE patent_number = ?''',
+                  (patent_data.get("citation_count"), patent_data.get("international_family"),
+                   patent_data.get("patent_number")))
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Error refreshing patent: {e}")
+        return False
+    finally:
+        conn.close()
+
+def update_patent_summary(patent_number: str, ai_summary: str, status: str = SUMMARY_DONE) -> bool:
+    """Set the AI summary of a stored patent.
+
+    With a failure status (SUMMARY_FAILED, SUMMARY_TIMED_OUT), `ai_summary` is
+    the error message: it is kept in summary_error and the summary is left
+    empty, so reports never show it and get_patents_without_summary retries it.
+    """
+    conn = sqlite3.connect(DATABASE_PATH)
+    c = conn.cursor()
+    
+    try:
+        if status == SUMMARY_DONE:
+            c.execute('''UPDATE patents SET ai_summary = ?, summary_status = ?, summary_error = NULL
+                         WHERE patent_number = ?''', (ai_summary, status, patent_number))
+        else:
+            c.execute('''UPDATE patents SET ai_summary = NULL, summary_status = ?, summary_error = ?
+                         WHERE patent_number = ?''', (status, ai_summary, patent_number))
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Error updating summary: {e}")
+        return False
+    finally:
+        conn.close()
+
+def get_patents_without_summary(include_errors: bool = True, 
+                                limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Retrieve patents never summarized or, with include_errors, whose summary failed or timed out."""
+    conn = sqlite3.connect(DATABASE_PATH)
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    
+    query = '''SELECT patent_number, abstract, full_text, summary_status FROM patents
+               WHERE ((ai_summary IS NULL OR ai_summary = \'\') AND summary_status IS NULL)'''
+    params = []
+    if include_errors:
+        # Summaries that failed before failures had a status were stored as the error message
+        query += " OR summary_status IN (?, ?) OR ai_summary LIKE ?"
+        params.extend([SUMMARY_FAILED, SUMMARY_TIMED_OUT, f"{SUMMARY_ERROR_PREFIX}%"])
+    query += " ORDER BY fetch_date DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    
+    c.execute(query, params)
+    results = [dict(row) for row in c.fetchall()]
+    conn.close()
+    return results
+
+def get_unsummarized_patents(patent_numbers: List[str]) -> List[Dict[str, Any]]:
+    """Retrieve those of these patents never summarized, nor failed or timed out."""
+    results = []
+    if not patent_numbers:
+        return results
+    
+    conn = sqlite3.connect(DATABASE_PATH)
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    
+    patent_numbers = list(patent_numbers)
+    for i in range(0, len(patent_numbers), 500):
+        chunk = patent_numbers[i:i + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        c.execute(f"""SELECT patent_number, abstract, full_text FROM patents 
+                      WHERE patent_number IN ({placeholders}) 
+                      AND (ai_summary IS NULL OR ai_summary = '') AND summary_status IS NULL""", chunk)
+        results.extend(dict(row) for row in c.fetchall())
+    
+    conn.close()
+    return results
+
+def insert_ner_results(patent_number: str, entities: List[Dict[str, Any]], ner_key: Optional[str] = None) -> bool:
+    """Insert NER results for a patent, recording the NER cache key they came from."""
     conn = sqlite3.connect(DATABASE_PATH)
     c = conn.cursor()
     
     try:
         c.execute("DELETE FROM ner_results WHERE patent_number = ?", (patent_number,))
+        c.execute("UPDATE patents SET ner_key = ? WHERE patent_number = ?", (ner_key, patent_number))
         
         for entity in entities:
             c.execute('''INSERT INTO ner_results
@@ -56,6 +176,26 @@ def insert_ner_results(patent_number: str, entities: List[Dict[str, Any]]) -> bo
     finally:
         conn.close()
 
+def get_ner_keys(patent_numbers: List[str]) -> Dict[str, str]:
+    """NER cache keys of the stored entities of these patents, for those that have one."""
+    keys = {}
+    if not patent_numbers:
+        return keys
+    
+    conn = sqlite3.connect(DATABASE_PATH)
+    c = conn.cursor()
+    
+    patent_numbers = list(patent_numbers)
+    for i in range(0, len(patent_numbers), 500):
+        chunk = patent_numbers[i:i + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        c.execute(f"""SELECT patent_number, ner_key FROM patents 
+                      WHERE patent_number IN ({placeholders}) AND ner_key IS NOT NULL""", chunk)
+        keys.update(c.fetchall())
+    
+    conn.close()
+    return keys
+
 def get_patents(limit: int = 10, keyword: Optional[str] = None, 
                 ipc: Optional[str] = None) -> List[Dict[str, Any]]:
     """Retrieve patents from the database."""
@@ -138,6 +278,13 @@ def get_database_stats() -> Dict[str, Any]:
                  ORDER BY count DESC""")
     stats["entity_counts"] = c.fetchall()
     
+    c.execute("""SELECT COALESCE(summary_status, 'pending'), COUNT(*) as count 
+                 FROM patents 
+                 WHERE ai_summary IS NULL OR ai_summary = '' OR summary_status IS NOT NULL 
+                 GROUP BY summary_status 
+                 ORDER BY count DESC""")
+    stats["summary_status_counts"] = c.fetchall()
+    
     c.execute("SELECT MAX(fetch_date) FROM patents")
     stats["latest_fetch"] = c.fetchone()[0]
     
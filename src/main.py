@@ -2,46 +2,163 @@
 
 import argparse
 import os
+import time
 from typing import List, Optional
 
-from .config import DEFAULT_PATENT_LIMIT, REPORTS_OUTPUT_DIR
+from .config import (
+    DEFAULT_PATENT_LIMIT, REPORTS_OUTPUT_DIR, SCRAPING_MAX_WORKERS,
+    HTTP_CACHE_ENABLED, HTTP_CACHE_OFFLINE, PATENT_REFRESH_DAYS, PARSE_WORKERS, SEARCH_DATE_TYPE,
+    SUMMARY_CONCURRENCY, SUMMARY_DONE, OLLAMA_MODEL, NER_BATCH_SIZE, NER_BATCH_TOKENS, NER_BACKEND, NER_WORKERS
+)
 from .database import (
     create_database, insert_patent, insert_ner_results, 
-    get_patents_with_ner, get_database_stats
+    get_patents_with_ner, get_database_stats, refresh_patent,
+    update_patent_summary, get_patents_without_summary, get_unsummarized_patents, get_ner_keys
 )
-from .scraper import fetch_patents
-from .ner import Model
+from .database.journal import NER_DONE
+from .scraper import fetch_patents, open_fetch_journal, configure_http_cache, get_summary_cache
+from .scraper.llm_metrics import GenerationMetrics
+from .scraper.summarizer import SummaryWorker, summarize_patents, format_token_stats
+from .ner import get_ner_model, get_ner_cache, predict_cached
+from .ner.backends import BACKEND_NAMES
+from .ner.batching import format_padding_stats
+from .ner.pool import get_ner_pool
 from .reports import generate_patent_report
 from .utils import ensure_directory_exists
 
+def label_patents(patents: List[dict], keywords: str, ipc_filter: str, summary_worker: SummaryWorker,
+                  journal, ner_batch_size: int = NER_BATCH_SIZE, ner_batch_tokens: int = NER_BATCH_TOKENS,
+                  ner_backend: str = NER_BACKEND, ner_workers: int = NER_WORKERS) -> None:
+    """Store newly fetched patents, submit their summaries and run NER on their abstracts."""
+    model = get_ner_model(backend=ner_backend)
+    
+    # Store every patent first, so that their summaries are generated while NER runs
+    for patent in patents:
+        insert_patent(patent, keywords, ipc_filter)
+        print(f"Stored patent: {patent['patent_number']}")
+        if not patent.get("ai_summary"):
+            summary_worker.submit(patent['patent_number'], patent["abstract"], patent["full_text"])
+    
+    # Run NER on all abstracts at once, in batches of chunks, except those cached
+    ner_cache = get_ner_cache()
+    hits_before = ner_cache.hits
+    start = time.perf_counter()
+    ner_pool = get_ner_pool(ner_workers, backend=ner_backend) if ner_workers else None
+    try:
+        all_entities, ner_keys = predict_cached(model, [patent["abstract"] or "" for patent in patents],
+                                                ner_batch_size, ner_batch_tokens, ner_cache, ner_pool)
+    finally:
+        # Each worker holds a copy of the model; stop them rather than keep them until exit
+        if ner_pool is not None:
+            ner_pool.close()
+    elapsed = time.perf_counter() - start
+    entity_count = sum(len(entities) for entities in all_entities)
+    print(f"NER found {entity_count} entities in {len(patents)} abstracts in {elapsed:.1f}s "
+          f"({entity_count / max(elapsed, 1e-9):.1f} entities/s; {ner_cache.hits - hits_before} cached; "
+          f"{format_padding_stats(model.batch_stats)})")
+    
+    stored_keys = get_ner_keys([patent['patent_number'] for patent in patents])
+    for patent, entities, ner_key in zip(patents, all_entities, ner_keys):
+        if ner_key is not None and stored_keys.get(patent['patent_number']) == ner_key:
+            print(f"NER results unchanged for patent {patent['patent_number']}")
+        elif entities:
+            insert_ner_results(patent['patent_number'], entities, ner_key)
+            print(f"Stored {len(entities)} entities for patent {patent['patent_number']}")
+        else:
+            print(f"No entities found for patent {patent['patent_number']}")
+        journal.record(patent['patent_number'], NER_DONE)
+
 def fetch_and_process_patents(keywords: str, ipc_codes: Optional[List[str]] = None, 
                             limit: int = DEFAULT_PATENT_LIMIT, 
-                            fetch_full_text: bool = False) -> None:
-    """Fetch patents, run NER, and store results."""
+                            fetch_full_text: bool = False,
+                            max_workers: int = SCRAPING_MAX_WORKERS,
+                            refresh_days: Optional[int] = PATENT_REFRESH_DAYS,
+                            parse_workers: int = PARSE_WORKERS,
+                            after: Optional[str] = None, before: Optional[str] = None,
+                            date_type: str = SEARCH_DATE_TYPE,
+                            summary_concurrency: int = SUMMARY_CONCURRENCY,
+                            ner_batch_size: int = NER_BATCH_SIZE,
+                            ner_batch_tokens: int = NER_BATCH_TOKENS,
+                            ner_backend: str = NER_BACKEND,
+                            ner_workers: int = NER_WORKERS) -> None:
+    """Fetch patents, run NER, and store results.
+    
+    Patents are stored as soon as they are fetched; their AI summaries are
+    generated by a background SummaryWorker while NER runs, and written to
+    the database as they arrive.
+    
+    Progress is journaled, so rerunning the same command after an interruption
+    resumes it instead of starting over.
+    """
     print(f"Fetching patents for keywords: {keywords}")
+    journal = open_fetch_journal(keywords, ipc_codes, limit, fetch_full_text, after, before, date_type)
     
-    # Fetch patents
-    patents, ipc_filter = fetch_patents(keywords, ipc_codes, limit, fetch_full_text)
+    # Fetch patents (patents already in the database are skipped or only refreshed)
+    patents, ipc_filter = fetch_patents(keywords, ipc_codes, limit, fetch_full_text, max_workers,
+                                        refresh_days=refresh_days, journal=journal,
+                                        parse_workers=parse_workers, after=after, before=before,
+                                        date_type=date_type)
     print(f"Found {len(patents)} patents")
 
-    model = Model()
+    done = journal.entries([NER_DONE])
+    # A run interrupted while it waited on summaries left some NER_DONE patents unsummarized
+    unsummarized = get_unsummarized_patents([patent['patent_number'] for patent in patents
+                                             if patent['patent_number'] in done])
+    patents = [patent for patent in patents if patent['patent_number'] not in done]
+
+    refreshed = [patent for patent in patents if patent.get("refresh_only")]
+    for patent in refreshed:
+        refresh_patent(patent)
+        journal.record(patent['patent_number'], NER_DONE)
+        print(f"Refreshed citations for patent: {patent['patent_number']}")
     
-    # Process each patent
-    for patent in patents:
-        # Store patent in database
-        insert_patent(patent, keywords, ipc_filter)
-        print(f"Stored patent: {patent['patent_number']}")
-        
-        # Run NER on abstract
-        #  entities = process_patent_abstract(patent)
-        print(patent)
-        txt = patent["abstract"] or ""
-        entities = model.predict(txt)
-        if entities:
-            insert_ner_results(patent['patent_number'], entities)
-            print(f"Stored {len(entities)} entities for patent {patent['patent_number']}")
+    patents = [patent for patent in patents if not patent.get("refresh_only")]
+    if not patents and not unsummarized:
+        journal.complete()
+        return
+
+    summary_worker = SummaryWorker(update_patent_summary, summary_concurrency)
+    for patent in unsummarized:
+        summary_worker.submit(patent['patent_number'], patent["abstract"], patent["full_text"])
+    if unsummarized:
+        print(f"Resubmitted {len(unsummarized)} patents whose summaries the interrupted run did not store")
+    if patents:
+        label_patents(patents, keywords, ipc_filter, summary_worker, journal, ner_batch_size, ner_batch_tokens,
+                      ner_backend, ner_workers)
+    
+    summary_stats = summary_worker.close()
+    cache_stats = get_summary_cache().stats()
+    print(f"Stored {summary_stats['done']} summaries ({summary_stats['errors']} failed, "
+          f"{summary_stats['timeouts']} timed out; "
+          f"summary cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses)")
+    print(f"Summary tokens: {format_token_stats(summary_stats)}")
+    print(f"LLM generations: {summary_worker.metrics.format_summary()}")
+    summary_worker.metrics.save()
+    journal.complete()
+
+def backfill_summaries(limit: Optional[int] = None, include_errors: bool = True,
+                       concurrency: int = SUMMARY_CONCURRENCY, model: str = OLLAMA_MODEL) -> None:
+    """Generate the missing (and, with include_errors, failed) AI summaries of stored patents."""
+    patents = get_patents_without_summary(include_errors, limit)
+    if not patents:
+        print("All stored patents have a summary")
+        return
+    print(f"Summarizing {len(patents)} patents with {model} ({concurrency} at a time)")
+    
+    def store(patent_number, summary, status):
+        update_patent_summary(patent_number, summary, status)
+        if status == SUMMARY_DONE:
+            print(f"Stored summary for patent: {patent_number}")
         else:
-            print(f"No entities found for patent {patent['patent_number']}")
+            print(f"Summary of patent {patent_number} {status}: {summary}")
+    
+    metrics = GenerationMetrics(model)
+    stats = summarize_patents(patents, store, concurrency, model, metrics=metrics)
+    print(f"Summarized {stats['done']} patents in {stats['seconds']:.1f}s, {stats['errors']} failed "
+          f"({stats['timeouts']} timed out)")
+    print(f"Summary tokens: {format_token_stats(stats)}")
+    print(f"LLM generations: {metrics.format_summary()}")
+    metrics.save()
 
 def generate_report_for_keywords(keywords: str, output_dir: str = None) -> str:
     """Generate a report for patents matching keywords."""
@@ -72,6 +189,23 @@ def show_database_statistics():
     print(f"Total entities: {stats['total_entities']}")
     print(f"Unique keywords: {stats['unique_keywords']}")
     
+    if stats.get('summary_status_counts'):
+        print("\n=== AI Summaries ===")
+        for status, count in stats['summary_status_counts']:
+            print(f"  - {status}: {count} patents")
+    
+    summary_stats = get_summary_cache().stats()
+    if 'entries' in summary_stats:
+        print(f"\n=== Summary Cache ===")
+        print(f"Cached summaries: {summary_stats['entries']} ({summary_stats['bytes'] / 1024:.1f} KB)")
+        print(f"Hits: {summary_stats['total_hits']}, misses: {summary_stats['total_misses']}")
+    
+    ner_cache_stats = get_ner_cache().stats()
+    if 'entries' in ner_cache_stats:
+        print(f"\n=== NER Cache ===")
+        print(f"Cached abstracts: {ner_cache_stats['entries']} ({ner_cache_stats['bytes'] / 1024:.1f} KB)")
+        print(f"Hits: {ner_cache_stats['total_hits']}, misses: {ner_cache_stats['total_misses']}")
+    
     # Citation statistics
     print(f"\n=== Citation Statistics ===")
     print(f"Total citations: {stats.get('total_citations', 0)}")
@@ -112,8 +246,32 @@ def main():
     fetch_parser.add_argument("--limit", type=int, default=DEFAULT_PATENT_LIMIT, 
                             help="Number of patents to fetch")
     fetch_parser.add_argument("--ipc", nargs="*", help="IPC codes to filter by")
+    fetch_parser.add_argument("--after", help="Only patents dated on or after this day (YYYY-MM-DD)")
+    fetch_parser.add_argument("--before", help="Only patents dated on or before this day (YYYY-MM-DD)")
+    fetch_parser.add_argument("--date-type", choices=["priority", "filing", "publication"], default=SEARCH_DATE_TYPE,
+                            help="Date that --after/--before apply to")
     fetch_parser.add_argument("--full-text", action="store_true", 
                             help="Fetch full patent text (slower)")
+    fetch_parser.add_argument("--workers", type=int, default=SCRAPING_MAX_WORKERS,
+                            help="Number of concurrent patent page requests")
+    fetch_parser.add_argument("--parse-workers", type=int, default=PARSE_WORKERS,
+                            help="Number of processes parsing patent pages (0 parses in the main process)")
+    fetch_parser.add_argument("--no-cache", action="store_true",
+                            help="Do not read or write the on-disk HTTP cache")
+    fetch_parser.add_argument("--offline", action="store_true",
+                            help="Serve Google Patents responses only from the HTTP cache")
+    fetch_parser.add_argument("--refresh-days", type=int, default=PATENT_REFRESH_DAYS,
+                            help="Re-fetch citation data of stored patents older than this many days")
+    fetch_parser.add_argument("--summary-concurrency", type=int, default=SUMMARY_CONCURRENCY,
+                            help="AI summaries generated at once while patents are processed")
+    fetch_parser.add_argument("--ner-batch-size", type=int, default=NER_BATCH_SIZE,
+                            help="Most text chunks run through the NER model at once")
+    fetch_parser.add_argument("--ner-batch-tokens", type=int, default=NER_BATCH_TOKENS,
+                            help="Most padded tokens per NER batch")
+    fetch_parser.add_argument("--ner-backend", choices=BACKEND_NAMES, default=NER_BACKEND,
+                            help="NER inference backend (int8 and onnx need python -m src.ner.export first)")
+    fetch_parser.add_argument("--ner-workers", type=int, default=NER_WORKERS,
+                            help="Processes running NER batches (0 runs them in the main process)")
     
     # Report command
     report_parser = subparsers.add_parser("report", help="Generate HTML report")
@@ -123,6 +281,15 @@ def main():
     # Stats command
     stats_parser = subparsers.add_parser("stats", help="Show database statistics")
     
+    # Summarize command
+    summarize_parser = subparsers.add_parser("summarize", help="Back-fill missing or failed AI summaries")
+    summarize_parser.add_argument("--limit", type=int, help="Maximum number of patents to summarize")
+    summarize_parser.add_argument("--concurrency", type=int, default=SUMMARY_CONCURRENCY,
+                                help="Summaries generated at once")
+    summarize_parser.add_argument("--model", default=OLLAMA_MODEL, help="Ollama model to use")
+    summarize_parser.add_argument("--missing-only", action="store_true",
+                                help="Do not retry summaries that failed before")
+    
     # Process command (fetch + report)
     process_parser = subparsers.add_parser("process", 
                                          help="Fetch patents and generate report")
@@ -130,15 +297,46 @@ def main():
     process_parser.add_argument("--limit", type=int, default=DEFAULT_PATENT_LIMIT,
                               help="Number of patents to fetch")
     process_parser.add_argument("--ipc", nargs="*", help="IPC codes to filter by")
+    process_parser.add_argument("--after", help="Only patents dated on or after this day (YYYY-MM-DD)")
+    process_parser.add_argument("--before", help="Only patents dated on or before this day (YYYY-MM-DD)")
+    process_parser.add_argument("--date-type", choices=["priority", "filing", "publication"], default=SEARCH_DATE_TYPE,
+                              help="Date that --after/--before apply to")
     process_parser.add_argument("--output", help="Output directory for report")
+    process_parser.add_argument("--workers", type=int, default=SCRAPING_MAX_WORKERS,
+                              help="Number of concurrent patent page requests")
+    process_parser.add_argument("--parse-workers", type=int, default=PARSE_WORKERS,
+                              help="Number of processes parsing patent pages (0 parses in the main process)")
+    process_parser.add_argument("--no-cache", action="store_true",
+                              help="Do not read or write the on-disk HTTP cache")
+    process_parser.add_argument("--offline", action="store_true",
+                              help="Serve Google Patents responses only from the HTTP cache")
+    process_parser.add_argument("--refresh-days", type=int, default=PATENT_REFRESH_DAYS,
+                              help="Re-fetch citation data of stored patents older than this many days")
+    process_parser.add_argument("--summary-concurrency", type=int, default=SUMMARY_CONCURRENCY,
+                              help="AI summaries generated at once while patents are processed")
+    process_parser.add_argument("--ner-batch-size", type=int, default=NER_BATCH_SIZE,
+                              help="Most text chunks run through the NER model at once")
+    process_parser.add_argument("--ner-batch-tokens", type=int, default=NER_BATCH_TOKENS,
+                              help="Most padded tokens per NER batch")
+    process_parser.add_argument("--ner-backend", choices=BACKEND_NAMES, default=NER_BACKEND,
+                              help="NER inference backend (int8 and onnx need python -m src.ner.export first)")
+    process_parser.add_argument("--ner-workers", type=int, default=NER_WORKERS,
+                              help="Processes running NER batches (0 runs them in the main process)")
     
     args = parser.parse_args()
     
     # Initialize database
     create_database()
     
+    if args.command in ("fetch", "process"):
+        configure_http_cache(enabled=HTTP_CACHE_ENABLED and not args.no_cache,
+                             offline=HTTP_CACHE_OFFLINE or args.offline)
+    
     if args.command == "fetch":
-        fetch_and_process_patents(args.keywords, args.ipc, args.limit, args.full_text)
+        fetch_and_process_patents(args.keywords, args.ipc, args.limit, args.full_text, args.workers,
+                                  args.refresh_days, args.parse_workers, args.after, args.before, args.date_type,
+                                  args.summary_concurrency, args.ner_batch_size,
+                                  args.ner_batch_tokens, args.ner_backend, args.ner_workers)
         
     elif args.command == "report":
         report_path = generate_report_for_keywords(args.keywords, args.output)
@@ -148,9 +346,15 @@ def main():
     elif args.command == "stats":
         show_database_statistics()
         
+    elif args.command == "summarize":
+        backfill_summaries(args.limit, not args.missing_only, args.concurrency, args.model)
+        
     elif args.command == "process":
         # Fetch and process patents
-        fetch_and_process_patents(args.keywords, args.ipc, args.limit, False)
+        fetch_and_process_patents(args.keywords, args.ipc, args.limit, False, args.workers,
+                                  args.refresh_days, args.parse_workers, args.after, args.before, args.date_type,
+                                  args.summary_concurrency, args.ner_batch_size,
+                                  args.ner_batch_tokens, args.ner_backend, args.ner_workers)
         # Generate report
         report_path = generate_report_for_keywords(args.keywords, args.output)
         if report_path:
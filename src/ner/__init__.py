@@ -1,5 +1,7 @@
 """Named Entity Recognition module."""
 
 from .model import Model
+from .loading import get_ner_model
+from .cache import NerCache, get_ner_cache, predict_cached
 
-__all__ = ['Model']
+__all__ = ['Model', 'get_ner_model', 'NerCache', 'get_ner_cache', 'predict_cached']
@@ -0,0 +1,123 @@
+"""CPU inference backends of the NER model.
+
+A backend turns a padded batch of input IDs and its attention mask into token
+label IDs; Model.predict does the tokenization, batching and span decoding
+around it. Three backends are available:
+
+- "torch": the fine-tuned encoder in fp32 PyTorch (the default).
+- "int8": the same model with its linear layers dynamically quantized to int8.
+- "onnx": the model exported to an ONNX graph (model.onnx in the snapshot
+  directory) and run with ONNX Runtime.
+
+The int8 and onnx backends are only used once python -m src.ner.export has
+checked their entity F1 against fp32 on the annotated sample, and recorded in
+backends.json that they passed for the current checkpoint.
+"""
+
+import json
+import os
+from typing import Dict, Optional
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from ..config import NER_SNAPSHOT_DIR
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+BACKEND_NAMES = ("torch", "int8", "onnx")
+ONNX_FILE = "model.onnx"
+BACKENDS_INFO = "backends.json"
+
+class Backend:
+    """Token labels of padded batches; subclasses implement `labels`."""
+    name = None
+
+    def labels(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> np.ndarray:
+        raise NotImplementedError
+
+class TorchBackend(Backend):
+    """The model's own forward pass, in whatever precision its layers are."""
+    name = "torch"
+
+    def __init__(self, model: nn.Module):
+        self.model = model
+
+    @torch.inference_mode()
+    def labels(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> np.ndarray:
+        return self.model.forward(input_ids, attention_mask).argmax(dim=-1).cpu().numpy()
+
+class Int8Backend(TorchBackend):
+    """Linear layers quantized to int8 weights, activations quantized on the fly.
+
+    The model is quantized in place: it should not be shared with an fp32 backend.
+    """
+    name = "int8"
+
+    def __init__(self, model: nn.Module):
+        super().__init__(torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8, inplace=True))
+
+class OnnxBackend(Backend):
+    """An exported ONNX graph of the model run by ONNX Runtime on the CPU."""
+    name = "onnx"
+
+    def __init__(self, onnx_path: str, threads: Optional[int] = None):
+        if onnxruntime is None:
+            raise RuntimeError("The onnx NER backend needs onnxruntime: pip install -r requirements-onnx.txt")
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads or torch.get_num_threads()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+
+    def labels(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> np.ndarray:
+        logits, = self.session.run(["logits"], {"input_ids": input_ids.numpy(),
+                                                "attention_mask": attention_mask.numpy()})
+        return logits.argmax(axis=-1)
+
+def export_onnx(model: nn.Module, onnx_path: str) -> str:
+    """Export the model's forward pass to an ONNX graph with dynamic batch and sequence axes."""
+    input_ids = torch.full((2, 16), model.tokenizer.pad_token_id, dtype=torch.long)
+    attention_mask = torch.ones_like(input_ids)
+    axes = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(model, (input_ids, attention_mask), onnx_path,
+                          input_names=["input_ids", "attention_mask"], output_names=["logits"],
+                          dynamic_axes={"input_ids": axes, "attention_mask": axes, "logits": axes},
+                          opset_version=17)
+    return onnx_path
+
+def create_backend(name: str, model: nn.Module, snapshot_dir: str = NER_SNAPSHOT_DIR) -> Backend:
+    """Backend `name` for a model loaded from `snapshot_dir`."""
+    if name == "torch":
+        return TorchBackend(model)
+    if name == "int8":
+        return Int8Backend(model)
+    if name == "onnx":
+        return OnnxBackend(os.path.join(snapshot_dir, ONNX_FILE))
+    raise ValueError(f"Unknown NER backend {name!r}; choose one of {', '.join(BACKEND_NAMES)}")
+
+def read_gate_records(snapshot_dir: str = NER_SNAPSHOT_DIR) -> Dict[str, dict]:
+    """Accuracy checks recorded by python -m src.ner.export, by backend name."""
+    path = os.path.join(snapshot_dir, BACKENDS_INFO)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def write_gate_record(name: str, record: dict, snapshot_dir: str = NER_SNAPSHOT_DIR) -> None:
+    """Record the accuracy check of a backend, replacing its previous one."""
+    records = read_gate_records(snapshot_dir)
+    records[name] = record
+    with open(os.path.join(snapshot_dir, BACKENDS_INFO), "w", encoding="utf-8") as f:
+        json.dump(records, f, indent=2)
+
+def gate_passed(name: str, checkpoint_sha256: str, snapshot_dir: str = NER_SNAPSHOT_DIR) -> bool:
+    """Whether backend `name` passed its accuracy check for the checkpoint with this hash."""
+    if name == "torch":
+        return True
+    record = read_gate_records(snapshot_dir).get(name)
+    return bool(record and record.get("passed") and record.get("checkpoint_sha256") == checkpoint_sha256)
@@ -0,0 +1,93 @@
+"""Length-sorted dynamic batching of NER chunks under a token budget.
+
+Usage: python -m src.ner.batching [DIR] [--budget N ...] [--batch-size N] [--time]
+
+Padding every chunk of a batch to the longest one wastes encoder work when
+short abstracts share a batch with 512-token chunks of full texts. Chunks are
+sorted by length instead, and each batch takes as many similar-length chunks
+as fit in `max_tokens` padded tokens. The command line reports the padding
+efficiency (real / padded tokens) of several budgets on the *.txt files of
+DIR (chemu_sample/ner by default), to tune NER_BATCH_TOKENS for a machine.
+"""
+
+import argparse
+import glob
+import os
+import time
+from typing import Dict, List, Optional, Sequence
+
+from ..config import NER_BATCH_SIZE, NER_BATCH_TOKENS, NER_CHUNK_SIZE, NER_ENCODER_NAME
+
+def plan_batches(lengths: Sequence[int], max_tokens: int = NER_BATCH_TOKENS,
+                 max_batch_size: Optional[int] = NER_BATCH_SIZE) -> List[List[int]]:
+    """Group item indices into batches of at most `max_tokens` padded tokens.
+
+    Items are taken longest first, so each batch holds items of similar
+    length and the largest batch comes first. An item longer than the budget
+    gets a batch of its own.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    batches = []
+    for i in order:
+        batch = batches[-1] if batches else None
+        # The first item of a batch is its longest, so its length is the padded length
+        if (batch and (len(batch) + 1) * lengths[batch[0]] <= max_tokens
+                and (not max_batch_size or len(batch) < max_batch_size)):
+            batch.append(i)
+        else:
+            batches.append([i])
+    return batches
+
+def padding_stats(lengths: Sequence[int], batches: List[List[int]]) -> Dict[str, float]:
+    """Chunks, batches, real and padded tokens of a batch plan, and their ratio."""
+    tokens = sum(lengths)
+    padded = sum(len(batch) * max(lengths[i] for i in batch) for batch in batches)
+    return {"chunks": len(lengths), "batches": len(batches), "tokens": tokens, "padded_tokens": padded,
+            "efficiency": tokens / padded if padded else 1.0}
+
+def format_padding_stats(stats: Dict[str, float]) -> str:
+    """One-line account of padding_stats."""
+    return (f"{stats['chunks']} chunks in {stats['batches']} batches, {stats['tokens']} tokens padded to "
+            f"{stats['padded_tokens']} ({stats['efficiency']:.0%} efficiency)")
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Padding efficiency of NER batch token budgets")
+    parser.add_argument("directory", nargs="?", default="chemu_sample/ner", help="Directory of *.txt files")
+    parser.add_argument("--budget", type=int, nargs="*", default=[2048, 4096, NER_BATCH_TOKENS, 16384],
+                        help="Token budgets to compare")
+    parser.add_argument("--batch-size", type=int, default=NER_BATCH_SIZE, help="Maximum chunks per batch")
+    parser.add_argument("--time", action="store_true", help="Also time Model.predict with each budget")
+    args = parser.parse_args(argv)
+
+    paths = sorted(glob.glob(os.path.join(args.directory, "*.txt")))
+    texts = [open(path, encoding="utf-8").read() for path in paths]
+    if not texts:
+        parser.error(f"no *.txt files in {args.directory}")
+
+    from .loading import get_ner_model
+    from .model import Model
+    model = get_ner_model() if args.time else None
+    if model is not None:
+        tokenizer = model.tokenizer
+    else:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(NER_ENCODER_NAME)
+    lengths = [end - start
+               for ids in tokenizer(texts, verbose=False)["input_ids"]
+               for start, end, _, _ in Model.chunk_windows(len(ids), NER_CHUNK_SIZE)]
+    print(f"{len(texts)} texts, {len(lengths)} chunks of {min(lengths)}-{max(lengths)} tokens")
+
+    # Baseline: batches of a fixed number of chunks in text order
+    fixed = [list(range(i, min(i + args.batch_size, len(lengths)))) for i in range(0, len(lengths), args.batch_size)]
+    print(f"fixed batches of {args.batch_size}: {format_padding_stats(padding_stats(lengths, fixed))}")
+    for budget in args.budget:
+        batches = plan_batches(lengths, budget, args.batch_size)
+        line = f"budget {budget}: {format_padding_stats(padding_stats(lengths, batches))}"
+        if model is not None:
+            start = time.perf_counter()
+            model.predict(texts, args.batch_size, budget)
+            line += f", {time.perf_counter() - start:.2f}s"
+        print(line)
+
+if __name__ == "__main__":
+    main()
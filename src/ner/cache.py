@@ -0,0 +1,100 @@
+"""Persistent cache of NER results, stored in SQLite next to patents.db.
+
+Entities are keyed by the SHA-256 of the text, the hash of the fine-tuned
+checkpoint and the decoding parameters (encoder, chunk size, backend), so a
+text already seen by the same model is never run through the encoder again.
+A new checkpoint changes every key; entries of other checkpoints are dropped
+the first time the cache is used with it.
+"""
+
+import hashlib
+import json
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .batching import padding_stats
+from ..config import (
+    NER_CACHE_PATH, NER_CACHE_ENABLED, NER_CACHE_MAX_AGE_DAYS, NER_CACHE_MAX_MB, NER_BATCH_SIZE,
+    NER_BATCH_TOKENS, NER_CHUNK_SIZE, NER_ENCODER_NAME
+)
+from ..database.lru_cache import SQLiteLRUCache
+
+class NerCache(SQLiteLRUCache):
+    """NER result cache with per-entry use counts, age/size eviction and checkpoint invalidation."""
+    table = "ner_entities"
+    stats_table = "ner_cache_stats"
+    value_column = "entities"
+    columns = (("checkpoint", "TEXT"),)
+    indexed = ("checkpoint",)
+
+    def __init__(self, path: str = NER_CACHE_PATH, enabled: bool = NER_CACHE_ENABLED,
+                 max_age_days: Optional[float] = NER_CACHE_MAX_AGE_DAYS, max_mb: Optional[float] = NER_CACHE_MAX_MB):
+        super().__init__(path, enabled, max_age_days, max_mb)
+        self.checkpoint = None
+
+    @staticmethod
+    def entities_key(text: str, checkpoint: str, params: Dict) -> str:
+        """Hash identifying the entities of `text` by a checkpoint and decoding parameters."""
+        raw = json.dumps([text, checkpoint, params], sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def encode(self, entities: List[Dict]) -> str:
+        return json.dumps(entities, ensure_ascii=False)
+
+    def decode(self, stored: str) -> List[Dict]:
+        return json.loads(stored)
+
+    def use_checkpoint(self, checkpoint: str) -> int:
+        """Drop the entries of every other checkpoint, once per checkpoint; returns the number removed."""
+        if not self.enabled or checkpoint == self.checkpoint:
+            return 0
+        conn = self.connect()
+        removed = conn.execute("DELETE FROM ner_entities WHERE checkpoint != ?", (checkpoint,)).rowcount
+        conn.commit()
+        conn.close()
+        self.checkpoint = checkpoint
+        return removed
+
+    def put_many(self, items: Sequence[Tuple[str, List[Dict]]], checkpoint: str) -> None:
+        """Store the entities of several keys."""
+        super().put_many(items, checkpoint=checkpoint)
+
+_ner_cache = None
+
+def get_ner_cache() -> NerCache:
+    """Return the process-wide NER cache, evicting old entries when it is first opened."""
+    global _ner_cache
+    if _ner_cache is None:
+        _ner_cache = NerCache()
+        _ner_cache.evict()
+    return _ner_cache
+
+def decoding_params(model) -> Dict:
+    """Settings besides the checkpoint that change a model's entities."""
+    return {"encoder": NER_ENCODER_NAME, "chunk_size": NER_CHUNK_SIZE,
+            "backend": model.backend.name if model.backend is not None else "torch"}
+
+def predict_cached(model, texts: List[str], batch_size: int = NER_BATCH_SIZE, batch_tokens: int = NER_BATCH_TOKENS,
+                   cache: Optional[NerCache] = None, pool=None) -> Tuple[List[List[Dict]], List[Optional[str]]]:
+    """model.predict(texts, pool=pool), running only the texts missing from the cache.
+
+    Returns the entities of every text and their cache keys (None for a model
+    loaded without get_ner_model, whose checkpoint hash is unknown and which
+    bypasses the cache). model.batch_stats covers the texts actually run.
+    """
+    cache = cache or get_ner_cache()
+    checkpoint = getattr(model, "checkpoint_sha256", None)
+    if checkpoint is None or not cache.enabled:
+        return model.predict(texts, batch_size, batch_tokens, pool), [None] * len(texts)
+
+    cache.use_checkpoint(checkpoint)
+    params = decoding_params(model)
+    keys = [cache.entities_key(text, checkpoint, params) for text in texts]
+    results = cache.get_many(keys)
+    missing = {key: text for key, text in zip(keys, texts) if key not in results}
+    if missing:
+        predicted = model.predict(list(missing.values()), batch_size, batch_tokens, pool)
+        cache.put_many(list(zip(missing, predicted)), checkpoint)
+        results.update(zip(missing, predicted))
+    else:
+        model.batch_stats = padding_stats([], [])
+    return [results[key] for key in keys], keys
@@ -0,0 +1,106 @@
+"""Build the int8 or ONNX Runtime NER backend, gated by an accuracy check.
+
+Usage: python -m src.ner.export {int8,onnx} [DIR] [--tolerance F]
+
+The fp32 model and the candidate backend both predict the entities of the
+annotated texts of DIR (chemu_sample/ner by default), and are scored against
+the annotations by exact-match entity F1. The backend passes if it loses at
+most `tolerance` F1 against fp32. For onnx, the graph is exported first and
+only kept in the snapshot directory if it passes. The result is recorded in
+backends.json for the current checkpoint; get_ner_model only uses a backend
+that passed. Exits non-zero if the backend fails.
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .backends import ONNX_FILE, OnnxBackend, create_backend, export_onnx, write_gate_record
+from .loading import ensure_snapshot, load_snapshot
+from .model import Model
+from .parity import load_documents
+from ..config import NER_CHECKPOINT_PATH, NER_F1_TOLERANCE, NER_SNAPSHOT_DIR
+
+def entity_scores(predicted: Iterable[Iterable[Tuple]], gold: Iterable[Iterable[Tuple]]) -> Dict[str, float]:
+    """Micro precision, recall and F1 of predicted (label, start, end) entities, text by text."""
+    true_positives = n_predicted = n_gold = 0
+    for predicted_entities, gold_entities in zip(predicted, gold):
+        predicted_entities, gold_entities = set(predicted_entities), set(gold_entities)
+        true_positives += len(predicted_entities & gold_entities)
+        n_predicted += len(predicted_entities)
+        n_gold += len(gold_entities)
+    precision = true_positives / n_predicted if n_predicted else 0.0
+    recall = true_positives / n_gold if n_gold else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1}
+
+def predict_entities(model: Model, texts: List[str]) -> Tuple[List[List[Tuple]], float]:
+    """(label, start, end) entities of each text, and the seconds the prediction took."""
+    start = time.perf_counter()
+    predicted = model.predict(texts)
+    elapsed = time.perf_counter() - start
+    return [[(entity["label"], entity["start"], entity["end"]) for entity in entities]
+            for entities in predicted], elapsed
+
+def build_backend(name: str, directory: str = "chemu_sample/ner", tolerance: float = NER_F1_TOLERANCE,
+                  checkpoint: str = NER_CHECKPOINT_PATH, snapshot_dir: str = NER_SNAPSHOT_DIR) -> bool:
+    """Build backend `name`, check its entity F1 against fp32 and record the result; returns whether it passed."""
+    info = ensure_snapshot(checkpoint, snapshot_dir)
+    documents = load_documents(directory)
+    texts = [text for _, text, _ in documents]
+    gold = [annotations for _, _, annotations in documents]
+
+    reference = load_snapshot(snapshot_dir)
+    candidate = load_snapshot(snapshot_dir)
+    onnx_path = os.path.join(snapshot_dir, ONNX_FILE)
+    if name == "onnx":
+        export_onnx(reference, onnx_path + ".tmp")
+        candidate.backend = OnnxBackend(onnx_path + ".tmp")
+    else:
+        candidate.backend = create_backend(name, candidate, snapshot_dir)
+
+    reference_entities, reference_time = predict_entities(reference, texts)
+    candidate_entities, candidate_time = predict_entities(candidate, texts)
+    reference_scores = entity_scores(reference_entities, gold)
+    scores = entity_scores(candidate_entities, gold)
+    agreement = entity_scores(candidate_entities, reference_entities)["f1"]
+    passed = reference_scores["f1"] - scores["f1"] <= tolerance
+
+    print(f"{len(texts)} texts from {directory}")
+    print(f"  torch: F1 {reference_scores['f1']:.4f} (P {reference_scores['precision']:.4f}, "
+          f"R {reference_scores['recall']:.4f}), {reference_time:.2f}s")
+    print(f"  {name}: F1 {scores['f1']:.4f} (P {scores['precision']:.4f}, R {scores['recall']:.4f}), "
+          f"{candidate_time:.2f}s ({reference_time / max(candidate_time, 1e-9):.2f}x), "
+          f"F1 {agreement:.4f} against torch")
+    print(f"{name} backend {'passed' if passed else 'FAILED'}: F1 {scores['f1'] - reference_scores['f1']:+.4f} "
+          f"against torch, tolerance {tolerance}")
+
+    if name == "onnx":
+        if passed:
+            os.replace(onnx_path + ".tmp", onnx_path)
+        else:
+            os.remove(onnx_path + ".tmp")
+    write_gate_record(name, {
+        "checkpoint_sha256": info["checkpoint_sha256"], "passed": passed, "tolerance": tolerance,
+        "f1": scores["f1"], "reference_f1": reference_scores["f1"], "agreement_f1": agreement,
+        "speedup": reference_time / max(candidate_time, 1e-9), "texts": len(texts),
+    }, snapshot_dir)
+    return passed
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build and accuracy-check an NER inference backend")
+    parser.add_argument("backend", choices=["int8", "onnx"])
+    parser.add_argument("directory", nargs="?", default="chemu_sample/ner", help="Directory of *.txt/*.ann files")
+    parser.add_argument("--tolerance", type=float, default=NER_F1_TOLERANCE,
+                        help="Most entity F1 the backend may lose against fp32")
+    parser.add_argument("--checkpoint", default=NER_CHECKPOINT_PATH, help="Fine-tuned weights")
+    parser.add_argument("--snapshot-dir", default=NER_SNAPSHOT_DIR)
+    args = parser.parse_args(argv)
+
+    passed = build_backend(args.backend, args.directory, args.tolerance, args.checkpoint, args.snapshot_dir)
+    return 0 if passed else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""Fast loading of the NER model from a local snapshot, shared by the whole process.
+
+Usage: python -m src.ner.loading [--force]
+
+Model() downloads and initializes the BioBERT encoder, then overwrites every
+weight with the fine-tuned checkpoint (model/ner_model.pt), so the encoder
+weights are in memory twice. The first load writes the fine-tuned weights as
+model.safetensors to NER_SNAPSHOT_DIR, next to the encoder config and the
+tokenizer. Later loads build the architecture on the meta device, without
+allocating or initializing anything, and assign it the weights memory-mapped
+from the snapshot. The snapshot records the hash of the checkpoint it was
+written from and is rewritten when the checkpoint changes. The command line
+writes the snapshot ahead of time. One model is kept per inference backend
+(see backends.py).
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import List, Optional
+
+import torch
+from safetensors.torch import load_file, save_file
+from transformers import AutoConfig, AutoTokenizer
+
+from .backends import create_backend, gate_passed
+from .model import Model
+from ..config import NER_BACKEND, NER_CHECKPOINT_PATH, NER_SNAPSHOT_DIR, NER_ENCODER_NAME
+
+SNAPSHOT_WEIGHTS = "model.safetensors"
+SNAPSHOT_INFO = "snapshot.json"
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def read_snapshot_info(snapshot_dir: str = NER_SNAPSHOT_DIR) -> Optional[dict]:
+    """The snapshot's record of the checkpoint it was written from, or None without a complete snapshot."""
+    info_path = os.path.join(snapshot_dir, SNAPSHOT_INFO)
+    if not os.path.exists(info_path) or not os.path.exists(os.path.join(snapshot_dir, SNAPSHOT_WEIGHTS)):
+        return None
+    with open(info_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def snapshot_is_current(checkpoint: str = NER_CHECKPOINT_PATH, snapshot_dir: str = NER_SNAPSHOT_DIR) -> bool:
+    """Whether the snapshot holds the weights of the checkpoint as it is now.
+
+    An unchanged size and modification time are trusted; otherwise the
+    checkpoint is hashed, so touching it does not force a new snapshot.
+    """
+    info = read_snapshot_info(snapshot_dir)
+    if info is None:
+        return False
+    stat = os.stat(checkpoint)
+    if info.get("size") == stat.st_size and info.get("mtime_ns") == stat.st_mtime_ns:
+        return True
+    return info.get("checkpoint_sha256") == file_sha256(checkpoint)
+
+def export_snapshot(checkpoint: str = NER_CHECKPOINT_PATH, snapshot_dir: str = NER_SNAPSHOT_DIR) -> str:
+    """Write the fine-tuned weights, encoder config and tokenizer of a checkpoint to a snapshot directory."""
+    model = Model(checkpoint=checkpoint)
+    os.makedirs(snapshot_dir, exist_ok=True)
+    digest = file_sha256(checkpoint)
+
+    # Non-persistent buffers (e.g. position ids) are not in the state dict, but a model
+    # built on the meta device needs them too
+    tensors = dict(model.state_dict())
+    tensors.update(model.named_buffers())
+    tensors = {name: tensor.detach().contiguous() for name, tensor in tensors.items()}
+    weights_path = os.path.join(snapshot_dir, SNAPSHOT_WEIGHTS)
+    save_file(tensors, weights_path + ".tmp", metadata={"checkpoint_sha256": digest})
+    os.replace(weights_path + ".tmp", weights_path)
+    model.encoder.config.save_pretrained(snapshot_dir)
+    model.tokenizer.save_pretrained(snapshot_dir)
+
+    stat = os.stat(checkpoint)
+    with open(os.path.join(snapshot_dir, SNAPSHOT_INFO), "w", encoding="utf-8") as f:
+        json.dump({"checkpoint": checkpoint, "checkpoint_sha256": digest, "size": stat.st_size,
+                   "mtime_ns": stat.st_mtime_ns, "encoder": NER_ENCODER_NAME}, f, indent=2)
+    return snapshot_dir
+
+def load_snapshot(snapshot_dir: str = NER_SNAPSHOT_DIR) -> Model:
+    """Build the model from a snapshot, its weights memory-mapped rather than copied."""
+    config = AutoConfig.from_pretrained(snapshot_dir)
+    with torch.device("meta"):
+        model = Model(config)
+    weights = load_file(os.path.join(snapshot_dir, SNAPSHOT_WEIGHTS))
+    model.load_state_dict({name: weights[name] for name in model.state_dict()}, assign=True)
+    for name, buffer in list(model.named_buffers()):
+        if buffer.is_meta:
+            module_name, _, buffer_name = name.rpartition(".")
+            model.get_submodule(module_name).register_buffer(buffer_name, weights[name], persistent=False)
+    model.tokenizer = AutoTokenizer.from_pretrained(snapshot_dir)
+    model.eval()
+    return model
+
+def ensure_snapshot(checkpoint: str = NER_CHECKPOINT_PATH, snapshot_dir: str = NER_SNAPSHOT_DIR) -> dict:
+    """Write the snapshot of a checkpoint unless it is current; returns its record of the checkpoint."""
+    if not snapshot_is_current(checkpoint, snapshot_dir):
+        print(f"Writing NER model snapshot of {checkpoint} to {snapshot_dir}...")
+        export_snapshot(checkpoint, snapshot_dir)
+    return read_snapshot_info(snapshot_dir)
+
+_ner_models = {}
+_ner_model_lock = threading.Lock()
+
+def get_ner_model(checkpoint: str = NER_CHECKPOINT_PATH, snapshot_dir: str = NER_SNAPSHOT_DIR,
+                  backend: str = NER_BACKEND) -> Model:
+    """Return the process-wide NER model of a backend, loading it (and writing its snapshot if needed) on first use.
+
+    A backend that has not passed python -m src.ner.export for the current
+    checkpoint falls back to fp32.
+    """
+    with _ner_model_lock:
+        if backend not in _ner_models:
+            start = time.perf_counter()
+            info = ensure_snapshot(checkpoint, snapshot_dir)
+            name = backend
+            if not gate_passed(backend, info["checkpoint_sha256"], snapshot_dir):
+                print(f"NER backend {backend} has not passed its accuracy check for {checkpoint} "
+                      f"(python -m src.ner.export {backend}); using torch")
+                name = "torch"
+            model = load_snapshot(snapshot_dir)
+            model.backend = create_backend(name, model, snapshot_dir)
+            model.checkpoint_sha256 = info["checkpoint_sha256"]
+            _ner_models[backend] = model
+            print(f"Loaded NER model ({name} backend) in {time.perf_counter() - start:.1f}s")
+        return _ner_models[backend]
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Write the memory-mappable NER model snapshot")
+    parser.add_argument("--checkpoint", default=NER_CHECKPOINT_PATH, help="Fine-tuned weights")
+    parser.add_argument("--snapshot-dir", default=NER_SNAPSHOT_DIR)
+    parser.add_argument("--force", action="store_true", help="Rewrite the snapshot even if it is current")
+    args = parser.parse_args(argv)
+
+    if not args.force and snapshot_is_current(args.checkpoint, args.snapshot_dir):
+        print(f"{args.snapshot_dir} is up to date with {args.checkpoint}")
+        return
+    start = time.perf_counter()
+    export_snapshot(args.checkpoint, args.snapshot_dir)
+    print(f"Wrote {args.snapshot_dir} in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,10 @@ import torch
 import torch.nn as nn
 from transformers import AutoModel, AutoTokenizer
 
+from .backends import TorchBackend
+from .batching import plan_batches, padding_stats
+from ..config import NER_ENCODER_NAME, NER_CHECKPOINT_PATH, NER_CHUNK_SIZE, NER_BATCH_SIZE, NER_BATCH_TOKENS
+
 class Model(nn.Module):
     idx_to_label = {
         0:          '0',
@@ -20,14 +24,22 @@ class Model(nn.Module):
         11:         'REACTION_STEP',
         12:         'WORKUP'
     }
+    backend = None  # set by loading.get_ner_model; fp32 forward passes otherwise
+    checkpoint_sha256 = None  # set by loading.get_ner_model; keys the NER result cache
 
-    def __init__(self):
+    def __init__(self, encoder_config=None, checkpoint: str = NER_CHECKPOINT_PATH):
         super(Model, self).__init__()
-        self.encoder = AutoModel.from_pretrained("dmis-lab/biobert-v1.1")
+        if encoder_config is not None:
+            # Architecture only; the weights and tokenizer are set by loading.load_snapshot
+            self.encoder = AutoModel.from_config(encoder_config)
+            self.fc = nn.Linear(encoder_config.hidden_size, 13, bias=False)
+            self.tokenizer = None
+            return
+        self.encoder = AutoModel.from_pretrained(NER_ENCODER_NAME)
         self.fc = nn.Linear(self.encoder.config.hidden_size, 13, bias=False)
 
-        self.load_state_dict(torch.load('model/ner_model.pt'))
-        self.tokenizer = AutoTokenizer.from_pretrained("dmis-lab/biobert-v1.1")
+        self.load_state_dict(torch.load(checkpoint))
+        self.tokenizer = AutoTokenizer.from_pretrained(NER_ENCODER_NAME)
 
 
     def forward(self, input_ids, attention_mask, **kwargs):
@@ -35,85 +47,96 @@ class Model(nn.Module):
         logits = self.fc(outputs.last_hidden_state) * 10
         return logits
     
+    @staticmethod
+    def chunk_windows(length: int, chunk_size: int = NER_CHUNK_SIZE):
+        # Chunks of chunk_size tokens every chunk_size // 2 tokens; each one predicts its middle
+        # (start, end, pred_start, pred_end), so that the predicted parts tile the whole text
+        overlap = chunk_size // 4
+        windows = []
+        for start in range(0, length, chunk_size // 2):
+            end = min(start + chunk_size, length)
+            pred_start = overlap if start != 0 else 0
+            pred_end = end - start - overlap if end != length else end - start
+            windows.append((start, end, pred_start, pred_end))
+            if end == length:
+                break
+        return windows
+
     @torch.inference_mode()
-    def predict(self, texts: list[str] | str):
+    def predict(self, texts: list[str] | str, batch_size: int = NER_BATCH_SIZE,
+                batch_tokens: int = NER_BATCH_TOKENS, pool=None):
+        # pool: a pool.NerPool labelling the batches in worker processes instead of this one
         is_string = False
         if isinstance(texts, str):
             texts = [texts]
             is_string = True
-        inputs = self.tokenizer(texts, padding=True, truncation=True, return_tensors="pt")
-
-        preds = []
-        input_ids = []
-        offsets = []
-        for text in texts:
-            tokens = self.tokenizer(text, return_tensors="pt", return_offsets_mapping=True)
-            input_id = tokens['input_ids']
-            attention_mask = tokens['attention_mask']
-            input_ids.append(input_id[0])
-            offsets.append(tokens['offset_mapping'][0])
-            # print(input_id.shape)
-            # if input_id.shape[1] <= 512:
-            #     pred = self.forward(input_id, attention_mask)
-            #     preds.append(pred.argmax(dim=-1).cpu()[0])
-            # If the input is too long, we split it into chunks of 512 tokens
-            chunk_size = 512
-            # overlap = 128
-            # chunk_size = 128
-            overlap = chunk_size // 4
-            current_preds = []
-            ids_check = []
-            for i in range(0, input_id.shape[1], chunk_size // 2):
-                end = int(min(i + chunk_size, input_id.shape[1]))
-                start = i
-                pred_start = overlap if start != 0 else 0
-                pred_end = end - start - overlap  if end != input_id.shape[1] else end - start
-                
-                chunk_input_ids = input_id[:, start:end]
-                chunk_attention_mask = attention_mask[:, start:end]
-                pred = self.forward(chunk_input_ids, chunk_attention_mask)[0, pred_start:pred_end]
-                pred = pred.argmax(dim=-1).cpu()
-                current_preds.append(pred)
-                ids_check.append(chunk_input_ids[0, pred_start:pred_end])
-
-                if end == input_id.shape[1]:
-                    break
-            if not (torch.cat(ids_check, dim=0) == input_id).all():
-                raise ValueError(f"Input IDs do not match the original input IDs for text: {text}. Please check the tokenization process.")
-            if end != input_id.shape[1]:
-                raise ValueError(f"Input text '{text}' is too long, please split it into smaller chunks.")
-            preds.append(torch.cat(current_preds, dim=0))
-            if len(preds[-1]) != input_id.shape[1]:
-                raise ValueError(f"Length of current_preds ({(preds[-1].shape)}) does not match input_id length ({input_id.shape}).")
-
-        return_list = []
-        for batch_pred, batch_tokens, batch_offset, original_text in zip(preds, input_ids, offsets, texts):
-            diffs = torch.diff(batch_pred, prepend=torch.tensor([0]))
-            diffs = torch.concat((diffs, torch.tensor([1])))
-            diff_locs = torch.where(diffs != 0)[0].tolist()
-            prev_loc = 0
-            
-            return_list.append([])
-            for loc in diff_locs:
-                if loc == 0:
-                    continue
-
-                if batch_pred[loc-1].item() != 0:
-                    start = batch_offset[prev_loc][0].item()
-                    end = batch_offset[loc-1][1].item()
-
-                    if start < end:
-                        return_list[-1].append({
-                            'text':     original_text[start:end],
-                            'label':    self.idx_to_label[batch_pred[loc-1].item()],
-                            'start':    start,
-                            'end':      end,
-                        })
-                prev_loc = loc
+        tokens = self.tokenizer(texts, return_offsets_mapping=True, verbose=False)
+        input_ids = [torch.tensor(ids) for ids in tokens['input_ids']]
+        offsets = [np.asarray(offset, dtype=np.int64).reshape(-1, 2) for offset in tokens['offset_mapping']]
+
+        # Chunks of every text are sorted by length and packed into batches of
+        # at most batch_tokens padded tokens; predictions go back by position
+        chunks = []
+        for doc, input_id in enumerate(input_ids):
+            windows = self.chunk_windows(len(input_id))
+            covered = [start + pred_start for start, _, pred_start, _ in windows] + [len(input_id)]
+            if covered != [0] + [start + pred_end for start, _, _, pred_end in windows]:
+                raise ValueError(f"Chunks do not cover the input IDs of text: {texts[doc]}. Please check the chunking.")
+            chunks.extend((doc,) + window for window in windows)
+
+        lengths = [end - start for _, start, end, _, _ in chunks]
+        batches = plan_batches(lengths, batch_tokens, batch_size)
+        self.batch_stats = padding_stats(lengths, batches)
+
+        batch_inputs = (self.batch_inputs([chunks[i] for i in batch_indices], input_ids)
+                         for batch_indices in batches)
+        if pool is not None:
+            batch_labels = pool.map_batches(batch_inputs)
+        else:
+            backend = self.backend or TorchBackend(self)
+            batch_labels = (backend.labels(*inputs) for inputs in batch_inputs)
+
+        preds = [np.zeros(len(input_id), dtype=np.int64) for input_id in input_ids]
+        for batch_indices, batch_preds in zip(batches, batch_labels):
+            batch = [chunks[i] for i in batch_indices]
+            for row, (doc, start, _, pred_start, pred_end) in enumerate(batch):
+                preds[doc][start + pred_start:start + pred_end] = batch_preds[row, pred_start:pred_end]
+
+        return_list = [self.decode_spans(pred, offset, text) for pred, offset, text in zip(preds, offsets, texts)]
 
         if is_string:
             return_list = return_list[0]
         return return_list
 
+    def batch_inputs(self, batch, input_ids):
+        # Padded input IDs and attention mask of (doc, start, end, ...) chunks
+        length = max(end - start for _, start, end, _, _ in batch)
+        batch_input_ids = torch.full((len(batch), length), self.tokenizer.pad_token_id, dtype=torch.long)
+        batch_attention_mask = torch.zeros((len(batch), length), dtype=torch.long)
+        for row, (doc, start, end, _, _) in enumerate(batch):
+            batch_input_ids[row, :end - start] = input_ids[doc][start:end]
+            batch_attention_mask[row, :end - start] = 1
+        return batch_input_ids, batch_attention_mask
+
+    @classmethod
+    def decode_spans(cls, pred: np.ndarray, offsets: np.ndarray, text: str):
+        # Every run of equal non-zero token labels is an entity, from the first character of its
+        # first token to the last character of its last token; runs are found with array ops only
+        if len(pred) == 0:
+            return []
+        starts = np.concatenate(([0], np.flatnonzero(pred[1:] != pred[:-1]) + 1))
+        ends = np.append(starts[1:], len(pred))
+        labels = pred[starts]
+        char_starts = offsets[starts, 0]
+        char_ends = offsets[ends - 1, 1]
+        keep = (labels != 0) & (char_starts < char_ends)
+        return [{
+                    'text':     text[start:end],
+                    'label':    cls.idx_to_label[label],
+                    'start':    start,
+                    'end':      end,
+                } for start, end, label in zip(char_starts[keep].tolist(), char_ends[keep].tolist(),
+                                               labels[keep].tolist())]
+
     def transform_text(self, texts: list[str] | str):
         return texts
@@ -0,0 +1,182 @@
+"""Parity and timing check of the vectorized NER span decoder.
+
+Usage: python -m src.ner.parity [DIR] [--tokens N] [--golden FILE [--record]]
+
+Token labels are derived from the brat annotations (*.ann) of DIR
+(chemu_sample/ner by default), decoded by Model.decode_spans and by the
+per-token loop it replaced, and the spans compared; the same labels tiled into
+one document of N tokens time both decoders. No model weights are needed for
+this. With --golden, the NER model's predict is also run on the texts and its output
+compared with the entities recorded in FILE (or, with --record, written to
+it). Exits non-zero on any mismatch.
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from .loading import get_ner_model
+from .model import Model
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+LABEL_IDS = {label: idx for idx, label in Model.idx_to_label.items()}
+
+def load_annotations(path: str) -> List[Tuple[str, int, int]]:
+    """(label, start, end) of the text-bound annotations of a brat .ann file."""
+    annotations = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if not fields[0].startswith("T") or len(fields) < 2:
+                continue
+            label, spans = fields[1].split(" ", 1)
+            # Discontinuous annotations ("start end;start end") are taken as a whole
+            positions = [int(position) for span in spans.split(";") for position in span.split()]
+            annotations.append((label, min(positions), max(positions)))
+    return annotations
+
+def annotated_labels(text: str, annotations: List[Tuple[str, int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Token labels and offsets of a text as the model would predict its annotations.
+
+    Tokens are words and punctuation marks, between [CLS] and [SEP] tokens
+    with (0, 0) offsets like the tokenizer's.
+    """
+    offsets = [(0, 0)] + [match.span() for match in TOKEN_PATTERN.finditer(text)] + [(0, 0)]
+    labels = np.zeros(len(offsets), dtype=np.int64)
+    for label, start, end in annotations:
+        for i, (token_start, token_end) in enumerate(offsets):
+            if start <= token_start < end and token_end > token_start:
+                labels[i] = LABEL_IDS.get(label, 0)
+    return labels, np.asarray(offsets, dtype=np.int64)
+
+def decode_spans_loop(pred: np.ndarray, offsets: np.ndarray, text: str) -> List[Dict]:
+    """The per-token span decoder Model.decode_spans replaced, kept as the reference."""
+    batch_pred = torch.from_numpy(pred)
+    batch_offset = torch.from_numpy(offsets)
+    diffs = torch.diff(batch_pred, prepend=torch.tensor([0]))
+    diffs = torch.concat((diffs, torch.tensor([1])))
+    diff_locs = torch.where(diffs != 0)[0].tolist()
+    prev_loc = 0
+    spans = []
+    for loc in diff_locs:
+        if loc == 0:
+            continue
+        if batch_pred[loc-1].item() != 0:
+            start = batch_offset[prev_loc][0].item()
+            end = batch_offset[loc-1][1].item()
+            if start < end:
+                spans.append({
+                    'text':     text[start:end],
+                    'label':    Model.idx_to_label[batch_pred[loc-1].item()],
+                    'start':    start,
+                    'end':      end,
+                })
+        prev_loc = loc
+    return spans
+
+def load_documents(directory: str) -> List[Tuple[str, str, List[Tuple[str, int, int]]]]:
+    """(name, text, annotations) of the annotated texts of a directory."""
+    documents = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.txt"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        ann_path = os.path.splitext(path)[0] + ".ann"
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        documents.append((name, text, load_annotations(ann_path) if os.path.exists(ann_path) else []))
+    return documents
+
+def tile_document(labelled: List[Tuple[str, np.ndarray, np.ndarray]],
+                  tokens: int) -> Tuple[str, np.ndarray, np.ndarray]:
+    """Concatenate labelled texts, repeating them, into one document of at least `tokens` tokens."""
+    texts, preds, offsets = [], [], []
+    length, count = 0, 0
+    while count < tokens:
+        for text, pred, offset in labelled:
+            texts.append(text)
+            preds.append(pred)
+            # Special tokens keep their (0, 0) offsets
+            offsets.append(offset + length * (offset[:, 1:] > 0))
+            length += len(text) + 1
+            count += len(pred)
+    return "\n".join(texts), np.concatenate(preds), np.concatenate(offsets)
+
+def check_decoder(directory: str, tokens: int = 50000, repeat: int = 5) -> List[str]:
+    """Compare both decoders on the annotations of a directory and time them; returns mismatching texts."""
+    mismatches = []
+    labelled = []
+    for name, text, annotations in load_documents(directory):
+        pred, offsets = annotated_labels(text, annotations)
+        labelled.append((text, pred, offsets))
+        if Model.decode_spans(pred, offsets, text) != decode_spans_loop(pred, offsets, text):
+            mismatches.append(name)
+            print(f"MISMATCH {name}")
+    print(f"Checked the decoder on {len(labelled)} texts, {len(mismatches)} mismatches")
+    if not labelled:
+        return mismatches
+
+    text, pred, offsets = tile_document(labelled, tokens)
+    timings = {}
+    for name, decode in (("loop", decode_spans_loop), ("vectorized", Model.decode_spans)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            spans = decode(pred, offsets, text)
+        timings[name] = (time.perf_counter() - start) / repeat
+    if Model.decode_spans(pred, offsets, text) != decode_spans_loop(pred, offsets, text):
+        mismatches.append("tiled document")
+        print("MISMATCH tiled document")
+    print(f"Decoding {len(pred)} tokens ({len(spans)} entities): loop {timings['loop'] * 1000:.1f} ms, "
+          f"vectorized {timings['vectorized'] * 1000:.1f} ms "
+          f"({timings['loop'] / max(timings['vectorized'], 1e-9):.0f}x)")
+    return mismatches
+
+def check_golden(directory: str, golden_path: str, record: bool = False) -> List[str]:
+    """Compare the NER model's predict on a directory's texts with recorded entities; returns mismatching texts."""
+    documents = load_documents(directory)
+    model = get_ner_model()
+    start = time.perf_counter()
+    predicted = model.predict([text for _, text, _ in documents])
+    elapsed = time.perf_counter() - start
+    results = {name: entities for (name, _, _), entities in zip(documents, predicted)}
+    print(f"Predicted {sum(map(len, predicted))} entities in {len(documents)} texts in {elapsed:.1f}s")
+
+    if record:
+        with open(golden_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1, ensure_ascii=False)
+        print(f"Recorded golden output to {golden_path}")
+        return []
+    if not os.path.exists(golden_path):
+        print(f"No golden output at {golden_path}; record it with --record")
+        return ["golden"]
+    with open(golden_path, "r", encoding="utf-8") as f:
+        golden = json.load(f)
+    mismatches = [name for name in sorted(set(golden) | set(results)) if golden.get(name) != results.get(name)]
+    for name in mismatches:
+        print(f"MISMATCH {name}: {len(golden.get(name) or [])} golden, "
+              f"{len(results.get(name) or [])} predicted entities")
+    print(f"Compared {len(results)} texts with {golden_path}, {len(mismatches)} mismatches")
+    return mismatches
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="NER span decoder parity and timing check")
+    parser.add_argument("directory", nargs="?", default="chemu_sample/ner", help="Directory of *.txt/*.ann files")
+    parser.add_argument("--tokens", type=int, default=50000, help="Length of the timed document")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed decodings per decoder")
+    parser.add_argument("--golden", help="JSON file of the entities the NER model should return")
+    parser.add_argument("--record", action="store_true", help="Write the --golden file instead of checking it")
+    args = parser.parse_args(argv)
+
+    mismatches = check_decoder(args.directory, args.tokens, args.repeat)
+    if args.golden:
+        mismatches += check_golden(args.directory, args.golden, args.record)
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""Process pool running NER batches on several cores.
+
+Usage: python -m src.ner.pool [DIR] [--workers N ...] [--threads N] [--copies N]
+
+One process cannot keep a many-core machine busy: torch's intra-op threads
+stop paying off well before 32 cores on 512-token batches. With a pool, the
+main process still tokenizes the texts, plans the batches and decodes the
+spans (Model.predict with pool=...), but the padded batches go to N worker
+processes, each running the encoder with its share of the cores. Every
+worker loads the model with get_ner_model, from the snapshot the main process
+wrote, so the fp32 weights are memory-mapped from the same file and shared
+through the page cache rather than copied N times. (The int8 backend
+quantizes a private copy in each worker.)
+
+The command line times Model.predict on the *.txt files of DIR
+(chemu_sample/ner by default, repeated --copies times) in-process and with
+each number of workers, and reports the throughput and speedup.
+"""
+
+import argparse
+import glob
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from .loading import get_ner_model
+from ..config import NER_BACKEND, NER_CHECKPOINT_PATH, NER_SNAPSHOT_DIR, NER_WORKER_THREADS
+
+_worker_model = None
+
+def _init_worker(checkpoint: str, snapshot_dir: str, backend: str, threads: int) -> None:
+    global _worker_model
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    _worker_model = get_ner_model(checkpoint, snapshot_dir, backend)
+
+def _label_batch(input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    return _worker_model.backend.labels(torch.from_numpy(input_ids), torch.from_numpy(attention_mask))
+
+def worker_threads(workers: int, threads: Optional[int] = NER_WORKER_THREADS) -> int:
+    """Torch threads per worker: `threads` if set, else an equal share of the cores."""
+    return threads or max(1, (os.cpu_count() or 1) // workers)
+
+class NerPool:
+    """Worker processes labelling padded NER batches, each with its own copy of the model's backend."""
+    def __init__(self, workers: int, threads: Optional[int] = NER_WORKER_THREADS, backend: str = NER_BACKEND,
+                 checkpoint: str = NER_CHECKPOINT_PATH, snapshot_dir: str = NER_SNAPSHOT_DIR):
+        self.workers = workers
+        self.threads = worker_threads(workers, threads)
+        # Workers are spawned, like the parse pool's, and only read the snapshot:
+        # load the model here first so that it is written once, not by every worker
+        get_ner_model(checkpoint, snapshot_dir, backend)
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                            initializer=_init_worker,
+                                            initargs=(checkpoint, snapshot_dir, backend, self.threads))
+
+    def map_batches(self, batches: Iterable[Tuple[torch.Tensor, torch.Tensor]]) -> Iterator[np.ndarray]:
+        """Token labels of each (input IDs, attention mask) batch, in order, computed by the workers."""
+        futures = [self.executor.submit(_label_batch, input_ids.numpy(), attention_mask.numpy())
+                   for input_ids, attention_mask in batches]
+        return (future.result() for future in futures)
+
+    def warm_up(self) -> None:
+        """Start every worker and load its model, so that the first batches are not slowed by it."""
+        batch = (np.zeros((1, 2), dtype=np.int64), np.ones((1, 2), dtype=np.int64))
+        futures = [self.executor.submit(_label_batch, *batch) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def close(self) -> None:
+        """Stop the workers; get_ner_pool starts a new pool for the next caller."""
+        with _pools_lock:
+            for key in [key for key, pool in _pools.items() if pool is self]:
+                del _pools[key]
+        self.executor.shutdown()
+
+_pools: Dict[Tuple, NerPool] = {}
+_pools_lock = threading.Lock()
+
+def get_ner_pool(workers: int, threads: Optional[int] = NER_WORKER_THREADS, backend: str = NER_BACKEND) -> NerPool:
+    """Return the process-wide NER pool with these settings, starting it on first use.
+
+    The pool runs until it is closed, which the caller should do once its batches are done.
+    """
+    with _pools_lock:
+        key = (workers, threads, backend)
+        if key not in _pools:
+            _pools[key] = NerPool(workers, threads, backend)
+        return _pools[key]
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="NER throughput with increasing numbers of worker processes")
+    parser.add_argument("directory", nargs="?", default="chemu_sample/ner", help="Directory of *.txt files")
+    parser.add_argument("--workers", type=int, nargs="*", default=[1, 2, 4, 8], help="Worker counts to compare")
+    parser.add_argument("--threads", type=int, default=NER_WORKER_THREADS,
+                        help="Torch threads per worker (default: cores / workers)")
+    parser.add_argument("--copies", type=int, default=4, help="Times the texts are repeated")
+    parser.add_argument("--backend", default=NER_BACKEND)
+    args = parser.parse_args(argv)
+
+    paths = sorted(glob.glob(os.path.join(args.directory, "*.txt")))
+    texts = [open(path, encoding="utf-8").read() for path in paths] * args.copies
+    if not texts:
+        parser.error(f"no *.txt files in {args.directory}")
+
+    model = get_ner_model(backend=args.backend)
+    print(f"{len(texts)} texts, {os.cpu_count()} cores")
+    start = time.perf_counter()
+    reference = model.predict(texts)
+    baseline = time.perf_counter() - start
+    print(f"in-process, {torch.get_num_threads()} threads: {baseline:.2f}s, {len(texts) / baseline:.1f} texts/s, "
+          f"{model.batch_stats['tokens'] / baseline:.0f} tokens/s")
+    for workers in args.workers:
+        pool = NerPool(workers, args.threads, args.backend)
+        pool.warm_up()
+        start = time.perf_counter()
+        results = model.predict(texts, pool=pool)
+        elapsed = time.perf_counter() - start
+        pool.close()
+        print(f"{workers} workers x {pool.threads} threads: {elapsed:.2f}s, {len(texts) / elapsed:.1f} texts/s, "
+              f"{model.batch_stats['tokens'] / elapsed:.0f} tokens/s ({baseline / elapsed:.2f}x)"
+              f"{'' if results == reference else ', RESULTS DIFFER'}")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 """Patent scraping module."""
 
-from .patent_scraper import fetch_patents
+from .patent_scraper import fetch_patents, open_fetch_journal
 from .fetcher import ExtendedScraper
+from .cache import HTTPCache, configure_http_cache
+from .summary_cache import SummaryCache, get_summary_cache, configure_summary_cache
 
-__all__ = ['fetch_patents', 'ExtendedScraper']
+__all__ = ['fetch_patents', 'open_fetch_journal', 'ExtendedScraper', 'HTTPCache', 'configure_http_cache',
+           'SummaryCache', 'get_summary_cache', 'configure_summary_cache']
@@ -0,0 +1,105 @@
+"""End-to-end scraping benchmark against the local Google Patents stand-in.
+
+Usage: python -m src.scraper.benchmark [FIXTURES_DIR] [--target fetch|ipc|tendency] [--limit N]
+           [--workers N] [--parse-workers N] [--rate R] [--repeat N]
+           [--latency S] [--error-rate P] [--throttle-rate P] ...
+
+Runs fetch_patents (without summaries or database lookups),
+scrape_patents_for_ipc, or the planned searches of every tendency IPC code
+(`--limit` patents per code) against a StandinServer replaying FIXTURES_DIR,
+with the HTTP cache disabled. Reports accepted patents per second and
+stand-in requests per accepted patent.
+"""
+
+import argparse
+import contextlib
+import io
+import time
+from typing import Dict, List, Optional
+
+from .cache import configure_http_cache, get_http_cache
+from .patent_scraper import fetch_patents
+from .rate_limiter import configure_rate_limiter
+from .session import get_base_url, set_base_url
+from .standin import FixtureStore, StandinServer, add_server_arguments
+from ..config import (
+    STANDIN_FIXTURES_DIR, SCRAPING_MAX_WORKERS, PARSE_WORKERS, SCRAPING_BURST
+)
+
+def run_benchmark(fixtures: str = STANDIN_FIXTURES_DIR, target: str = "fetch", keyword: str = "motor",
+                  ipc_code: Optional[str] = None, limit: int = 50, workers: int = SCRAPING_MAX_WORKERS,
+                  parse_workers: int = PARSE_WORKERS, rate: float = 0.0, verbose: bool = False,
+                  **server_options) -> Dict[str, float]:
+    """Run one scrape against a fresh stand-in server and return its throughput figures.
+
+    A rate of 0 disables the request rate limiter.
+    """
+    from ..tendency import TARGET_IPC_CODES, scrape_patents_for_ipc, scrape_patents_for_ipcs
+
+    previous_url, previous_cache = get_base_url(), get_http_cache()
+    with StandinServer(FixtureStore(fixtures), **server_options) as server:
+        set_base_url(server.url)
+        configure_http_cache(enabled=False, offline=False)
+        if rate > 0:
+            configure_rate_limiter(rate, SCRAPING_BURST)
+        else:
+            configure_rate_limiter(1e9, 1e9)
+        output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        try:
+            start = time.perf_counter()
+            with output:
+                if target == "tendency":
+                    buckets = scrape_patents_for_ipcs(TARGET_IPC_CODES, limit, workers, parse_workers=parse_workers)
+                    patents = list({patent['patent_number'] for bucket in buckets.values() for patent in bucket})
+                elif target == "ipc":
+                    patents = scrape_patents_for_ipc(ipc_code or "H02K", [keyword], limit, workers,
+                                                     parse_workers=parse_workers)
+                else:
+                    patents, _ = fetch_patents(keyword, [ipc_code] if ipc_code else None, limit,
+                                               max_workers=workers, check_database=False,
+                                               parse_workers=parse_workers)
+            elapsed = time.perf_counter() - start
+        finally:
+            set_base_url(previous_url)
+            configure_http_cache(previous_cache.enabled, previous_cache.offline, previous_cache.directory)
+        stats = dict(server.stats)
+
+    accepted = len(patents)
+    return {
+        "accepted": accepted,
+        "seconds": elapsed,
+        "patents_per_second": accepted / elapsed if elapsed else 0.0,
+        "requests": stats.get("requests", 0),
+        "requests_per_patent": stats.get("requests", 0) / accepted if accepted else float("inf"),
+        "throttled": stats.get(429, 0),
+        "errors": stats.get(503, 0),
+    }
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the scraper against the Google Patents stand-in")
+    parser.add_argument("fixtures", nargs="?", default=STANDIN_FIXTURES_DIR)
+    parser.add_argument("--target", choices=["fetch", "ipc", "tendency"], default="fetch",
+                        help="fetch_patents, scrape_patents_for_ipc or all tendency IPC codes")
+    parser.add_argument("--keyword", default="motor")
+    parser.add_argument("--ipc", help="IPC code to search (required by the stand-in only for --target ipc)")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=SCRAPING_MAX_WORKERS)
+    parser.add_argument("--parse-workers", type=int, default=PARSE_WORKERS)
+    parser.add_argument("--rate", type=float, default=0.0, help="Requests per second (0: unlimited)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--verbose", action="store_true", help="Show the scraper output")
+    add_server_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server_options = {"latency": args.latency, "jitter": args.jitter, "error_rate": args.error_rate,
+                      "throttle_rate": args.throttle_rate, "retry_after": args.retry_after, "seed": args.seed}
+    for run in range(1, args.repeat + 1):
+        result = run_benchmark(args.fixtures, args.target, args.keyword, args.ipc, args.limit, args.workers,
+                               args.parse_workers, args.rate, args.verbose, **server_options)
+        print(f"Run {run}: {result['accepted']} patents in {result['seconds']:.2f}s "
+              f"({result['patents_per_second']:.2f} patents/s), "
+              f"{result['requests']} requests ({result['requests_per_patent']:.2f} per patent), "
+              f"{result['throttled']} throttled, {result['errors']} errors")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Persistent on-disk cache for Google Patents HTTP responses.
+
+Response bodies are stored zlib-compressed under the SHA-256 of their content,
+so identical bodies are kept once. Each request (resource type, URL and query
+parameters) gets a small reference file pointing at its body and recording
+when it was fetched, which is what the per-type TTLs are checked against.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+import requests
+
+from ..config import HTTP_CACHE_DIR, HTTP_CACHE_TTL, HTTP_CACHE_ENABLED, HTTP_CACHE_OFFLINE
+
+class CacheMissError(requests.RequestException):
+    """Raised in offline mode when a response is not in the cache."""
+
+class HTTPCache:
+    """Content-addressed, compressed response cache with an offline replay mode."""
+    def __init__(self, directory: str = HTTP_CACHE_DIR, ttl: Optional[Dict[str, float]] = None,
+                 enabled: bool = HTTP_CACHE_ENABLED, offline: bool = HTTP_CACHE_OFFLINE):
+        self.directory = directory
+        self.ttl = dict(HTTP_CACHE_TTL if ttl is None else ttl)
+        self.enabled = enabled or offline
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def request_key(kind: str, url: str, params: Optional[Dict] = None) -> str:
+        """Hash identifying a request of the given resource type."""
+        raw = json.dumps([kind, url, sorted((params or {}).items())], default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _ref_path(self, kind: str, key: str) -> str:
+        return os.path.join(self.directory, "refs", kind, key[:2], f"{key}.json")
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "objects", digest[:2], f"{digest}.z")
+
+    def _count(self, hit: bool) -> None:
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, kind: str, url: str, params: Optional[Dict] = None) -> Optional[bytes]:
+        """Return the cached body for a request, or None if absent or stale.
+
+        In offline mode entries never go stale and a miss raises CacheMissError.
+        """
+        if not self.enabled:
+            return None
+        key = self.request_key(kind, url, params)
+        body = None
+        try:
+            with open(self._ref_path(kind, key), "r", encoding="utf-8") as f:
+                ref = json.load(f)
+            max_age = self.ttl.get(kind)
+            if self.offline or max_age is None or time.time() - ref["fetched"] <= max_age:
+                with open(self._object_path(ref["object"]), "rb") as f:
+                    body = zlib.decompress(f.read())
+        except (OSError, ValueError, KeyError, zlib.error):
+            body = None
+
+        self._count(body is not None)
+        if body is None and self.offline:
+            raise CacheMissError(f"Offline mode: no cached {kind} response for {url}")
+        return body
+
+    def put(self, kind: str, url: str, params: Optional[Dict], body: bytes) -> None:
+        """Store a response body for a request."""
+        if not self.enabled or self.offline:
+            return
+        digest = hashlib.sha256(body).hexdigest()
+        object_path = self._object_path(digest)
+        if not os.path.exists(object_path):
+            self._write_atomic(object_path, zlib.compress(body))
+        ref = {"object": digest, "fetched": time.time(), "url": url, "params": params}
+        ref_path = self._ref_path(kind, self.request_key(kind, url, params))
+        self._write_atomic(ref_path, json.dumps(ref).encode("utf-8"))
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters since the cache was created."""
+        return {"hits": self.hits, "misses": self.misses}
+
+_http_cache = None
+
+def get_http_cache() -> HTTPCache:
+    """Return the process-wide HTTP cache."""
+    global _http_cache
+    if _http_cache is None:
+        _http_cache = HTTPCache()
+    return _http_cache
+
+def configure_http_cache(enabled: bool = HTTP_CACHE_ENABLED, offline: bool = HTTP_CACHE_OFFLINE,
+                         directory: str = HTTP_CACHE_DIR) -> HTTPCache:
+    """Replace the process-wide HTTP cache, e.g. from CLI flags."""
+    global _http_cache
+    _http_cache = HTTPCache(directory=directory, enabled=enabled, offline=offline)
+    return _http_cache
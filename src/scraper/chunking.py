@@ -0,0 +1,119 @@
+"""Section-aware splitting of patent full texts into chunks under a token budget.
+
+Full texts come from the description section of the patent page, one text
+node per line, so headings ("TECHNICAL FIELD", "Example 3", ...) are lines of
+their own. Chunks never mix sections unless both fit whole, sections longer
+than the budget are split between sentences, and boilerplate sections (cross
+references, drawing lists) are left out.
+"""
+
+import math
+import re
+from typing import Dict, List, NamedTuple, Tuple
+
+from ..config import SUMMARY_CHARS_PER_TOKEN, SUMMARY_SKIP_SECTIONS
+
+HEADING_PATTERN = re.compile(r"^(?:[A-Z0-9][A-Z0-9 ,;:()/&\-]{2,79}|(?:Example|EXAMPLE|Comparative Example)\s+\w+)$")
+SENTENCE_PATTERN = re.compile(r"(?<=[.;!?])\s+(?=[A-Z0-9\[(])")
+
+class Section(NamedTuple):
+    """A heading and the text below it."""
+    heading: str
+    text: str
+
+class TextChunk(NamedTuple):
+    """A piece of a text to summarize, with the headings of the sections it covers."""
+    headings: List[str]
+    text: str
+    tokens: int
+
+def estimate_tokens(text: str) -> int:
+    """Approximate LLM token count of a text."""
+    return math.ceil(len(text) / SUMMARY_CHARS_PER_TOKEN)
+
+def is_heading(line: str) -> bool:
+    """Whether a full text line looks like a section heading."""
+    return bool(HEADING_PATTERN.match(line)) and not line.endswith(".") and any(c.isalpha() for c in line)
+
+def split_sections(text: str) -> List[Section]:
+    """Split a full text into sections at heading lines, joining the text nodes of each section."""
+    sections = []
+    heading, lines = "", []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if is_heading(line):
+            if lines:
+                sections.append(Section(heading, " ".join(lines)))
+            heading, lines = line, []
+        else:
+            lines.append(line)
+    if lines:
+        sections.append(Section(heading, " ".join(lines)))
+    return sections
+
+def is_skipped_section(heading: str) -> bool:
+    """Whether a section is boilerplate that says nothing about the chemistry."""
+    heading = heading.lower()
+    return any(skipped in heading for skipped in SUMMARY_SKIP_SECTIONS)
+
+def _split_long(text: str, budget: int) -> List[str]:
+    """Split text between sentences (or, failing that, anywhere) into pieces under the budget."""
+    pieces, current = [], ""
+    for sentence in SENTENCE_PATTERN.split(text):
+        while estimate_tokens(sentence) > budget:
+            cut = budget * SUMMARY_CHARS_PER_TOKEN
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:]
+        candidate = f"{current} {sentence}".strip()
+        if estimate_tokens(candidate) > budget:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+def chunk_text(text: str, budget: int, max_chunks: int) -> Tuple[List[TextChunk], Dict[str, int]]:
+    """Split a text into at most `max_chunks` chunks of at most `budget` estimated tokens.
+
+    Returns the chunks and the estimated tokens of the text: "total",
+    "processed" (in the chunks) and "discarded" (boilerplate sections and
+    whatever did not fit in `max_chunks`).
+    """
+    total = estimate_tokens(text)
+    chunks = []
+    headings, parts = [], []
+
+    def flush():
+        if parts:
+            chunk = "\n\n".join(parts)
+            chunks.append(TextChunk(list(headings), chunk, estimate_tokens(chunk)))
+            headings.clear()
+            parts.clear()
+
+    for section in split_sections(text):
+        if is_skipped_section(section.heading):
+            continue
+        block = f"{section.heading}\n{section.text}" if section.heading else section.text
+        if parts and estimate_tokens("\n\n".join(parts + [block])) > budget:
+            flush()
+        if estimate_tokens(block) <= budget:
+            headings.append(section.heading)
+            parts.append(block)
+            continue
+        # A section longer than the budget gets chunks of its own
+        for piece in _split_long(section.text, budget - estimate_tokens(section.heading) - 1):
+            headings.append(section.heading)
+            parts.append(f"{section.heading}\n{piece}" if section.heading else piece)
+            flush()
+    flush()
+
+    kept = chunks[:max_chunks]
+    processed = sum(chunk.tokens for chunk in kept)
+    return kept, {"total": total, "processed": processed, "discarded": max(0, total - processed)}
@@ -0,0 +1,240 @@
+"""Fast extraction of the fields we use from Google Patents pages.
+
+A patent page is several hundred kilobytes of HTML, but `get_scraped_data`,
+`extract_location` and `extract_full_text` only look at a handful of elements
+carrying an `itemprop` (plus the DC.description meta tag). With lxml installed,
+`extract_patent_data` parses the page into lxml's C tree and reads just those
+elements with XPath, never building a BeautifulSoup tree. Without lxml it
+falls back to `parse_patent_html`, which keeps only those subtrees while
+parsing and runs the original field logic on the much smaller tree. Both paths
+produce the same dict as `get_scraped_data` on a full `html.parser` tree.
+
+Run `python -m src.scraper.parity [DIR]` to check parity and timing over saved
+pages (*.html files in DIR, or the patent pages in the HTTP cache by default).
+"""
+
+import json
+import re
+from typing import Dict, List, Optional
+
+from bs4 import BeautifulSoup
+from google_patent_scraper import scraper_class
+
+from ..config import PATENT_HTML_PARSER
+
+try:
+    from bs4.filter import ElementFilter
+except ImportError:  # beautifulsoup4 < 4.13 has no parse-time filter hooks
+    ElementFilter = None
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+# (tag name, itemprop) pairs read by the field logic below
+PATENT_ELEMENTS = {
+    ('dd', 'inventor'), ('dd', 'assigneeOriginal'), ('dd', 'assigneeCurrent'),
+    ('dd', 'publicationDate'), ('dd', 'applicationNumber'), ('dd', 'filingDate'),
+    ('dd', 'events'), ('tr', 'forwardReferencesOrig'), ('tr', 'forwardReferencesFamily'),
+    ('tr', 'backwardReferences'), ('tr', 'backwardReferencesFamily'),
+    ('section', 'assignees'), ('section', 'abstract')
+}
+FULL_TEXT_ELEMENTS = {('section', 'description')}
+
+# Strings inside these tags are not part of BeautifulSoup's get_text()
+NON_TEXT_TAGS = {'script', 'style', 'template'}
+
+def get_html_parser() -> str:
+    """Return the configured parser, falling back to html.parser when lxml is not installed."""
+    if PATENT_HTML_PARSER == 'lxml' and lxml is not None:
+        return 'lxml'
+    return 'html.parser'
+
+if ElementFilter is not None:
+    class PatentPageFilter(ElementFilter):
+        """Parse-time filter keeping only the patent page elements we extract from."""
+        def __init__(self, fetch_full_text: bool = False):
+            super().__init__()
+            self.elements = PATENT_ELEMENTS | FULL_TEXT_ELEMENTS if fetch_full_text else PATENT_ELEMENTS
+
+        @property
+        def includes_everything(self) -> bool:
+            return False
+
+        def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+            attrs = attrs or {}
+            if name == 'meta':
+                return attrs.get('name') == 'DC.description'
+            return (name, attrs.get('itemprop')) in self.elements
+
+        def allow_string_creation(self, string: str) -> bool:
+            return False
+
+def parse_patent_html(html: str, fetch_full_text: bool = False) -> BeautifulSoup:
+    """Parse only the parts of a patent page used by the field extractors."""
+    parse_only = PatentPageFilter(fetch_full_text) if ElementFilter is not None else None
+    return BeautifulSoup(html, get_html_parser(), parse_only=parse_only)
+
+def extract_location(soup) -> Optional[str]:
+    """Extract assignee location from patent page."""
+    assignee_section = soup.find('section', {'itemprop': 'assignees'})
+    if assignee_section:
+        assignee_text = assignee_section.get_text(strip=True)
+        match = re.search(r'\((.*?)\)', assignee_text)
+        if match:
+            return match.group(1)
+    assignee_orig = soup.find('dd', {'itemprop': 'assigneeOriginal'})
+    if assignee_orig:
+        text = assignee_orig.get_text(strip=True)
+        match = re.search(r'[\w\s]+,\s\w{2,}(?:\s\w+)?$', text)
+        if match:
+            return match.group(0)
+    return None
+
+def extract_abstract_language(soup) -> Optional[str]:
+    """Extract the language code of the abstract (e.g. 'EN') from patent page."""
+    abstract_section = soup.find('section', {'itemprop': 'abstract'})
+    if abstract_section:
+        tagged = abstract_section.find(attrs={'lang': True})
+        if tagged:
+            return tagged['lang']
+    return None
+
+def extract_full_text(soup) -> Optional[str]:
+    """Extract full description text from patent page."""
+    description_section = soup.find('section', {'itemprop': 'description'})
+    if description_section:
+        return description_section.get_text(separator='\n', strip=True)
+    return None
+
+def build_patent_dict(soup, patent: str, url: str, fetch_full_text: bool = False,
+                      return_abstract: bool = True) -> Dict:
+    """Build the scraped data dict (get_scraped_data fields plus custom fields) from a parsed page."""
+    patent_dict = scraper_class(return_abstract=return_abstract).get_scraped_data(soup, patent, url)
+    patent_dict['assignee_location'] = extract_location(soup)
+    patent_dict['abstract_language'] = extract_abstract_language(soup)
+    patent_dict['full_text'] = extract_full_text(soup) if fetch_full_text else None
+    return patent_dict
+
+def _iter_strings(element):
+    """Yield the text of an lxml element the way BeautifulSoup's get_text() sees it."""
+    if element.text:
+        yield element.text
+    for child in element:
+        # Comments and processing instructions have a non-string tag; only their tail is text
+        if isinstance(child.tag, str) and child.tag not in NON_TEXT_TAGS:
+            yield from _iter_strings(child)
+        if child.tail:
+            yield child.tail
+
+def _get_text(element, separator: str = '', strip: bool = False) -> str:
+    strings = _iter_strings(element)
+    if strip:
+        strings = (string.strip() for string in strings)
+        strings = (string for string in strings if string)
+    return separator.join(strings)
+
+def _first(element, xpath: str):
+    found = element.xpath(xpath)
+    return found[0] if found else None
+
+def _parse_citations(root, itemprop: str) -> List[Dict[str, str]]:
+    citations = []
+    for row in root.xpath(f'//tr[@itemprop="{itemprop}"]'):
+        fields = {}
+        for key, xpath in (('patent_number', './/span[@itemprop="publicationNumber"]'),
+                           ('priority_date', './/td[@itemprop="priorityDate"]'),
+                           ('pub_date', './/td[@itemprop="publicationDate"]')):
+            found = _first(row, xpath)
+            fields[key] = _get_text(found) if found is not None else ''
+        citations.append(fields)
+    return citations
+
+def _extract_with_lxml(html: str, patent: str, url: str, fetch_full_text: bool,
+                       return_abstract: bool) -> Dict:
+    """lxml/XPath equivalent of build_patent_dict on a full html.parser tree."""
+    parser = lxml.html.HTMLParser(encoding='utf-8')
+    root = lxml.html.document_fromstring(html.encode('utf-8'), parser=parser)
+
+    def texts(xpath):
+        return [_get_text(element) for element in root.xpath(xpath)]
+
+    def first_text(xpath):
+        found = _first(root, xpath)
+        return _get_text(found) if found is not None else ''
+
+    pub_date = first_text('//dd[@itemprop="publicationDate"]')
+    priority_date = ''
+    grant_date = ''
+    for event in root.xpath('//dd[@itemprop="events"]'):
+        event_type = _first(event, './/span[@itemprop="type"]')
+        event_date = _first(event, './/time[@itemprop="date"]')
+        if event_type is None or event_date is None:
+            continue
+        title_info = _get_text(event_type)
+        timeevent = _get_text(event_date)
+        if title_info == 'priority':
+            priority_date = timeevent
+        if title_info == 'granted':
+            grant_date = timeevent
+        if title_info == 'publication' and pub_date == '':
+            pub_date = timeevent
+
+    abstract_text = ''
+    if return_abstract:
+        abstract = _first(root, '//meta[@name="DC.description"]')
+        if abstract is not None:
+            abstract_text = abstract.get('content', '')
+
+    patent_dict = {
+        'inventor_name': json.dumps([{'inventor_name': name} for name in texts('//dd[@itemprop="inventor"]')]),
+        'assignee_name_orig': json.dumps([{'assignee_name': name} for name in texts('//dd[@itemprop="assigneeOriginal"]')]),
+        'assignee_name_current': json.dumps([{'assignee_name': name} for name in texts('//dd[@itemprop="assigneeCurrent"]')]),
+        'pub_date': pub_date,
+        'priority_date': priority_date,
+        'grant_date': grant_date,
+        'filing_date': first_text('//dd[@itemprop="filingDate"]'),
+        'forward_cite_no_family': json.dumps(_parse_citations(root, 'forwardReferencesOrig')),
+        'forward_cite_yes_family': json.dumps(_parse_citations(root, 'forwardReferencesFamily')),
+        'backward_cite_no_family': json.dumps(_parse_citations(root, 'backwardReferences')),
+        'backward_cite_yes_family': json.dumps(_parse_citations(root, 'backwardReferencesFamily')),
+        'abstract_text': abstract_text,
+        'url': url,
+        'patent': patent
+    }
+
+    # Same rules as extract_location
+    assignee_location = None
+    assignee_section = _first(root, '//section[@itemprop="assignees"]')
+    if assignee_section is not None:
+        match = re.search(r'\((.*?)\)', _get_text(assignee_section, strip=True))
+        if match:
+            assignee_location = match.group(1)
+    if assignee_location is None:
+        assignee_orig = _first(root, '//dd[@itemprop="assigneeOriginal"]')
+        if assignee_orig is not None:
+            match = re.search(r'[\w\s]+,\s\w{2,}(?:\s\w+)?$', _get_text(assignee_orig, strip=True))
+            if match:
+                assignee_location = match.group(0)
+    patent_dict['assignee_location'] = assignee_location
+
+    abstract_language = root.xpath('(//section[@itemprop="abstract"]//*[@lang])[1]/@lang')
+    patent_dict['abstract_language'] = str(abstract_language[0]) if abstract_language else None
+
+    full_text = None
+    if fetch_full_text:
+        description = _first(root, '//section[@itemprop="description"]')
+        if description is not None:
+            full_text = _get_text(description, separator='\n', strip=True)
+    patent_dict['full_text'] = full_text
+    return patent_dict
+
+def extract_patent_data(html: str, patent: str, url: str, fetch_full_text: bool = False,
+                        return_abstract: bool = True) -> Dict:
+    """Extract the scraped data dict from raw patent page HTML."""
+    if get_html_parser() == 'lxml':
+        return _extract_with_lxml(html, patent, url, fetch_full_text, return_abstract)
+    soup = parse_patent_html(html, fetch_full_text)
+    return build_patent_dict(soup, patent, url, fetch_full_text, return_abstract)
+
@@ -2,14 +2,35 @@
 
 import requests
 import urllib.parse
-import time
-import re
 from bs4 import BeautifulSoup
 from google_patent_scraper import scraper_class
 import json
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from .rate_limiter import get_rate_limiter, rate_limited_get
+from .cache import get_http_cache
+from .session import get_base_url
+from .extractor import extract_patent_data, extract_location, extract_full_text
+from .parse_pool import parse_pages, get_parse_pool
+from ..config import SCRAPING_MAX_WORKERS, SEARCH_PREFETCH_PAGES, SEARCH_DATE_TYPE, PARSE_WORKERS, PARSE_CHUNKSIZE
 
-def build_search_params(keyword, ipc_codes=None, page=None):
-    """Build search parameters for Google Patents XHR query."""
+def format_search_date(value) -> str:
+    """Format a date, datetime or YYYY-MM-DD string as the YYYYMMDD used by search filters."""
+    if hasattr(value, 'strftime'):
+        return value.strftime("%Y%m%d")
+    return str(value).replace("-", "")
+
+def build_search_params(keyword, ipc_codes=None, page=None, after=None, before=None,
+                        date_type=SEARCH_DATE_TYPE):
+    """Build search parameters for Google Patents XHR query.
+
+    `after`/`before` restrict the results to patents whose `date_type` date
+    (priority, filing or publication) falls in that window.
+    """
     params = {}
     
     # Only add keyword if it's not empty
@@ -23,29 +44,52 @@ def build_search_params(keyword, ipc_codes=None, page=None):
     
     if ipc_codes:
         params["classification"] = "+OR+".join(ipc_codes)
+    if before:
+        params["before"] = f"{date_type}:{format_search_date(before)}"
+    if after:
+        params["after"] = f"{date_type}:{format_search_date(after)}"
     if page is not None:
         params["page"] = page
     return params
 
+def in_search_window(search_result: Dict, search_params: Dict) -> bool:
+    """Whether a search result's date satisfies the before/after filters of the search.
+
+    Results without the date are kept; the filters are already applied by the
+    search itself, this only guards against results outside the window.
+    """
+    for bound in ("after", "before"):
+        if bound not in search_params:
+            continue
+        date_type, limit = search_params[bound].split(":", 1)
+        date = (search_result.get(f"{date_type}_date") or "").replace("-", "")
+        if date and (date < limit if bound == "after" else date > limit):
+            return False
+    return True
+
 def fetch_patents_data(search_params):
     """Fetch patent search results from Google Patents XHR endpoint."""
-    xhr_url = "https://patents.google.com/xhr/query"
+    base_url = get_base_url()
+    xhr_url = f"{base_url}/xhr/query"
     query_string = urllib.parse.urlencode(search_params)
     params = {"url": query_string, "exp": "", "tags": ""}
     headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3",
-        "Referer": "https://patents.google.com/",
+        "Referer": f"{base_url}/",
         "X-Requested-With": "XMLHttpRequest",
-        "Accept": "*/*",
-        "Accept-Language": "en-US,en;q=0.9"
+        "Accept": "*/*"
     }
-    response = requests.get(xhr_url, params=params, headers=headers)
+    cache = get_http_cache()
+    cached = cache.get("query", xhr_url, params)
+    if cached is not None:
+        return json.loads(cached)
+    response = rate_limited_get(xhr_url, params=params, headers=headers)
     response.raise_for_status()
+    cache.put("query", xhr_url, params, response.content)
     return response.json()
 
-def extract_patent_numbers_from_json(json_data):
-    """Extract patent numbers from search results JSON."""
-    patent_numbers = []
+def extract_search_results_from_json(json_data):
+    """Extract patent numbers with their language codes and dates from search results JSON."""
+    search_results = []
     if isinstance(json_data, dict) and "results" in json_data:
         results = json_data["results"]
         if isinstance(results, dict) and "cluster" in results:
@@ -54,53 +98,213 @@ def extract_patent_numbers_from_json(json_data):
                     for item in result_item["result"]:
                         if "patent" in item:
                             patent = item["patent"]
-                            patent_numbers.append(patent.get("publication_number"))
-    return patent_numbers
+                            search_results.append({
+                                "publication_number": patent.get("publication_number"),
+                                "language": patent.get("language"),
+                                "priority_date": patent.get("priority_date"),
+                                "filing_date": patent.get("filing_date"),
+                                "publication_date": patent.get("publication_date")
+                            })
+    return search_results
+
+def extract_patent_numbers_from_json(json_data):
+    """Extract patent numbers from search results JSON."""
+    return [result["publication_number"] for result in extract_search_results_from_json(json_data)]
+
+def iter_search_pages(search_params: Dict, max_pages: Optional[int] = None,
+                      prefetch: int = SEARCH_PREFETCH_PAGES,
+                      start_page: int = 0) -> Iterator[Tuple[int, List[Dict]]]:
+    """Yield (page, search_results) for successive search result pages.
+
+    Search results are dicts with "publication_number", "language" and the
+    patent's dates (see extract_search_results_from_json). Results outside
+    the before/after window of `search_params` are dropped; a page whose
+    results all fall outside it is yielded empty, so the caller can move its
+    cursor past it.
+
+    A background thread fetches up to `prefetch` pages ahead of the one being
+    processed, so the next XHR request overlaps with patent page downloads.
+    Iteration ends at the first page without any results or after `max_pages`; closing the generator
+    (e.g. breaking out of the loop) stops the fetcher without requesting more
+    pages. Fetch errors are re-raised in the consumer.
+    """
+    results = queue.Queue()
+    slots = threading.Semaphore(max(1, prefetch))
+    stop = threading.Event()
+
+    def produce():
+        page = start_page
+        try:
+            while max_pages is None or page < max_pages:
+                # Wait until the consumer has taken a page before fetching another one
+                while not slots.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+                if stop.is_set():
+                    return
+                params = dict(search_params)
+                if page > 0:
+                    params["page"] = page
+                else:
+                    params.pop("page", None)
+                search_results = extract_search_results_from_json(fetch_patents_data(params))
+                # Only a page with no results at all ends the search, not one filtered down to nothing
+                if not search_results:
+                    return
+                results.put((page, [result for result in search_results if in_search_window(result, params)], None))
+                page += 1
+        except Exception as e:
+            results.put((page, None, e))
+        finally:
+            results.put(None)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = results.get()
+            if item is None:
+                return
+            page, search_results, error = item
+            if error is not None:
+                raise error
+            slots.release()
+            yield page, search_results
+    finally:
+        stop.set()
 
 class ExtendedScraper(scraper_class):
-    """Extended scraper class to include additional fields."""
-    def __init__(self, *args, **kwargs):
+    """Extended scraper class to include additional fields.
+
+    Patent pages are requested by up to `max_workers` threads at once; the
+    shared Google Patents rate limiter keeps the overall request rate polite.
+    With `parse_workers`, the pages are parsed by that many processes in chunks
+    of `parse_chunksize` pages.
+    """
+    def __init__(self, *args, max_workers=SCRAPING_MAX_WORKERS, rate_limiter=None,
+                 parse_workers=PARSE_WORKERS, parse_chunksize=PARSE_CHUNKSIZE, **kwargs):
         super().__init__(*args, **kwargs)
+        self.max_workers = max(1, max_workers)
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.parse_workers = max(0, parse_workers)
+        self.parse_chunksize = max(1, parse_chunksize)
+
+    def fetch_page(self, patent, refresh=False) -> Tuple[str, str, str]:
+        """Fetch the raw HTML of a patent page, returning (status, html, url).
+
+        With `refresh`, the HTTP cache is only read in offline mode: the page is
+        downloaded again and the fresh copy replaces the cached one.
+        """
+        url = f'{get_base_url()}/patent/{patent}'
+        cache = get_http_cache()
+        cached = cache.get("patent", url) if not refresh or cache.offline else None
+        if cached is not None:
+            return 'Success', cached.decode('utf-8'), url
+        webpage = rate_limited_get(url, limiter=self.rate_limiter)
+        if not webpage.ok:
+            print(f'Patent: {patent}, Error Status Code : {webpage.status_code}')
+            return webpage.status_code, '', url
+        cache.put("patent", url, None, webpage.text.encode('utf-8'))
+        return 'Success', webpage.text, url
 
     def request_single_patent(self, patent):
-        """Override to use html.parser instead of lxml."""
-        url = f'https://patents.google.com/patent/{patent}'
-        webpage = requests.get(url)
-        soup = BeautifulSoup(webpage.text, 'html.parser')
-        return 'Success', soup, url
+        """Override to use html.parser instead of lxml and the shared pooled session."""
+        err, html, url = self.fetch_page(patent)
+        if err != 'Success':
+            return err, '', url
+        return 'Success', BeautifulSoup(html, 'html.parser'), url
+
+    def request_patents(self, patents: Iterable[str],
+                        refresh: Iterable[str] = ()) -> Iterator[Tuple[str, str, str, str]]:
+        """Fetch several patent pages concurrently, yielding (patent, status, html, url) in input order.
+
+        At most `max_workers` pages are in flight; closing the generator cancels
+        the requests that have not started yet. The patents in `refresh` bypass
+        the HTTP cache (see fetch_page).
+        """
+        refresh = set(refresh)
+
+        def request(patent):
+            try:
+                return (patent,) + tuple(self.fetch_page(patent, patent in refresh))
+            except requests.RequestException as e:
+                return patent, str(e), None, None
+
+        patents = iter(patents)
+        if self.max_workers == 1:
+            yield from map(request, patents)
+            return
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = deque(executor.submit(request, patent) for patent in islice(patents, self.max_workers))
+            try:
+                while in_flight:
+                    result = in_flight.popleft().result()
+                    for patent in islice(patents, 1):
+                        in_flight.append(executor.submit(request, patent))
+                    yield result
+            finally:
+                for future in in_flight:
+                    future.cancel()
+
+    def request_parsed_patents(self, patents: Iterable[str], fetch_full_text=False,
+                               abstract_only: Iterable[str] = (),
+                               refresh: Iterable[str] = ()) -> Iterator[Tuple[str, str, Optional[Dict], str]]:
+        """Fetch and parse several patent pages, yielding (patent, status, patent_dict, url) in input order.
+
+        Full text is extracted when `fetch_full_text` is set, except for the
+        patents in `abstract_only`; the patents in `refresh` bypass the HTTP cache. Without parse workers each page is parsed
+        as it arrives; otherwise the fetched pages are sent to the process pool
+        in chunks while the fetch threads keep downloading the next ones.
+        """
+        abstract_only = set(abstract_only)
+        jobs = ((patent, status, html, url, fetch_full_text and patent not in abstract_only, self.return_abstract)
+                for patent, status, html, url in self.request_patents(patents, refresh))
+        if self.parse_workers == 0:
+            for job in jobs:
+                yield from parse_pages([job])
+            return
+
+        pool = get_parse_pool(self.parse_workers)
+        in_flight = deque()
+        chunk = []
+        try:
+            for job in jobs:
+                chunk.append(job)
+                if len(chunk) >= self.parse_chunksize:
+                    in_flight.append(pool.submit(parse_pages, chunk))
+                    chunk = []
+                # Hand back finished chunks early, and block once every process has two queued
+                while in_flight and (in_flight[0].done() or len(in_flight) > 2 * self.parse_workers):
+                    yield from in_flight.popleft().result()
+            if chunk:
+                in_flight.append(pool.submit(parse_pages, chunk))
+            while in_flight:
+                yield from in_flight.popleft().result()
+        finally:
+            for future in in_flight:
+                future.cancel()
+            jobs.close()
+
+    def parse_patent(self, html, patent, url, fetch_full_text=False):
+        """Parse a patent page into the scraped data dict, including the custom fields.
+
+        Only the page elements the fields are read from are parsed (see extractor.py).
+        """
+        return extract_patent_data(html, patent, url, fetch_full_text, self.return_abstract)
 
     def scrape_all_patents(self, fetch_full_text=False):
-        """Scrape all patents, adding custom fields."""
-        for patent in self.list_of_patents:
-            err, soup, url = self.request_single_patent(patent)
+        """Scrape all patents, adding custom fields. Patents already parsed are not requested again."""
+        pending = [patent for patent in self.list_of_patents if patent not in self.parsed_patents]
+        for patent, err, patent_dict, url in self.request_parsed_patents(pending, fetch_full_text):
             if err == 'Success':
-                patent_dict = self.get_scraped_data(soup, patent, url)
-                patent_dict['assignee_location'] = self.extract_location(soup)
-                patent_dict['full_text'] = self.extract_full_text(soup) if fetch_full_text else None
                 self.parsed_patents[patent] = patent_dict
             else:
                 print(f'Error scraping patent {patent}')
-            time.sleep(2)  # Delay to prevent server overload
 
     def extract_location(self, soup):
         """Extract assignee location from patent page."""
-        assignee_section = soup.find('section', {'itemprop': 'assignees'})
-        if assignee_section:
-            assignee_text = assignee_section.get_text(strip=True)
-            match = re.search(r'\((.*?)\)', assignee_text)
-            if match:
-                return match.group(1)
-        assignee_orig = soup.find('dd', {'itemprop': 'assigneeOriginal'})
-        if assignee_orig:
-            text = assignee_orig.get_text(strip=True)
-            match = re.search(r'[\w\s]+,\s\w{2,}(?:\s\w+)?$', text)
-            if match:
-                return match.group(0)
-        return None
+        return extract_location(soup)
 
     def extract_full_text(self, soup):
         """Extract full description text from patent page."""
-        description_section = soup.find('section', {'itemprop': 'description'})
-        if description_section:
-            return description_section.get_text(separator='\n', strip=True)
-        return None
+        return extract_full_text(soup)
@@ -0,0 +1,120 @@
+"""English-language filtering for patents, cheapest signals first.
+
+Most patents can be classified without statistical language detection: the
+search results and the patent page both carry a language code, and many
+jurisdictions only publish in one language. `langdetect` is only used as a
+fallback, seeded so results are reproducible and cached per text.
+"""
+
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from langdetect import DetectorFactory, detect
+
+from ..config import LANGDETECT_SEED
+from ..utils import extract_country_code
+
+# Offices that only publish in English
+ENGLISH_JURISDICTIONS = {"US", "GB", "AU", "NZ", "IE", "SG"}
+# Offices that publish in a single non-English language
+NON_ENGLISH_JURISDICTIONS = {"CN", "JP", "KR", "TW", "RU", "DE", "FR", "ES", "IT", "AT", "BR", "PL", "CZ"}
+
+def _is_latin(char: str) -> bool:
+    return char < 'ɐ'
+
+class LanguageFilter:
+    """Decides whether a patent is in English, using metadata before text detection."""
+    def __init__(self, seed: int = LANGDETECT_SEED, max_cache_size: int = 10000):
+        self.seed = seed
+        self.max_cache_size = max_cache_size
+        self.cache: Dict[str, bool] = {}
+        self.lock = threading.Lock()
+        self.stats = {"metadata": 0, "jurisdiction": 0, "script": 0, "detector": 0, "cached": 0}
+
+    def _count(self, signal: str) -> None:
+        with self.lock:
+            self.stats[signal] += 1
+
+    @staticmethod
+    def language_matches(language: Optional[str]) -> Optional[bool]:
+        """Interpret a language code such as 'en' or 'EN'; None if absent."""
+        if not language:
+            return None
+        return language.strip().lower().startswith("en")
+
+    def jurisdiction_hint(self, patent_number: Optional[str]) -> Optional[bool]:
+        """English/non-English from the publishing office, or None when it can publish in several languages."""
+        country = extract_country_code(patent_number or "")
+        if country in ENGLISH_JURISDICTIONS:
+            return True
+        if country in NON_ENGLISH_JURISDICTIONS:
+            return False
+        return None
+
+    def should_fetch(self, patent_number: str, search_language: Optional[str] = None) -> bool:
+        """Decide from search metadata alone whether a patent page is worth downloading."""
+        hint = self.language_matches(search_language)
+        if hint is None:
+            hint = self.jurisdiction_hint(patent_number)
+        return hint is not False
+
+    def is_english(self, text: str, patent_number: Optional[str] = None,
+                   language: Optional[str] = None) -> bool:
+        """Return whether `text` is English, trying the language code and jurisdiction first."""
+        if not text or not text.strip():
+            return False
+        hint = self.language_matches(language)
+        if hint is not None:
+            self._count("metadata")
+            return hint
+        hint = self.jurisdiction_hint(patent_number)
+        if hint is not None:
+            self._count("jurisdiction")
+            return hint
+        return self.detect_english(text)
+
+    def detect_english(self, text: str) -> bool:
+        """Text-only detection: a script check, then seeded langdetect with a cache."""
+        letters = [char for char in text if char.isalpha()]
+        if letters and sum(not _is_latin(char) for char in letters) > 0.3 * len(letters):
+            self._count("script")
+            return False
+
+        key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        with self.lock:
+            cached = self.cache.get(key)
+        if cached is not None:
+            self._count("cached")
+            return cached
+
+        with self.lock:
+            # langdetect draws from a module-level RNG; seeding it makes results reproducible
+            DetectorFactory.seed = self.seed
+            try:
+                english = detect(text) == "en"
+            except Exception:
+                english = False
+            if len(self.cache) >= self.max_cache_size:
+                self.cache.clear()
+            self.cache[key] = english
+        self._count("detector")
+        return english
+
+    def detect_batch(self, texts: Iterable[str], patent_numbers: Optional[Iterable[Optional[str]]] = None,
+                     languages: Optional[Iterable[Optional[str]]] = None) -> List[bool]:
+        """Classify many texts at once; duplicate texts are only detected once."""
+        texts = list(texts)
+        patent_numbers = list(patent_numbers) if patent_numbers is not None else [None] * len(texts)
+        languages = list(languages) if languages is not None else [None] * len(texts)
+        return [self.is_english(text, patent_number, language)
+                for text, patent_number, language in zip(texts, patent_numbers, languages)]
+
+_language_filter = None
+
+def get_language_filter() -> LanguageFilter:
+    """Return the process-wide language filter."""
+    global _language_filter
+    if _language_filter is None:
+        _language_filter = LanguageFilter()
+    return _language_filter
@@ -0,0 +1,85 @@
+"""Latency and throughput measurements of LLM generations, for sizing Ollama hosts.
+
+Every streamed generation records its time to first token, total latency,
+token counts and outcome. A run prints the percentiles and can append the raw
+records to a JSON-lines log (SUMMARY_METRICS_PATH) to compare hosts or models
+over time.
+"""
+
+import json
+import threading
+import time
+from typing import Dict, List, Optional
+
+from ..config import SUMMARY_METRICS_PATH
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of a list of values, None if it is empty."""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(fraction * len(values)) - 1))]
+
+class GenerationMetrics:
+    """Thread-safe collection of per-generation measurements."""
+    def __init__(self, model: str = ""):
+        self.model = model
+        self.records = []
+        self.lock = threading.Lock()
+
+    def record(self, kind: str, status: str, latency: float, ttft: Optional[float] = None,
+               prompt_tokens: int = 0, output_tokens: int = 0, tokens_per_second: Optional[float] = None,
+               truncated: bool = False) -> None:
+        """Add the measurements of one generation call."""
+        with self.lock:
+            self.records.append({
+                "time": time.time(), "model": self.model, "kind": kind, "status": status,
+                "latency": latency, "ttft": ttft, "prompt_tokens": prompt_tokens,
+                "output_tokens": output_tokens, "tokens_per_second": tokens_per_second, "truncated": truncated,
+            })
+
+    def summary(self) -> Dict:
+        """Counts by status, p50/p95 time to first token and latency, and mean generation speed."""
+        with self.lock:
+            records = list(self.records)
+        ttfts = [r["ttft"] for r in records if r["ttft"] is not None]
+        latencies = [r["latency"] for r in records if r["status"] == "done"]
+        speeds = [r["tokens_per_second"] for r in records if r["tokens_per_second"]]
+        statuses = {}
+        for r in records:
+            statuses[r["status"]] = statuses.get(r["status"], 0) + 1
+        return {
+            "calls": len(records), "statuses": statuses,
+            "truncated": sum(r["truncated"] for r in records),
+            "output_tokens": sum(r["output_tokens"] for r in records),
+            "ttft_p50": percentile(ttfts, 0.5), "ttft_p95": percentile(ttfts, 0.95),
+            "latency_p50": percentile(latencies, 0.5), "latency_p95": percentile(latencies, 0.95),
+            "tokens_per_second": sum(speeds) / len(speeds) if speeds else None,
+        }
+
+    def format_summary(self) -> str:
+        """One-line account of the generations, e.g. for the end of a run."""
+        s = self.summary()
+        if not s["calls"]:
+            return "no generations"
+
+        def seconds(value):
+            return "-" if value is None else f"{value:.2f}s"
+
+        statuses = ", ".join(f"{count} {status}" for status, count in sorted(s["statuses"].items()))
+        speed = "-" if s["tokens_per_second"] is None else f"{s['tokens_per_second']:.1f}"
+        return (f"{s['calls']} generations ({statuses}; {s['truncated']} hit the token budget), "
+                f"TTFT p50 {seconds(s['ttft_p50'])} p95 {seconds(s['ttft_p95'])}, "
+                f"latency p50 {seconds(s['latency_p50'])} p95 {seconds(s['latency_p95'])}, "
+                f"{speed} tokens/s")
+
+    def save(self, path: Optional[str] = SUMMARY_METRICS_PATH) -> int:
+        """Append the records to a JSON-lines log; returns how many were written."""
+        with self.lock:
+            records = list(self.records)
+        if not path or not records:
+            return 0
+        with open(path, "a", encoding="utf-8") as f:
+            for r in records:
+                f.write(json.dumps(r) + "\n")
+        return len(records)
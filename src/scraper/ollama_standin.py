@@ -0,0 +1,204 @@
+"""Local stand-in for the Ollama HTTP API, for testing the summarization stage.
+
+Usage: python -m src.scraper.ollama_standin [--port N] [--parallel N]
+           [--latency S] [--tokens-per-second R] [--error-rate P]
+           [--stall-rate P] [--stall-seconds S]
+
+Answers POST /api/generate with a deterministic Process/Method/Outcome
+summary built from the first sentences of the prompt's text, streamed word by
+word as NDJSON unless the request has "stream": false. Like a real server it
+handles at most `parallel` generations at once (OLLAMA_NUM_PARALLEL), takes
+`latency` seconds to the first token and one second per `tokens_per_second`
+tokens after it, and stops at the request's num_predict. A `stall_rate`
+fraction of generations hangs for `stall_seconds` first, to exercise
+deadlines. Point the summarizer at it with OLLAMA_HOST=http://127.0.0.1:PORT.
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from itertools import chain
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+TEXT_MARKER = "Text to resume:"
+
+def fake_summary(prompt: str) -> str:
+    """Deterministic summary of the text embedded in a summary prompt."""
+    text = prompt.split(TEXT_MARKER, 1)[-1].rsplit("Summary:", 1)[0]
+    sentences = [sentence.strip() for sentence in re.split(r"(?<=[.;])\s+", " ".join(text.split())) if sentence.strip()]
+    sentences += [""] * 3
+    return (f"***Process***: {sentences[0]}\n"
+            f"***Method***: {sentences[1]}\n"
+            f"***Outcome***: {sentences[2]}").strip()
+
+class OllamaStandin:
+    """Threaded HTTP server emulating /api/generate of an Ollama server."""
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, parallel: int = 2, latency: float = 0.0,
+                 tokens_per_second: float = 0.0, error_rate: float = 0.0, stall_rate: float = 0.0,
+                 stall_seconds: float = 60.0, seed: int = 0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.random = random.Random(seed)
+        self.slots = threading.Semaphore(max(1, parallel))
+        self.stats = Counter()
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send(200, {"models": []})
+                else:
+                    self._send(200, "Ollama is running")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if self.path != "/api/generate":
+                    self._send(404, {"error": "not found"})
+                    return
+                if not request.get("stream", True):
+                    self._send(*server.generate(request))
+                    return
+                parts = server.generate_stream(request)
+                try:
+                    status, part = next(parts)
+                    if status != 200:
+                        self._send(status, part)
+                        return
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.end_headers()
+                    for part in chain([part], (part for _, part in parts)):
+                        self.wfile.write(json.dumps(part).encode("utf-8") + b"\n")
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    with server.lock:
+                        server.stats["abandoned"] += 1
+                finally:
+                    parts.close()
+
+            def _send(self, status, payload):
+                body = payload.encode("utf-8") if isinstance(payload, str) else json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain" if isinstance(payload, str) else "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def generate_stream(self, request: Dict) -> Iterator[Tuple[int, Dict]]:
+        """Yield the (status, part) pairs of a streamed /api/generate request; a failure is a single pair."""
+        with self.lock:
+            fail = self.random.random() < self.error_rate
+            stall = self.random.random() < self.stall_rate
+            self.stats["requests"] += 1
+        with self.slots:
+            start = time.perf_counter()
+            prompt = request.get("prompt", "")
+            words = fake_summary(prompt).split(" ")
+            limit = (request.get("options") or {}).get("num_predict") or 0
+            done_reason = "length" if 0 < limit < len(words) else "stop"
+            words = words[:limit] if done_reason == "length" else words
+            time.sleep(self.latency + (self.stall_seconds if stall else 0.0))
+            first_token = time.perf_counter()
+            if fail:
+                with self.lock:
+                    self.stats[500] += 1
+                yield 500, {"error": "stand-in generation failure"}
+                return
+            for i, word in enumerate(words):
+                if i and self.tokens_per_second:
+                    time.sleep(1.0 / self.tokens_per_second)
+                yield 200, {"model": request.get("model", ""),
+                            "created_at": datetime.now(timezone.utc).isoformat(),
+                            "response": word if i == 0 else " " + word, "done": False}
+        with self.lock:
+            self.stats[200] += 1
+        end = time.perf_counter()
+        yield 200, {
+            "model": request.get("model", ""),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "response": "",
+            "done": True,
+            "done_reason": done_reason,
+            "total_duration": int((end - start) * 1e9),
+            "prompt_eval_count": len(prompt.split()),
+            "eval_count": len(words),
+            "eval_duration": int((end - first_token) * 1e9),
+        }
+
+    def generate(self, request: Dict) -> Tuple[int, Dict]:
+        """Return (status, response) for a non-streamed /api/generate request."""
+        parts = list(self.generate_stream(request))
+        status, response = parts[-1]
+        if status == 200:
+            response["response"] = "".join(part["response"] for _, part in parts)
+        return status, response
+
+    def start(self) -> "OllamaStandin":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Ollama API stand-in server")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--parallel", type=int, default=2, help="Generations handled at once")
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds added to every generation")
+    parser.add_argument("--tokens-per-second", type=float, default=20.0,
+                        help="Generation speed (0: instant)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of generations answered with 500")
+    parser.add_argument("--stall-rate", type=float, default=0.0,
+                        help="Fraction of generations hanging before their first token")
+    parser.add_argument("--stall-seconds", type=float, default=60.0, help="How long stalled generations hang")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    server = OllamaStandin(port=args.port, parallel=args.parallel, latency=args.latency,
+                           tokens_per_second=args.tokens_per_second, error_rate=args.error_rate,
+                           stall_rate=args.stall_rate, stall_seconds=args.stall_seconds, seed=args.seed)
+    print(f"Ollama stand-in on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"Served: {dict(server.stats)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Parity and timing check of the fast patent page extractor against full parses.
+
+Usage: python -m src.scraper.parity [DIR]
+
+Pages are the *.html files in DIR, or every patent page in the HTTP cache when
+no directory is given. Exits non-zero if any field differs from what
+`get_scraped_data` (plus the custom fields) returns on a full html.parser tree.
+"""
+
+import glob
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+from .cache import get_http_cache
+from .extractor import build_patent_dict, extract_patent_data, get_html_parser
+
+def compare_with_full_parse(html: str, patent: str = '', url: str = '',
+                            fetch_full_text: bool = True) -> Dict[str, Tuple]:
+    """Return {field: (full parse value, fast value)} for every field that differs."""
+    full = build_patent_dict(BeautifulSoup(html, 'html.parser'), patent, url, fetch_full_text)
+    fast = extract_patent_data(html, patent, url, fetch_full_text)
+    return {key: (full.get(key), fast.get(key)) for key in set(full) | set(fast)
+            if full.get(key) != fast.get(key)}
+
+def iter_saved_pages(directory: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+    """Yield (name, html) for *.html files in a directory, or for cached patent pages."""
+    if directory:
+        for path in sorted(glob.glob(os.path.join(directory, '*.html'))):
+            with open(path, 'r', encoding='utf-8') as f:
+                yield os.path.splitext(os.path.basename(path))[0], f.read()
+        return
+
+    cache = get_http_cache()
+    for ref_path in sorted(glob.glob(os.path.join(cache.directory, 'refs', 'patent', '*', '*.json'))):
+        with open(ref_path, 'r', encoding='utf-8') as f:
+            ref = json.load(f)
+        body = cache.get('patent', ref['url'])
+        if body is not None:
+            yield ref['url'].rsplit('/', 1)[-1], body.decode('utf-8')
+
+def check_parity(directory: Optional[str] = None) -> List[str]:
+    """Compare the fast extractor with full parses over saved pages; returns mismatching pages."""
+    mismatches = []
+    timings = {'full': 0.0, 'fast': 0.0, 'fast_full_text': 0.0}
+    pages = 0
+    for name, html in iter_saved_pages(directory):
+        pages += 1
+        start = time.perf_counter()
+        full = BeautifulSoup(html, 'html.parser')
+        build_patent_dict(full, name, '', fetch_full_text=False)
+        timings['full'] += time.perf_counter() - start
+        start = time.perf_counter()
+        extract_patent_data(html, name, '', fetch_full_text=False)
+        timings['fast'] += time.perf_counter() - start
+        start = time.perf_counter()
+        extract_patent_data(html, name, '', fetch_full_text=True)
+        timings['fast_full_text'] += time.perf_counter() - start
+
+        diffs = compare_with_full_parse(html, name, '')
+        if diffs:
+            mismatches.append(name)
+            print(f"MISMATCH {name}: {sorted(diffs)}")
+
+    print(f"Checked {pages} pages, {len(mismatches)} mismatches")
+    if pages:
+        print(f"Per page: full html.parser {timings['full'] / pages * 1000:.1f} ms, "
+              f"fast ({get_html_parser()}) {timings['fast'] / pages * 1000:.1f} ms, "
+              f"fast with full text {timings['fast_full_text'] / pages * 1000:.1f} ms")
+    return mismatches
+
+if __name__ == "__main__":
+    sys.exit(1 if check_parity(sys.argv[1] if len(sys.argv) > 1 else None) else 0)
@@ -0,0 +1,47 @@
+"""Process pool for parsing patent pages off the main process.
+
+Parsing is CPU-bound and holds the GIL, so with many fetch threads it becomes
+the bottleneck. Pages are sent to worker processes in chunks and come back as
+the plain dicts built by extract_patent_data.
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from .extractor import extract_patent_data
+
+# (patent, status, html, url, fetch_full_text, return_abstract)
+PageJob = Tuple[str, str, Optional[str], Optional[str], bool, bool]
+
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+def parse_pages(jobs: List[PageJob]) -> List[Tuple[str, str, Optional[Dict], Optional[str]]]:
+    """Parse a chunk of fetched pages, returning (patent, status, patent_dict, url) for each.
+    
+    Pages that failed to download are passed through with their status, so a
+    chunk keeps the order of the pages it was built from.
+    """
+    results = []
+    for patent, status, html, url, fetch_full_text, return_abstract in jobs:
+        patent_dict = None
+        if status == 'Success':
+            try:
+                patent_dict = extract_patent_data(html, patent, url, fetch_full_text, return_abstract)
+            except Exception as e:
+                status = f'Parse error: {e}'
+        results.append((patent, status, patent_dict, url))
+    return results
+
+def get_parse_pool(workers: int) -> ProcessPoolExecutor:
+    """Return the process-wide parse pool with the given number of workers.
+    
+    Workers are spawned rather than forked, since the pool is started while
+    fetch threads hold sockets and locks. They are started once and reused.
+    """
+    with _pools_lock:
+        if workers not in _pools:
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers,
+                                                  mp_context=multiprocessing.get_context("spawn"))
+        return _pools[workers]
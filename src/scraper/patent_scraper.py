@@ -1,103 +1,195 @@
 """Main patent scraping logic."""
 
-import time
 import json
 from typing import List, Dict, Optional, Tuple
-from .fetcher import ExtendedScraper, build_search_params, fetch_patents_data, extract_patent_numbers_from_json
-from ..config import DEFAULT_PATENT_LIMIT, SCRAPING_DELAY
+from .fetcher import ExtendedScraper, build_search_params, iter_search_pages
+from .rate_limiter import AdaptiveRateLimiter
+from .cache import CacheMissError
+from ..config import (
+    DEFAULT_PATENT_LIMIT, SCRAPING_MAX_WORKERS, PATENT_REFRESH_DAYS, PARSE_WORKERS, SEARCH_DATE_TYPE
+)
+from ..database import get_known_patents, CrawlJournal
+from ..database.journal import DISCOVERED, FETCHED, FILTERED, KNOWN, NER_DONE
 from ..utils import extract_country_code
-from .prompt_eng import summarize_with_ollama
-from langdetect import detect
+from .language import get_language_filter
 
-def is_english_text(text: str) -> bool:
-    try:
-        return detect(text) == "en"
-    except Exception:
-        return False
+def is_english_text(text: str, patent_number: Optional[str] = None, language: Optional[str] = None) -> bool:
+    """Check if a patent text is English, using its language code or jurisdiction when known."""
+    return get_language_filter().is_english(text, patent_number, language)
+
+def format_patent_data(pn: str, parsed: Dict) -> Dict:
+    """Build the database record for a parsed patent (without the AI summary)."""
+    # Extract jurisdiction from patent number
+    jurisdiction = extract_country_code(pn)
+    
+    # Parse international patent family
+    forward_cites = json.loads(parsed.get('forward_cite_no_family', '[]')) + json.loads(parsed.get('forward_cite_yes_family', '[]'))
+    backward_cites = json.loads(parsed.get('backward_cite_no_family', '[]')) + json.loads(parsed.get('backward_cite_yes_family', '[]'))
+    intl_family = list(set([cite['patent_number'] for cite in forward_cites + backward_cites if cite['patent_number'] != pn]))
+    intl_family_str = ", ".join(intl_family) if intl_family else None
+    
+    # Calculate citation count
+    citation_count = len(forward_cites)
+    return {
+        "patent_number": pn,
+        "title": parsed.get('title', ''),
+        "abstract": parsed.get('abstract_text', ''),
+        "publication_date": parsed.get('pub_date', ''),
+        "filing_date": parsed.get('priority_date', ''),
+        "inventors": ", ".join([inv['inventor_name'] for inv in json.loads(parsed['inventor_name'])] if parsed.get('inventor_name') else []),
+        "assignees": ", ".join([ass['assignee_name'] for ass in json.loads(parsed['assignee_name_current'])] if parsed.get('assignee_name_current') else []),
+        "ipc_codes": ", ".join(parsed.get('ipc_code', [])),
+        "assignee_location": parsed.get('assignee_location', ''),
+        "full_text": parsed.get('full_text', ''),
+        "jurisdiction": jurisdiction,
+        "international_family": intl_family_str,
+        "citation_count": citation_count
+    }
+
+def open_fetch_journal(keyword: str, ipc_codes: Optional[List[str]] = None,
+                       limit: int = DEFAULT_PATENT_LIMIT, fetch_full_text: bool = False,
+                       after: Optional[str] = None, before: Optional[str] = None,
+                       date_type: str = SEARCH_DATE_TYPE) -> CrawlJournal:
+    """Open the crawl journal of a fetch run; a rerun with the same arguments resumes it."""
+    query = {"keyword": keyword, "ipc_codes": ipc_codes or [], "limit": limit, "full_text": fetch_full_text}
+    if after or before:
+        query["dates"] = [date_type, str(after or ""), str(before or "")]
+    return CrawlJournal("fetch", query)
 
 def fetch_patents(keyword: str, ipc_codes: Optional[List[str]] = None, 
-                 limit: int = DEFAULT_PATENT_LIMIT, fetch_full_text: bool = False) -> Tuple[List[Dict], str]:
-    """Fetch patents matching keyword and IPC codes, with detailed scraping."""
-    scraper = ExtendedScraper(return_abstract=True)
-    search_params = build_search_params(keyword, ipc_codes)
-    page = 0
+                 limit: int = DEFAULT_PATENT_LIMIT, fetch_full_text: bool = False,
+                 max_workers: int = SCRAPING_MAX_WORKERS, check_database: bool = True,
+                 refresh_days: Optional[int] = PATENT_REFRESH_DAYS,
+                 journal: Optional[CrawlJournal] = None,
+                 parse_workers: int = PARSE_WORKERS,
+                 after: Optional[str] = None, before: Optional[str] = None,
+                 date_type: str = SEARCH_DATE_TYPE) -> Tuple[List[Dict], str]:
+    """Fetch patents matching keyword and IPC codes, with detailed scraping.
+    
+    Patents already in the database are looked up in bulk before any page is
+    requested. Fresh ones are skipped; ones fetched more than `refresh_days` ago
+    are re-scraped and returned with "refresh_only": True so only their
+    citation data is updated (no new summary or NER). Both count towards `limit`.
+    
+    With a journal (see open_fetch_journal), the search page cursor and every
+    patent's state are recorded as the run progresses, and a resumed journal
+    picks up from where the interrupted run stopped.
+    
+    `after`/`before` (YYYY-MM-DD) restrict the search to patents whose
+    `date_type` date falls in that window, so older ones are never requested.
+    With `parse_workers`, patent pages are parsed in that many processes.
+    New patents are returned without an "ai_summary"; summarizing them is a
+    separate stage (see summarizer.py).
+    """
+    scraper = ExtendedScraper(return_abstract=True, max_workers=max_workers, parse_workers=parse_workers)
+    language_filter = get_language_filter()
+    search_params = build_search_params(keyword, ipc_codes, after=after, before=before, date_type=date_type)
     patent_numbers = []
-    aux = []
-    # Collect patent numbers from search results
-    while len(patent_numbers) < limit:
-        if page > 0:
-            search_params["page"] = page
-        else:
-            search_params.pop("page", None)
-        json_data = fetch_patents_data(search_params)
-        page_patents = extract_patent_numbers_from_json(json_data)
-        
-        for patent in page_patents:
-            print("Processing patent:", patent)
-            result, soup, url =  scraper.request_single_patent(patent)
-            if result != 'Success':
-                print(f"Error fetching patent {patent}: {result}")
-                page_patents.remove(patent)
-                continue
-            patent_dict = scraper.get_scraped_data(soup, patent, url)
-            abstract = patent_dict.get('abstract_text', '')
-            if(not is_english_text(abstract)):
-                page_patents.remove(patent)
-                continue
-            else:
-                aux.append(patent) # this process right here might be a bottleneck, as it deletes patents that are not in English and this process is kinda slow by now, we might 
-                                   # investigate to see if we can do this in parallel or something like that   
-        # if not page_patents:
-            # break
-        patent_numbers.extend(aux[:limit - len(patent_numbers)])
-        # if len(page_patents) < 10:
-            # break
-        page += 1
-        time.sleep(1)
+    stale_patents = set()
+    seen = set()
+    skipped = 0
+    start_page = 0
+    
+    if journal is not None and journal.resumed:
+        for pn, entry in journal.entries().items():
+            seen.add(pn)
+            if entry['state'] == KNOWN:
+                skipped += 1
+            elif entry['state'] in (FETCHED, NER_DONE) and entry['data']:
+                scraper.parsed_patents[pn] = entry['data']['parsed']
+                patent_numbers.append(pn)
+                if entry['data'].get('refresh_only'):
+                    stale_patents.add(pn)
+            elif entry['state'] == DISCOVERED:
+                seen.discard(pn)
+        start_page = journal.cursor.get('next_page', 0)
+        print(f"Resuming fetch run at search page {start_page} with {len(patent_numbers)} patents "
+              f"already fetched and {skipped} skipped")
+    
+    # Search result pages are prefetched while the patents of the current page are
+    # downloaded; both loops stop as soon as `limit` patents have been accepted.
+    try:
+        for page, search_results in iter_search_pages(search_params, start_page=start_page):
+            if len(patent_numbers) + skipped >= limit:
+                break
+            # Candidates that the search metadata marks as non-English are never downloaded
+            search_languages = {result["publication_number"]: result["language"] for result in search_results}
+            page_patents = [pn for pn in search_languages if pn not in seen
+                            and language_filter.should_fetch(pn, search_languages[pn])]
+            known = get_known_patents(page_patents, refresh_days) if check_database else {}
+            pending = []
+            for pn in page_patents:
+                if pn not in known:
+                    pending.append(pn)
+                elif known[pn]['stale']:
+                    stale_patents.add(pn)
+                    pending.append(pn)
+                elif len(patent_numbers) + skipped < limit:
+                    print(f"Skipping patent {pn}: already in database (fetched {known[pn]['fetch_date']})")
+                    skipped += 1
+                    seen.add(pn)
+                    if journal is not None:
+                        journal.record(pn, KNOWN)
+            if journal is not None:
+                journal.record_many(pending, DISCOVERED)
+            if len(patent_numbers) + skipped >= limit:
+                break
 
-    # Add patent numbers to scraper
-    for pn in patent_numbers:
-        scraper.add_patents(pn)
+            def accept(batch: List[Tuple[str, Dict]]) -> None:
+                # The languages of a batch of fetched abstracts are decided in one call
+                checked = [(patent, patent_dict) for patent, patent_dict in batch if patent not in stale_patents]
+                english = dict(zip([patent for patent, _ in checked], language_filter.detect_batch(
+                    [patent_dict.get('abstract_text', '') for _, patent_dict in checked],
+                    [patent for patent, _ in checked],
+                    [patent_dict.get('abstract_language') or search_languages.get(patent)
+                     for patent, patent_dict in checked])))
+                for patent, patent_dict in batch:
+                    if patent in stale_patents or english[patent]:
+                        scraper.parsed_patents[patent] = patent_dict
+                        patent_numbers.append(patent)
+                        if journal is not None:
+                            journal.record(patent, FETCHED, {'parsed': patent_dict,
+                                                             'refresh_only': patent in stale_patents})
+                    elif journal is not None:
+                        journal.record(patent, FILTERED)
+
+            # Pages are requested concurrently; the shared rate limiter paces the requests.
+            # Each page is parsed once and the result kept for the accepted patents.
+            # Stale patents are re-downloaded rather than read back from the HTTP cache.
+            # Fetched pages are filtered together once they could fill the limit, or at the end of the page.
+            batch = []
+            for patent, result, patent_dict, url in scraper.request_parsed_patents(pending, fetch_full_text,
+                                                                                   stale_patents, stale_patents):
+                print("Processing patent:", patent)
+                if result != 'Success':
+                    print(f"Error fetching patent {patent}: {result}")
+                    continue
+                seen.add(patent)
+                batch.append((patent, patent_dict))
+                if len(patent_numbers) + skipped + len(batch) >= limit:
+                    accept(batch)
+                    batch = []
+                    if len(patent_numbers) + skipped >= limit:
+                        break
+            else:
+                accept(batch)
+                if journal is not None:
+                    journal.save_cursor(next_page=page + 1)
+    except CacheMissError as e:
+        print(e)
 
-    # Scrape detailed data for all patents
-    scraper.scrape_all_patents(fetch_full_text=fetch_full_text)
+    if skipped:
+        print(f"Skipped {skipped} patents already in the database")
+    if isinstance(scraper.rate_limiter, AdaptiveRateLimiter):
+        print(f"Google Patents requests: {scraper.rate_limiter.summary()}")
 
     # Collect and format patent data
     patents = []
     for pn in patent_numbers:
         if pn in scraper.parsed_patents:
-            parsed = scraper.parsed_patents[pn]
-            # Extract jurisdiction from patent number
-            jurisdiction = extract_country_code(pn)
-            
-            # Parse international patent family
-            forward_cites = json.loads(parsed.get('forward_cite_no_family', '[]')) + json.loads(parsed.get('forward_cite_yes_family', '[]'))
-            backward_cites = json.loads(parsed.get('backward_cite_no_family', '[]')) + json.loads(parsed.get('backward_cite_yes_family', '[]'))
-            intl_family = list(set([cite['patent_number'] for cite in forward_cites + backward_cites if cite['patent_number'] != pn]))
-            intl_family_str = ", ".join(intl_family) if intl_family else None
-            
-            # Calculate citation count
-            citation_count = len(forward_cites)
-            abstract = parsed.get('abstract_text', '')
-            full_text = parsed.get('full_text', '')
-            # print(is_english_text(abstract))
-            data = {
-                "patent_number": pn,
-                "title": parsed.get('title', ''),
-                "abstract": abstract,
-                "publication_date": parsed.get('pub_date', ''),
-                "filing_date": parsed.get('priority_date', ''),
-                "inventors": ", ".join([inv['inventor_name'] for inv in json.loads(parsed['inventor_name'])] if parsed.get('inventor_name') else []),
-                "assignees": ", ".join([ass['assignee_name'] for ass in json.loads(parsed['assignee_name_current'])] if parsed.get('assignee_name_current') else []),
-                "ipc_codes": ", ".join(parsed.get('ipc_code', [])),
-                "assignee_location": parsed.get('assignee_location', ''),
-                "full_text": full_text,
-                "jurisdiction": jurisdiction,
-                "international_family": intl_family_str,
-                "citation_count": citation_count,
-                "ai_summary" : summarize_with_ollama(abstract, full_text)
-            }
-            # print(data["ai_summary"])
+            data = format_patent_data(pn, scraper.parsed_patents[pn])
+            if pn in stale_patents:
+                data["refresh_only"] = True
             patents.append(data)
 
     ipc_filter = ",".join(ipc_codes) if ipc_codes else "None"
@@ -1,16 +1,26 @@
+import asyncio
+import time
 import ollama
+from .chunking import chunk_text, estimate_tokens
+from .summary_cache import get_summary_cache
+from ..config import (OLLAMA_MODEL, OLLAMA_HOST, SUMMARY_CONCURRENCY, SUMMARY_TIMEOUT, SUMMARY_DEADLINE,
+                      SUMMARY_MAX_TOKENS, SUMMARY_ERROR_PREFIX, SUMMARY_DONE, SUMMARY_FAILED, SUMMARY_TIMED_OUT,
+                      SUMMARY_NUM_CTX, SUMMARY_RESPONSE_TOKENS, SUMMARY_CHUNK_TOKENS, SUMMARY_MAX_CHUNKS)
 
-def summarize_with_ollama(abstract, full_text, model="qwen2.5:7b"):
-    """
-    Generate a summary of chemical reaction text using Ollama
-    Args:
-    text (str): The text to summarize
-    model (str): Ollama model to use (qwen2.5:7b handles long contexts well)
-    Returns:
-    str: Generated summary or error message
-    """
-    text =  full_text if full_text is not None else abstract
-    prompt = f"""Please provide a concise scientific resume of this chemical reaction report. Focus on:
+# Bump when the prompt below changes, so cached summaries of the old prompt are not reused
+SUMMARY_PROMPT_VERSION = 1
+# Same for the chunk and reduce prompts of long texts
+MAP_REDUCE_PROMPT_VERSION = 1
+SUMMARY_OPTIONS = {
+    "temperature": 0.3, # Lower temperature for more focused summaries
+    "top_p": 0.9,
+    "num_ctx": SUMMARY_NUM_CTX, # Context window size - adjust based on your model
+    "num_predict": SUMMARY_MAX_TOKENS # Output token budget, so a rambling generation cannot run for minutes
+}
+
+def build_summary_prompt(text):
+    """Prompt asking for the Process/Method/Outcome summary of a text."""
+    return f"""Please provide a concise scientific resume of this chemical reaction report. Focus on:
         1. The usage of this patent in the context of chemical reactions
         2. Any notable observations or results
         I want a small resume to know the main points of this chemical reaction report. Just answer with the context of the text, do not include any other conclusion. Follow this steps:
@@ -23,19 +33,221 @@ def summarize_with_ollama(abstract, full_text, model="qwen2.5:7b"):
 
         Summary:"""
 
+def summary_text(abstract, full_text):
+    """Text to summarize: the full text when it was scraped, otherwise the abstract."""
+    return full_text if full_text else abstract
+
+def build_chunk_prompt(text, headings=()):
+    """Prompt asking for notes on one part of a long text."""
+    sections = ", ".join(heading for heading in headings if heading) or "untitled"
+    return f"""Please extract the key points of this part of a chemical patent (sections: {sections}). Focus on:
+        1. The chemical reactions, reagents, catalysts and conditions described
+        2. The products, yields and any notable observations or results
+        Answer with short notes. Just answer with the context of the text, do not include any other conclusion.
+        Text to resume:
+        {text}
+
+        Summary:"""
+
+def build_reduce_prompt(notes):
+    """Prompt combining the notes on every part of a long text into the Process/Method/Outcome summary."""
+    return f"""Please provide a concise scientific resume of this chemical reaction report, given notes taken on its consecutive parts. Focus on:
+        1. The usage of this patent in the context of chemical reactions
+        2. Any notable observations or results
+        I want a small resume to know the main points of this chemical reaction report. Just answer with the context of the notes, do not include any other conclusion. Follow this steps:
+        ***Process***:
+        ***Method***
+        (Any notable observation, if interesting as ***Insight***)
+        ***Outcome***:
+        Text to resume:
+        {notes}
+
+        Summary:"""
+
+def prompt_budget(build_prompt):
+    """Estimated tokens of text that fit in a prompt next to its instructions and the generated summary."""
+    return SUMMARY_NUM_CTX - SUMMARY_RESPONSE_TOKENS - estimate_tokens(build_prompt(""))
+
+def needs_map_reduce(text):
+    """Whether a text is too long to be summarized in a single prompt."""
+    return estimate_tokens(text) > prompt_budget(build_summary_prompt)
+
+def map_reduce_options():
+    """Options identifying map-reduce summaries in the cache; chunking changes produce new summaries."""
+    return {**SUMMARY_OPTIONS, "chunk_tokens": SUMMARY_CHUNK_TOKENS, "max_chunks": SUMMARY_MAX_CHUNKS}
+
+def summarize_with_ollama(abstract, full_text, model=OLLAMA_MODEL, cache=None, stats=None, metrics=None):
+    """
+    Generate a summary of chemical reaction text using Ollama
+    Summaries are cached by text, model, prompt version and options, so the
+    same text is never summarized twice; failed generations are not cached.
+    Texts longer than the context window are summarized by chunks, see
+    summarize_with_ollama_async.
+    Args:
+    text (str): The text to summarize
+    model (str): Ollama model to use (qwen2.5:7b handles long contexts well)
+    cache (SummaryCache): Cache to use instead of the process-wide one
+    stats (dict): Updated with the status and token counts of the text, if given
+    metrics (GenerationMetrics): Records the latency of every generation, if given
+    Returns:
+    str: Generated summary or error message
+    """
+    async def run():
+        client = ollama.AsyncClient(host=OLLAMA_HOST, timeout=SUMMARY_TIMEOUT)
+        try:
+            return await summarize_with_ollama_async(client, abstract, full_text, model, cache, stats=stats,
+                                                     metrics=metrics)
+        finally:
+            await client._client.aclose()  # ollama.AsyncClient has no public close
+    return asyncio.run(run())
+
+async def stream_generate(client, prompt, model, deadline=SUMMARY_DEADLINE, metrics=None, kind="summary"):
+    """
+    Stream a generation, abandoning it after `deadline` seconds
+    The options cap its length at SUMMARY_MAX_TOKENS output tokens. Time to
+    first token, latency and tokens per second are recorded in `metrics`.
+    Raises asyncio.TimeoutError past the deadline, and the client's errors.
+    """
+    start = time.perf_counter()
+    parts, final, first_token = [], None, None
+
+    async def consume():
+        nonlocal final, first_token
+        async for part in await client.generate(model=model, prompt=prompt, options=SUMMARY_OPTIONS, stream=True):
+            if part.get('response'):
+                if first_token is None:
+                    first_token = time.perf_counter()
+                parts.append(part['response'])
+            if part.get('done'):
+                final = part
+
+    status = SUMMARY_FAILED
+    try:
+        await asyncio.wait_for(consume(), deadline)
+        status = SUMMARY_DONE
+    except asyncio.TimeoutError:
+        status = SUMMARY_TIMED_OUT
+        raise
+    finally:
+        if metrics is not None:
+            end = time.perf_counter()
+            final = final or {}
+            output_tokens = final.get('eval_count') or len(parts)
+            if final.get('eval_duration'):
+                speed = output_tokens / (final['eval_duration'] / 1e9)
+            elif first_token is not None and len(parts) > 1 and end > first_token:
+                speed = (len(parts) - 1) / (end - first_token)
+            else:
+                speed = None
+            metrics.record(kind, status, end - start, first_token - start if first_token else None,
+                           final.get('prompt_eval_count') or 0, output_tokens, speed,
+                           final.get('done_reason') == "length")
+    return "".join(parts)
+
+async def generate_cached(client, prompt, model, semaphore, cache=None, key=None, prompt_version=None,
+                          metrics=None, kind="summary"):
+    """Generate a response holding one of the semaphore's slots, reusing and storing it under `key` if given."""
+    if key is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    async with semaphore:
+        # The deadline starts once a slot is free: waiting for one is not the server's fault
+        response = await stream_generate(client, prompt, model, metrics=metrics, kind=kind)
+    if key is not None:
+        cache.put(key, response, model, prompt_version)
+    return response
+
+def group_notes(notes, budget):
+    """Pack consecutive notes into groups of at most `budget` estimated tokens."""
+    groups = [[]]
+    for note in notes:
+        if groups[-1] and estimate_tokens("\n\n".join(groups[-1] + [note])) > budget:
+            groups.append([])
+        groups[-1].append(note)
+    return groups
+
+async def map_reduce_summary(client, text, model, cache, semaphore, stats, metrics=None):
+    """
+    Summarize a long text: notes are taken on section-aware chunks of it
+    concurrently (map), then combined into one summary (reduce). Notes too
+    long for one reduce prompt are first condensed group by group.
+    Notes are cached by chunk, so a retry after a failure only regenerates
+    the missing ones.
+    """
+    chunk_budget = min(SUMMARY_CHUNK_TOKENS, prompt_budget(build_chunk_prompt))
+    chunks, tokens = chunk_text(text, chunk_budget, SUMMARY_MAX_CHUNKS)
+    stats.update(tokens_total=tokens["total"], tokens_processed=tokens["processed"],
+                 tokens_discarded=tokens["discarded"], chunks=len(chunks))
+    key = cache.summary_key(text, model, f"map-reduce-{MAP_REDUCE_PROMPT_VERSION}", map_reduce_options())
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    chunk_version = f"chunk-{MAP_REDUCE_PROMPT_VERSION}"
+    notes = await asyncio.gather(*(
+        generate_cached(client, build_chunk_prompt(chunk.text, chunk.headings), model, semaphore, cache,
+                        cache.summary_key(chunk.text, model, chunk_version, SUMMARY_OPTIONS), chunk_version,
+                        metrics, "chunk")
+        for chunk in chunks))
+    notes = [f"{' / '.join(filter(None, chunk.headings)) or 'Part'}:\n{note.strip()}"
+             for chunk, note in zip(chunks, notes)]
+
+    while len(notes) > 1 and estimate_tokens("\n\n".join(notes)) > prompt_budget(build_reduce_prompt):
+        groups = group_notes(notes, chunk_budget)
+        if len(groups) == len(notes):
+            break  # every note fills a prompt on its own; condensing them further would not help
+        notes = await asyncio.gather(*(
+            generate_cached(client, build_chunk_prompt("\n\n".join(group)), model, semaphore,
+                            metrics=metrics, kind="condense")
+            for group in groups))
+
+    summary = await generate_cached(client, build_reduce_prompt("\n\n".join(notes)), model, semaphore,
+                                    metrics=metrics, kind="reduce")
+    cache.put(key, summary, model, f"map-reduce-{MAP_REDUCE_PROMPT_VERSION}")
+    return summary
+
+async def summarize_with_ollama_async(client, abstract, full_text, model=OLLAMA_MODEL, cache=None,
+                                      semaphore=None, stats=None, metrics=None):
+    """
+    Same as summarize_with_ollama, through an ollama.AsyncClient
+    Texts longer than the context window are split into section-aware
+    chunks summarized concurrently, then reduced to one summary, instead of
+    being truncated by the model. Every generation is streamed and abandoned
+    after SUMMARY_DEADLINE seconds.
+    Args:
+    client (ollama.AsyncClient): Client of the Ollama server
+    semaphore (asyncio.Semaphore): Bounds the generations in flight, shared by
+        every chunk of every text (SUMMARY_CONCURRENCY slots if not given)
+    stats (dict): Updated with the status (SUMMARY_DONE, SUMMARY_FAILED or
+        SUMMARY_TIMED_OUT), tokens_total, tokens_processed, tokens_discarded
+        and chunks of the text, if given
+    metrics (GenerationMetrics): Records the latency of every generation, if given
+    Returns:
+    str: Generated summary or error message
+    """
+    text = summary_text(abstract, full_text)
+    cache = cache or get_summary_cache()
+    semaphore = semaphore or asyncio.Semaphore(SUMMARY_CONCURRENCY)
+    stats = {} if stats is None else stats
+
     try:
-        response = ollama.generate(
-        model=model,
-        prompt=prompt,
-        options={
-        "temperature": 0.3, # Lower temperature for more focused summaries
-        "top_p": 0.9,
-        "num_ctx": 8192 # Context window size - adjust based on your model
-        }
-        )
-        return response['response']
+        if needs_map_reduce(text):
+            summary = await map_reduce_summary(client, text, model, cache, semaphore, stats, metrics)
+        else:
+            stats.update(tokens_total=estimate_tokens(text), tokens_processed=estimate_tokens(text),
+                         tokens_discarded=0, chunks=1)
+            key = cache.summary_key(text, model, SUMMARY_PROMPT_VERSION, SUMMARY_OPTIONS)
+            summary = await generate_cached(client, build_summary_prompt(text), model, semaphore, cache, key,
+                                            SUMMARY_PROMPT_VERSION, metrics)
+        stats["status"] = SUMMARY_DONE
+        return summary
+    except asyncio.TimeoutError:
+        stats["status"] = SUMMARY_TIMED_OUT
+        return f"{SUMMARY_ERROR_PREFIX}: no response within {SUMMARY_DEADLINE}s"
     except Exception as e:
-        return f"Error generating summary: {str(e)}"
+        stats["status"] = SUMMARY_FAILED
+        return f"{SUMMARY_ERROR_PREFIX}: {str(e)}"
 
 if __name__ == "__main__":
 # sample_dir = "./chemu_sample/ner"
@@ -0,0 +1,64 @@
+"""Planning of Google Patents searches for several keyword/IPC buckets.
+
+Searching every keyword of every bucket separately returns many of the same
+patents over and over. The planner merges each bucket's keywords into as few
+OR-queries as the search syntax allows, and the candidates of all queries are
+deduplicated before any patent page is fetched (see tendency.py).
+"""
+
+from typing import Dict, List, NamedTuple, Optional
+
+from .fetcher import build_search_params
+from ..config import SEARCH_OR_QUERIES, SEARCH_MAX_OR_TERMS, SEARCH_DATE_TYPE
+
+class PlannedSearch(NamedTuple):
+    """One search to run: the bucket its results are attributed to, its keywords and XHR parameters."""
+    bucket: str
+    keywords: List[str]
+    params: Dict
+
+def quote_term(keyword: str) -> str:
+    """Search term for a keyword; phrases are quoted so they match as a whole."""
+    keyword = keyword.strip()
+    return f'"{keyword}"' if " " in keyword else keyword
+
+def build_or_query(keywords: List[str]) -> str:
+    """Combine keywords into one query matching any of them."""
+    terms = [quote_term(keyword) for keyword in keywords]
+    return terms[0] if len(terms) == 1 else "(" + " OR ".join(terms) + ")"
+
+def drop_redundant_keywords(keywords: List[str]) -> List[str]:
+    """Drop keywords that cannot widen an OR-query.
+
+    A phrase containing every word of a shorter keyword (e.g. "polymer coating"
+    next to "coating") only matches patents the shorter keyword already matches.
+    """
+    unique = list(dict.fromkeys(keyword.strip().lower() for keyword in keywords if keyword.strip()))
+    words = {keyword: set(keyword.split()) for keyword in unique}
+    return [keyword for keyword in unique
+            if not any(other != keyword and words[other] < words[keyword] for other in unique)]
+
+def plan_searches(targets: Dict[str, List[str]], or_queries: bool = SEARCH_OR_QUERIES,
+                  max_terms: int = SEARCH_MAX_OR_TERMS, after: Optional[str] = None,
+                  before: Optional[str] = None, date_type: str = SEARCH_DATE_TYPE) -> List[PlannedSearch]:
+    """Plan the searches for {IPC code: keywords} buckets.
+
+    With or_queries, each bucket's keywords are searched together in
+    OR-queries of at most `max_terms` terms; otherwise every keyword is a
+    separate search, as the site would need without OR support. Every search
+    is restricted to the after/before date window.
+    """
+    def search(bucket, keywords, query):
+        return PlannedSearch(bucket, keywords, build_search_params(query, [bucket], after=after, before=before,
+                                                                   date_type=date_type))
+
+    searches = []
+    for bucket, keywords in targets.items():
+        if not or_queries:
+            searches.extend(search(bucket, [keyword], keyword) for keyword in keywords)
+            continue
+        keywords = drop_redundant_keywords(keywords)
+        for start in range(0, len(keywords), max(1, max_terms)):
+            group = keywords[start:start + max(1, max_terms)]
+            searches.append(search(bucket, group, build_or_query(group)))
+    return searches
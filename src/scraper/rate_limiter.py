@@ -0,0 +1,189 @@
+"""Rate limiting for requests sent to Google Patents."""
+
+import email.utils
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+
+from .session import get_base_host, http_get
+from ..config import (
+    SCRAPING_RATE, SCRAPING_BURST, SCRAPING_MIN_RATE, SCRAPING_MAX_RATE,
+    SCRAPING_RATE_INCREASE, SCRAPING_RATE_DECREASE, CIRCUIT_BREAKER_THRESHOLD,
+    CIRCUIT_BREAKER_COOLDOWN, CIRCUIT_BREAKER_MAX_COOLDOWN, HTTP_RETRIES, HTTP_THROTTLE_STATUSES
+)
+
+class TokenBucket:
+    """Thread-safe token bucket limiting the request rate to a single host."""
+    def __init__(self, rate: float = SCRAPING_RATE, capacity: float = SCRAPING_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens: float = 1) -> float:
+        """Block until `tokens` are available and consume them. Returns the time waited."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class AdaptiveRateLimiter(TokenBucket):
+    """Token bucket whose rate follows the server's responses (AIMD), with a circuit breaker.
+
+    Every healthy response adds `increase` requests per second, up to
+    `max_rate`; every 429/503 multiplies the rate by `decrease`, down to
+    `min_rate`, and a Retry-After pauses all requests for that long.
+    `threshold` throttled responses in a row open the circuit: the crawl is
+    paused for `cooldown` seconds (doubled on every consecutive trip), then
+    resumes at `min_rate`. Rate changes and pauses are printed as they happen.
+    """
+    def __init__(self, rate: float = SCRAPING_RATE, capacity: float = SCRAPING_BURST,
+                 min_rate: float = SCRAPING_MIN_RATE, max_rate: float = SCRAPING_MAX_RATE,
+                 increase: float = SCRAPING_RATE_INCREASE, decrease: float = SCRAPING_RATE_DECREASE,
+                 threshold: int = CIRCUIT_BREAKER_THRESHOLD, cooldown: float = CIRCUIT_BREAKER_COOLDOWN,
+                 max_cooldown: float = CIRCUIT_BREAKER_MAX_COOLDOWN, name: str = ""):
+        super().__init__(rate, capacity)
+        self.min_rate = min(min_rate, rate)
+        self.max_rate = max(max_rate, rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.name = name
+        self.paused_until = 0.0
+        self.consecutive_throttled = 0
+        self.trips = 0
+        self.reported_rate = rate
+        self.stats = {"healthy": 0, "throttled": 0, "paused_seconds": 0.0, "circuit_trips": 0}
+
+    def acquire(self, tokens: float = 1) -> float:
+        """Wait out any pause, then take `tokens` from the bucket. Returns the time waited."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                pause = self.paused_until - time.monotonic()
+            if pause <= 0:
+                return waited + super().acquire(tokens)
+            time.sleep(pause)
+            waited += pause
+
+    def _set_rate(self, rate: float) -> None:
+        self._refill()
+        self.rate = min(self.max_rate, max(self.min_rate, rate))
+
+    def _pause(self, seconds: float) -> None:
+        until = time.monotonic() + seconds
+        if until > self.paused_until:
+            self.stats["paused_seconds"] += until - max(self.paused_until, time.monotonic())
+            self.paused_until = until
+
+    def summary(self) -> str:
+        """One-line report of the current rate and the back-off so far."""
+        return (f"rate {self.rate:.2f} req/s, {self.stats['healthy']} healthy and "
+                f"{self.stats['throttled']} throttled responses, {self.stats['circuit_trips']} circuit trips, "
+                f"{self.stats['paused_seconds']:.0f}s paused")
+
+    def record(self, status_code: int, retry_after: Optional[float] = None) -> None:
+        """Adjust the rate to the status of a response."""
+        message = None
+        with self.lock:
+            if status_code not in HTTP_THROTTLE_STATUSES:
+                self.stats["healthy"] += 1
+                self.consecutive_throttled = 0
+                self.trips = 0
+                self._set_rate(self.rate + self.increase)
+                if self.rate >= self.reported_rate * 1.25:
+                    self.reported_rate = self.rate
+                    message = f"Rate limiter{self.name}: responses healthy, rate up to {self.rate:.2f} req/s"
+            else:
+                self.stats["throttled"] += 1
+                self.consecutive_throttled += 1
+                previous = self.rate
+                self._set_rate(self.rate * self.decrease)
+                self.reported_rate = self.rate
+                message = (f"Rate limiter{self.name}: HTTP {status_code}, "
+                           f"rate {previous:.2f} -> {self.rate:.2f} req/s")
+                if retry_after:
+                    self._pause(retry_after)
+                    message += f", pausing {retry_after:g}s (Retry-After)"
+                if self.consecutive_throttled >= self.threshold:
+                    cooldown = min(self.max_cooldown, self.cooldown * 2 ** self.trips)
+                    self.trips += 1
+                    self.stats["circuit_trips"] += 1
+                    self.consecutive_throttled = 0
+                    self.tokens = min(1, self.capacity)  # one probe request as soon as the pause ends
+                    self.rate = self.min_rate
+                    self.reported_rate = self.rate
+                    self._pause(cooldown)
+                    message += (f"; circuit open after {self.threshold} throttled responses, pausing the crawl "
+                                f"for {cooldown:g}s, then resuming at {self.rate:.2f} req/s")
+        if message:
+            print(message)
+
+_limiters: Dict[str, TokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(host: Optional[str] = None) -> TokenBucket:
+    """Return the process-wide limiter for `host` (default: the base URL's), creating it on first use."""
+    host = host or get_base_host()
+    with _limiters_lock:
+        if host not in _limiters:
+            _limiters[host] = AdaptiveRateLimiter(name=f" ({host})")
+        return _limiters[host]
+
+def configure_rate_limiter(rate: float = SCRAPING_RATE, capacity: float = SCRAPING_BURST,
+                           host: Optional[str] = None, **options) -> TokenBucket:
+    """Replace the process-wide limiter for `host` (default: the base URL's).
+
+    Options are passed to AdaptiveRateLimiter.
+    """
+    host = host or get_base_host()
+    with _limiters_lock:
+        _limiters[host] = AdaptiveRateLimiter(rate, capacity, name=f" ({host})", **options)
+        return _limiters[host]
+
+def rate_limited_get(url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None,
+                     limiter: Optional[TokenBucket] = None, retries: int = HTTP_RETRIES) -> requests.Response:
+    """GET through the shared session, paced by the limiter and retried on 429/503.
+
+    Every response is reported to an adaptive limiter, which slows down or
+    pauses the following requests; the last throttled response is returned
+    once `retries` are used up.
+    """
+    limiter = limiter or get_rate_limiter()
+    for attempt in range(retries + 1):
+        limiter.acquire()
+        response = http_get(url, params=params, headers=headers)
+        if isinstance(limiter, AdaptiveRateLimiter):
+            limiter.record(response.status_code, parse_retry_after(response.headers.get("Retry-After")))
+        if response.status_code not in HTTP_THROTTLE_STATUSES:
+            break
+    return response
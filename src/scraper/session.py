@@ -0,0 +1,75 @@
+"""Shared HTTP session used by every scraper entry point."""
+
+import threading
+import urllib.parse
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ..config import (
+    HTTP_TIMEOUT, HTTP_RETRIES, HTTP_BACKOFF_FACTOR, HTTP_BACKOFF_JITTER,
+    HTTP_RETRY_STATUSES, SCRAPING_MAX_WORKERS, GOOGLE_PATENTS_URL
+)
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3",
+    "Accept-Language": "en-US,en;q=0.9"
+}
+
+def create_session(retries: int = HTTP_RETRIES, backoff_factor: float = HTTP_BACKOFF_FACTOR,
+                   backoff_jitter: float = HTTP_BACKOFF_JITTER,
+                   pool_size: int = SCRAPING_MAX_WORKERS) -> requests.Session:
+    """Create a keep-alive session that retries 500/502/504 responses with exponential backoff.
+
+    The wait before retry n is backoff_factor * 2 ** (n - 1) plus up to
+    backoff_jitter seconds of random jitter. 429/503 responses, and their
+    Retry-After, are left to the adaptive rate limiter (see
+    rate_limiter.rate_limited_get).
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        backoff_jitter=backoff_jitter,
+        status_forcelist=HTTP_RETRY_STATUSES,
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=False,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(pool_size, 10), max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+_session = None
+_session_lock = threading.Lock()
+_base_url = GOOGLE_PATENTS_URL
+
+def get_base_url() -> str:
+    """Base URL that search and patent page requests are sent to."""
+    return _base_url
+
+def get_base_host() -> str:
+    """Host (with port, if any) of the base URL, used to key rate limiters."""
+    return urllib.parse.urlsplit(_base_url).netloc
+
+def set_base_url(url: str) -> None:
+    """Point the scraper at another Google Patents server, e.g. the local stand-in."""
+    global _base_url
+    _base_url = url.rstrip("/")
+
+def get_session() -> requests.Session:
+    """Return the process-wide pooled session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+def http_get(url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None,
+             timeout=HTTP_TIMEOUT) -> requests.Response:
+    """GET through the shared session with the default timeout and retry policy."""
+    return get_session().get(url, params=params, headers=headers, timeout=timeout)
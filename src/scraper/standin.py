@@ -0,0 +1,298 @@
+"""Local stand-in for the Google Patents endpoints used by the scraper.
+
+Usage:
+    python -m src.scraper.standin record [FIXTURES_DIR]
+    python -m src.scraper.standin serve [FIXTURES_DIR] [--port N] [--latency S]
+                                        [--error-rate P] [--throttle-rate P]
+
+`record` copies the search results and patent pages in the HTTP cache into a
+fixtures directory:
+
+    FIXTURES_DIR/query/<sha1 of the search query string>.json
+    FIXTURES_DIR/patent/<publication number>.html
+
+`serve` replays them on /xhr/query and /patent/<number>. Searches that were
+not recorded get results synthesized from the recorded patent pages: the
+pages whose title or abstract match the query terms (`q`, with OR-groups and
+quoted phrases; `*` matches all), whose classifications start with one of the
+`classification` codes and whose dates fall in the `after`/`before` window.
+Each result carries the page's abstract language and dates, as Google's do.
+Latency, 5xx errors and 429s with Retry-After can be injected.
+Point the scraper at it with PATENTS_BASE_URL=http://127.0.0.1:PORT or
+session.set_base_url.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import lxml.html
+
+from .cache import get_http_cache
+from .extractor import extract_patent_data
+from ..config import STANDIN_FIXTURES_DIR, STANDIN_PAGE_SIZE
+
+def query_fixture_name(query_string: str) -> str:
+    """File name of the recorded response for a search query string (the XHR "url" parameter)."""
+    return hashlib.sha1(query_string.encode("utf-8")).hexdigest() + ".json"
+
+def page_metadata(patent_number: str, html: bytes) -> Dict:
+    """Search-relevant fields of a recorded patent page: text, classifications, dates and language."""
+    parsed = extract_patent_data(html.decode("utf-8"), patent_number, "", False, True)
+    root = lxml.html.fromstring(html)
+    title = root.xpath('string(//meta[@name="DC.title"]/@content)') or root.xpath('string(//title)')
+    codes = [code.strip() for code in root.xpath('//*[@itemprop="classifications"]//*[@itemprop="Code"]/text()')]
+    return {
+        "text": f"{title} {parsed.get('abstract_text') or ''}".lower(),
+        "classifications": [code.replace(" ", "") for code in codes if code],
+        "language": parsed.get("abstract_language"),
+        "priority_date": parsed.get("priority_date") or None,
+        "filing_date": parsed.get("filing_date") or None,
+        "publication_date": parsed.get("pub_date") or None,
+    }
+
+def query_matches(query: str, text: str) -> bool:
+    """Whether lower-cased text matches a search query: any OR-alternative, each a phrase or all its words."""
+    query = query.strip().strip("()").strip()
+    if not query or query == "*":
+        return True
+    for alternative in re.split(r"\s+OR\s+", query):
+        alternative = alternative.strip().strip("()").lower()
+        phrases = re.findall(r'"([^"]+)"', alternative)
+        words = re.sub(r'"[^"]*"', " ", alternative).split()
+        if all(phrase in text for phrase in phrases) and all(word in text for word in words):
+            return True
+    return False
+
+def search_matches(metadata: Dict, query: Dict[str, List[str]]) -> bool:
+    """Whether a page's metadata satisfies the q, classification and after/before parameters of a search."""
+    if not query_matches(query.get("q", ["*"])[0], metadata["text"]):
+        return False
+    if "classification" in query:
+        codes = [code.replace(" ", "") for code in re.split(r"\+OR\+|\s+OR\s+", query["classification"][0]) if code]
+        if not any(own.startswith(code) for own in metadata["classifications"] for code in codes):
+            return False
+    for bound in ("after", "before"):
+        if bound not in query:
+            continue
+        date_type, limit = query[bound][0].split(":", 1)
+        # Dates are missing from some pages; the real search would not return those
+        date = (metadata.get(f"{date_type}_date") or "").replace("-", "")
+        if not date or (date < limit if bound == "after" else date > limit):
+            return False
+    return True
+
+def record_fixtures(directory: str = STANDIN_FIXTURES_DIR) -> Dict[str, int]:
+    """Copy cached search results and patent pages into a fixtures directory."""
+    cache = get_http_cache()
+    counts = Counter()
+    for kind in ("query", "patent"):
+        os.makedirs(os.path.join(directory, kind), exist_ok=True)
+        for ref_path in sorted(glob.glob(os.path.join(cache.directory, "refs", kind, "*", "*.json"))):
+            with open(ref_path, "r", encoding="utf-8") as f:
+                ref = json.load(f)
+            if kind == "query" and not ref.get("params"):
+                continue  # cached before request parameters were recorded
+            body = cache.get(kind, ref["url"], ref.get("params"))
+            if body is None:
+                continue
+            if kind == "query":
+                path = os.path.join(directory, kind, query_fixture_name(ref["params"]["url"]))
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump({"query": ref["params"]["url"], "response": json.loads(body)}, f)
+            else:
+                path = os.path.join(directory, kind, ref["url"].rstrip("/").rsplit("/", 1)[-1] + ".html")
+                with open(path, "wb") as f:
+                    f.write(body)
+            counts[kind] += 1
+    return dict(counts)
+
+class FixtureStore:
+    """Recorded search responses and patent pages, loaded lazily from disk."""
+    def __init__(self, directory: str = STANDIN_FIXTURES_DIR, page_size: int = STANDIN_PAGE_SIZE):
+        self.directory = directory
+        self.page_size = page_size
+        self.patent_numbers = sorted(os.path.splitext(os.path.basename(path))[0]
+                                     for path in glob.glob(os.path.join(directory, "patent", "*.html")))
+        self._metadata = None
+        self._metadata_lock = threading.Lock()
+
+    def metadata(self) -> Dict[str, Dict]:
+        """page_metadata of every recorded patent page, parsed on first use."""
+        with self._metadata_lock:
+            if self._metadata is None:
+                self._metadata = {pn: page_metadata(pn, self.patent_page(pn)) for pn in self.patent_numbers}
+            return self._metadata
+
+    def search(self, query_string: str) -> Dict:
+        """Recorded response for a search, or a page of the matching recorded patents if it was not recorded."""
+        path = os.path.join(self.directory, "query", query_fixture_name(query_string))
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)["response"]
+        query = urllib.parse.parse_qs(query_string)
+        page = int(query.get("page", ["0"])[0])
+        metadata = self.metadata()
+        matching = [pn for pn in self.patent_numbers if search_matches(metadata[pn], query)]
+        numbers = matching[page * self.page_size:(page + 1) * self.page_size]
+        return {"results": {
+            "total_num_results": len(matching),
+            "total_num_pages": -(-len(matching) // self.page_size),
+            "num_page": page,
+            "cluster": [{"result": [{"patent": {
+                "publication_number": pn,
+                "language": metadata[pn]["language"],
+                "priority_date": metadata[pn]["priority_date"],
+                "filing_date": metadata[pn]["filing_date"],
+                "publication_date": metadata[pn]["publication_date"],
+            }} for pn in numbers]}]
+        }}
+
+    def patent_page(self, patent_number: str) -> Optional[bytes]:
+        """Recorded HTML of a patent page, or None."""
+        path = os.path.join(self.directory, "patent", os.path.basename(patent_number) + ".html")
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+class StandinServer:
+    """Threaded HTTP server replaying a FixtureStore with injected latency and failures.
+
+    Each request first waits `latency` seconds (plus up to `jitter`), then fails
+    with 429 (and a Retry-After of `retry_after` seconds) with probability
+    `throttle_rate`, or with 503 with probability `error_rate`. Served statuses
+    are counted in `stats`.
+    """
+    def __init__(self, fixtures: Optional[FixtureStore] = None, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, retry_after: int = 1, seed: int = 0):
+        self.fixtures = fixtures or FixtureStore()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.stats = Counter()
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, body, headers = server.respond(self.path)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def respond(self, path: str):
+        """Return (status, body, headers) for a request path."""
+        with self.lock:
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            roll = self.random.random()
+        time.sleep(delay)
+        parts = urllib.parse.urlsplit(path)
+        if roll < self.throttle_rate:
+            status, body, headers = 429, b"Too Many Requests", {"Retry-After": str(self.retry_after)}
+        elif roll < self.throttle_rate + self.error_rate:
+            status, body, headers = 503, b"Service Unavailable", {}
+        elif parts.path == "/xhr/query":
+            query_string = urllib.parse.parse_qs(parts.query).get("url", [""])[0]
+            body = json.dumps(self.fixtures.search(query_string)).encode("utf-8")
+            status, headers = 200, {"Content-Type": "application/json"}
+        elif parts.path.startswith("/patent/"):
+            patent_number = parts.path[len("/patent/"):].split("/")[0]
+            body = self.fixtures.patent_page(patent_number)
+            status, headers = (200, {"Content-Type": "text/html; charset=utf-8"}) if body else (404, {})
+            body = body or b"Not Found"
+        else:
+            status, body, headers = 404, b"Not Found", {}
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats[status] += 1
+        return status, body, headers
+
+    def start(self) -> "StandinServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the failure-injection options shared by `serve` and the benchmark."""
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra random seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with 429 and Retry-After")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the failure injection")
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Google Patents stand-in server")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    record_parser = subparsers.add_parser("record", help="Copy the HTTP cache into fixtures")
+    record_parser.add_argument("fixtures", nargs="?", default=STANDIN_FIXTURES_DIR)
+    serve_parser = subparsers.add_parser("serve", help="Serve recorded fixtures")
+    serve_parser.add_argument("fixtures", nargs="?", default=STANDIN_FIXTURES_DIR)
+    serve_parser.add_argument("--port", type=int, default=8765)
+    add_server_arguments(serve_parser)
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        counts = record_fixtures(args.fixtures)
+        print(f"Recorded {counts.get('query', 0)} searches and {counts.get('patent', 0)} patent pages "
+              f"into {args.fixtures}")
+        return
+
+    server = StandinServer(FixtureStore(args.fixtures), port=args.port, latency=args.latency,
+                           jitter=args.jitter, error_rate=args.error_rate,
+                           throttle_rate=args.throttle_rate, retry_after=args.retry_after, seed=args.seed)
+    print(f"Serving {len(server.fixtures.patent_numbers)} patent pages from {args.fixtures} on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"Served: {dict(server.stats)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Summarization stage running concurrently with scraping and NER.
+
+Patents are stored without a summary and submitted to a SummaryWorker. Its
+asyncio loop, in a background thread, keeps up to `concurrency` generations
+in flight against the Ollama HTTP API, and hands every summary to a callback
+(e.g. update_patent_summary) as soon as it arrives. Full texts longer than the
+context window are summarized chunk by chunk; their chunks share the same
+generation slots, so a long patent is spread over every slot instead of
+holding one for the length of the whole document. Generations are streamed
+with a deadline, and their latencies are collected in `metrics`.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, wait
+from typing import Callable, Dict, Iterable, Optional
+
+import ollama
+
+from .llm_metrics import GenerationMetrics
+from .prompt_eng import summarize_with_ollama_async
+from .summary_cache import SummaryCache, get_summary_cache
+from ..config import OLLAMA_MODEL, OLLAMA_HOST, SUMMARY_CONCURRENCY, SUMMARY_TIMEOUT, SUMMARY_DONE, SUMMARY_TIMED_OUT
+
+class SummaryWorker:
+    """Bounded pool of concurrent summary generations fed from synchronous code.
+
+    `on_result(patent_number, summary, status)` is called from the worker
+    thread for every finished summary. The status is SUMMARY_DONE, or
+    SUMMARY_FAILED / SUMMARY_TIMED_OUT with an "Error generating summary..."
+    message as the summary.
+    """
+    def __init__(self, on_result: Optional[Callable[[str, str, str], None]] = None,
+                 concurrency: int = SUMMARY_CONCURRENCY, model: str = OLLAMA_MODEL,
+                 host: str = OLLAMA_HOST, timeout: float = SUMMARY_TIMEOUT,
+                 cache: Optional[SummaryCache] = None, metrics: Optional[GenerationMetrics] = None):
+        self.on_result = on_result
+        self.model = model
+        self.cache = cache or get_summary_cache()
+        self.metrics = metrics or GenerationMetrics(model)
+        self.futures = []
+        self.stats = {"submitted": 0, "done": 0, "errors": 0, "timeouts": 0, "map_reduced": 0, "chunks": 0,
+                      "tokens_total": 0, "tokens_processed": 0, "tokens_discarded": 0}
+        self.lock = threading.Lock()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._setup(max(1, concurrency), host, timeout), self.loop).result()
+
+    async def _setup(self, concurrency: int, host: str, timeout: float) -> None:
+        # The client and semaphore must be created on the worker loop
+        self.client = ollama.AsyncClient(host=host, timeout=timeout)
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    async def _teardown(self) -> None:
+        await self.client._client.aclose()  # ollama.AsyncClient has no public close
+
+    async def _summarize(self, patent_number: str, abstract: str, full_text: str) -> str:
+        tokens = {}
+        summary = await summarize_with_ollama_async(self.client, abstract, full_text, self.model, self.cache,
+                                                    self.semaphore, tokens, self.metrics)
+        status = tokens.get("status", SUMMARY_DONE)
+        with self.lock:
+            self.stats["done"] += 1
+            if status != SUMMARY_DONE:
+                self.stats["errors"] += 1
+            if status == SUMMARY_TIMED_OUT:
+                self.stats["timeouts"] += 1
+            for name in ("tokens_total", "tokens_processed", "tokens_discarded"):
+                self.stats[name] += tokens.get(name, 0)
+            if tokens.get("chunks", 0) > 1:
+                self.stats["map_reduced"] += 1
+                self.stats["chunks"] += tokens["chunks"]
+        if tokens.get("chunks", 0) > 1:
+            print(f"Summarized {patent_number} in {tokens['chunks']} chunks: {tokens['tokens_processed']} of "
+                  f"{tokens['tokens_total']} tokens processed, {tokens['tokens_discarded']} discarded")
+        if self.on_result is not None:
+            try:
+                self.on_result(patent_number, summary, status)
+            except Exception as e:
+                print(f"Error storing summary of {patent_number}: {e}")
+        return summary
+
+    def submit(self, patent_number: str, abstract: str, full_text: str) -> Future:
+        """Queue a patent for summarization; returns a future of its summary."""
+        future = asyncio.run_coroutine_threadsafe(self._summarize(patent_number, abstract, full_text), self.loop)
+        with self.lock:
+            self.stats["submitted"] += 1
+        self.futures.append(future)
+        return future
+
+    def pending(self) -> int:
+        """Number of submitted summaries not finished yet."""
+        with self.lock:
+            return self.stats["submitted"] - self.stats["done"]
+
+    def close(self, progress_interval: Optional[float] = 30) -> Dict[str, int]:
+        """Wait for every submitted summary, printing progress, then stop the worker loop."""
+        futures = self.futures
+        while futures:
+            done, futures = wait(futures, timeout=progress_interval)
+            if futures and progress_interval:
+                print(f"Waiting for {len(futures)} summaries ({self.stats['done']} done)...")
+        asyncio.run_coroutine_threadsafe(self._teardown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        return dict(self.stats)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def format_token_stats(stats: Dict[str, int]) -> str:
+    """One-line account of the tokens summarized and discarded by a SummaryWorker."""
+    return (f"{stats['tokens_processed']} of {stats['tokens_total']} estimated tokens summarized, "
+            f"{stats['tokens_discarded']} discarded; {stats['map_reduced']} long texts split into "
+            f"{stats['chunks']} chunks")
+
+def summarize_patents(patents: Iterable[Dict], on_result: Optional[Callable[[str, str, str], None]] = None,
+                      concurrency: int = SUMMARY_CONCURRENCY, model: str = OLLAMA_MODEL,
+                      host: str = OLLAMA_HOST, metrics: Optional[GenerationMetrics] = None) -> Dict[str, int]:
+    """Summarize patent dicts ("patent_number", "abstract", "full_text") concurrently.
+
+    Returns the worker statistics plus the elapsed seconds.
+    """
+    start = time.perf_counter()
+    worker = SummaryWorker(on_result, concurrency, model, host, metrics=metrics)
+    for patent in patents:
+        worker.submit(patent["patent_number"], patent.get("abstract") or "", patent.get("full_text") or "")
+    stats = worker.close()
+    stats["seconds"] = time.perf_counter() - start
+    return stats
@@ -0,0 +1,54 @@
+"""Persistent cache of LLM summaries, stored in SQLite next to patents.db.
+
+Summaries are keyed by the SHA-256 of the summarized text, the model, the
+prompt version and the generation options, so changing any of them produces
+new summaries instead of reusing stale ones.
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from ..config import (
+    SUMMARY_CACHE_PATH, SUMMARY_CACHE_ENABLED, SUMMARY_CACHE_MAX_AGE_DAYS, SUMMARY_CACHE_MAX_MB
+)
+from ..database.lru_cache import SQLiteLRUCache
+
+class SummaryCache(SQLiteLRUCache):
+    """Summary cache with per-entry use counts and age/size eviction."""
+    table = "summaries"
+    stats_table = "summary_cache_stats"
+    value_column = "summary"
+    columns = (("model", "TEXT"), ("prompt_version", "TEXT"))
+
+    def __init__(self, path: str = SUMMARY_CACHE_PATH, enabled: bool = SUMMARY_CACHE_ENABLED,
+                 max_age_days: Optional[float] = SUMMARY_CACHE_MAX_AGE_DAYS,
+                 max_mb: Optional[float] = SUMMARY_CACHE_MAX_MB):
+        super().__init__(path, enabled, max_age_days, max_mb)
+
+    @staticmethod
+    def summary_key(text: str, model: str, prompt_version: Any, options: Optional[Dict] = None) -> str:
+        """Hash identifying a summary of `text` by a model, prompt version and generation options."""
+        raw = json.dumps([text, model, str(prompt_version), options or {}], sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def put(self, key: str, summary: str, model: str, prompt_version: Any) -> None:
+        """Store a summary."""
+        super().put(key, summary, model=model, prompt_version=str(prompt_version))
+
+_summary_cache = None
+
+def get_summary_cache() -> SummaryCache:
+    """Return the process-wide summary cache, evicting old entries when it is first opened."""
+    global _summary_cache
+    if _summary_cache is None:
+        _summary_cache = SummaryCache()
+        _summary_cache.evict()
+    return _summary_cache
+
+def configure_summary_cache(enabled: bool = SUMMARY_CACHE_ENABLED, path: str = SUMMARY_CACHE_PATH) -> SummaryCache:
+    """Replace the process-wide summary cache, e.g. from CLI flags."""
+    global _summary_cache
+    _summary_cache = SummaryCache(path=path, enabled=enabled)
+    _summary_cache.evict()
+    return _summary_cache
@@ -6,12 +6,16 @@ import re
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 from collections import Counter
-import time
 
-from .scraper.fetcher import build_search_params, fetch_patents_data, extract_patent_numbers_from_json
+from .scraper.fetcher import fetch_patents_data, extract_search_results_from_json, in_search_window
 from .scraper.fetcher import ExtendedScraper
+from .scraper.query_planner import PlannedSearch, plan_searches
 from .utils import ensure_directory_exists
+from .config import SCRAPING_MAX_WORKERS, PARSE_WORKERS, SEARCH_MAX_PAGES
 from .scraper.patent_scraper import is_english_text
+from .scraper.language import get_language_filter
+from .scraper.rate_limiter import AdaptiveRateLimiter
+from .database.journal import CrawlJournal, FETCHED, FILTERED
 # IPC codes with relevant search keywords
 TARGET_IPC_CODES = {
     "C09": ["coating", "paint", "dye", "adhesive", "polymer coating"],    # Dyes, paints, polishes, natural resins, adhesives
@@ -88,92 +92,133 @@ def extract_technical_phrases(text: str) -> List[str]:
     
     return phrases
 
-def scrape_patents_for_ipc(ipc_code: str, keywords: List[str], limit: int = MAX_PATENTS_PER_IPC) -> List[Dict]:
-    """Scrape patents for a specific IPC code using relevant keywords."""
-    print(f"Scraping patents for IPC: {ipc_code} with keywords: {keywords}")
-    
-    scraper = ExtendedScraper(return_abstract=True)
-    all_patent_numbers = []
-    
-    incremental_delay = 1
-    # Try each keyword for this IPC code
-    for keyword in keywords:
-        print(f"  Searching with keyword: '{keyword}'")
-        
-        # Build search parameters with keyword and IPC filter
-        search_params = build_search_params(keyword, [ipc_code])
-        
-        patent_numbers = []
-        page = 0
-        # Collect patent numbers for this keyword
-        while len(patent_numbers) < limit // len(keywords) and page < 3:  # Distribute limit across keywords
+def search_key(search: PlannedSearch) -> str:
+    """Journal key of a planned search: its IPC code and query."""
+    return f"{search.bucket}|{search.params['q']}"
+
+def scrape_patents_for_ipcs(targets: Dict[str, List[str]], limit: int = MAX_PATENTS_PER_IPC,
+                            max_workers: int = SCRAPING_MAX_WORKERS,
+                            journal: Optional[CrawlJournal] = None,
+                            parse_workers: int = PARSE_WORKERS, after: Optional[str] = None,
+                            before: Optional[str] = None) -> Dict[str, List[Dict]]:
+    """Scrape patents for several IPC codes at once, each with its relevant keywords.
+    
+    The searches are planned together (see scraper/query_planner.py): each IPC
+    code's keywords are merged into OR-queries, and their result pages are read
+    in rounds while some IPC code still has fewer than `limit` patents. The
+    candidates of all searches are deduplicated, so every patent page is
+    fetched once; a patent is attributed to each IPC code whose search returned
+    it (listed in its "ipc_codes"). With `after`/`before` (YYYY-MM-DD), only
+    patents published in that window are searched for and downloaded.
+    
+    With a journal, every fetched or rejected patent is recorded, and so are
+    the next result page of each search and the candidates found so far after
+    every round. A resumed journal continues each search from its next page
+    and reuses the recorded patents instead of downloading them again.
+    """
+    searches = plan_searches(targets, after=after, before=before)
+    print(f"Planned {len(searches)} searches for IPC codes {list(targets)} "
+          f"(instead of {sum(len(keywords) for keywords in targets.values())} keyword searches)")
+    for search in searches:
+        print(f"  {search.bucket}: {search.params['q']}")
+    
+    scraper = ExtendedScraper(return_abstract=True, max_workers=max_workers, parse_workers=parse_workers)
+    language_filter = get_language_filter()
+    rejected = set()
+    candidates = {bucket: [] for bucket in targets}
+    matched_buckets = {}
+    search_requests = 0
+    page_requests = 0
+    
+    # Next result page of each search, by "IPC code|query"; None once the search is done
+    next_pages = {search_key(search): 0 for search in searches}
+    if journal is not None and journal.resumed:
+        for pn, entry in journal.entries().items():
+            if entry['state'] == FETCHED and entry['data']:
+                scraper.parsed_patents[pn] = entry['data']['parsed']
+            elif entry['state'] == FILTERED:
+                rejected.add(pn)
+        next_pages.update((key, page) for key, page in journal.cursor.get('search_pages', {}).items()
+                          if key in next_pages)
+        for bucket, patent_numbers in journal.cursor.get('candidates', {}).items():
+            if bucket not in candidates:
+                continue
+            candidates[bucket] = patent_numbers
+            for pn in patent_numbers:
+                matched_buckets.setdefault(pn, []).append(bucket)
+    
+    def accepted(bucket):
+        return [pn for pn in candidates[bucket] if pn in scraper.parsed_patents]
+    
+    open_searches = [search for search in searches if next_pages[search_key(search)] is not None]
+    while open_searches:
+        # Search phase: the next result page of every search whose IPC code still needs patents
+        search_languages = {}
+        still_open = []
+        for search in open_searches:
+            key = search_key(search)
+            page = next_pages[key]
+            next_pages[key] = None
+            if len(accepted(search.bucket)) >= limit or page >= SEARCH_MAX_PAGES:
+                continue
+            params = dict(search.params)
             if page > 0:
-                search_params["page"] = page
-            else:
-                search_params.pop("page", None)
-                
+                params["page"] = page
             try:
-                aux = []
-                json_data = fetch_patents_data(search_params)
-                page_patents = extract_patent_numbers_from_json(json_data)
-                
-                # if not page_patents:
-                    # break
-                for patent in page_patents:
-            # print("Processing patent:", patent)
-                    result, soup, url =  scraper.request_single_patent(patent)
-                    if result != 'Success':
-                        print(f"Error fetching patent {patent}: {result}")
-                        page_patents.remove(patent)
-                        continue
-                    patent_dict = scraper.get_scraped_data(soup, patent, url)
-                    abstract = patent_dict.get('abstract_text', '')
-                    if(not is_english_text(abstract)):
-                        page_patents.remove(patent)
-                        continue
-                    else:
-                        aux.append(patent) # this process right here might be a bottleneck, as it deletes patents that are not in English and this process is kinda slow by now, we might 
-                                   # investigate to see if we can do this in parallel or something like that   
-                patent_numbers.extend(aux[:limit // len(keywords) - len(patent_numbers)])
-                page += 1
-                time.sleep(1)  # Rate limiting
-                print(f"time waited :: {1} seconds")
-                incremental_delay += 1
+                search_requests += 1
+                search_results = extract_search_results_from_json(fetch_patents_data(params))
             except Exception as e:
-                print(f"    Error fetching patents for {ipc_code} with keyword '{keyword}': {e}")
-                break
-        
-        all_patent_numbers.extend(patent_numbers)
-        print(f"    Found {len(patent_numbers)} patents for keyword '{keyword}'")
+                print(f"    Error fetching patents for {search.bucket} with keywords {search.keywords}: {e}")
+                next_pages[key] = page  # retried by a resumed run
+                continue
+            if search_results:
+                still_open.append(search)
+                next_pages[key] = page + 1
+            for result in search_results:
+                if not in_search_window(result, params):
+                    continue
+                pn = result["publication_number"]
+                search_languages.setdefault(pn, result["language"])
+                buckets = matched_buckets.setdefault(pn, [])
+                if search.bucket not in buckets:
+                    buckets.append(search.bucket)
+                    candidates[search.bucket].append(pn)
+        open_searches = still_open
         
-        if len(all_patent_numbers) >= limit:
-            break
-    
-    # Remove duplicates while preserving order
-    unique_patents = []
-    seen = set()
-    for pn in all_patent_numbers:
-        if pn not in seen:
-            unique_patents.append(pn)
-            seen.add(pn)
-    
-    if not unique_patents:
-        return []
-    
-    # Limit to max patents
-    unique_patents = unique_patents[:limit]
-    
-    # Add patents to scraper
-    for pn in unique_patents:
-        scraper.add_patents(pn)
-    
-    # Scrape patent details (abstracts only for speed)
-    scraper.scrape_all_patents(fetch_full_text=False)
+        # Fetch phase: each new candidate once, whichever searches returned it. Candidates the
+        # search metadata marks as non-English are never downloaded.
+        pending = [pn for pn in search_languages if pn not in scraper.parsed_patents
+                   and pn not in rejected and language_filter.should_fetch(pn, search_languages[pn])]
+        # Pages are requested concurrently; the shared rate limiter paces the requests
+        for patent, result, patent_dict, url in scraper.request_parsed_patents(pending):
+            page_requests += 1
+            if result != 'Success':
+                print(f"Error fetching patent {patent}: {result}")
+                continue
+            abstract = patent_dict.get('abstract_text', '')
+            language = patent_dict.get('abstract_language') or search_languages.get(patent)
+            if is_english_text(abstract, patent, language):
+                scraper.parsed_patents[patent] = patent_dict
+                if journal is not None:
+                    journal.record(patent, FETCHED, {'parsed': patent_dict})
+            else:
+                rejected.add(patent)
+                if journal is not None:
+                    journal.record(patent, FILTERED)
+        if journal is not None:
+            journal.save_cursor(search_pages=dict(next_pages),
+                                candidates={bucket: list(pns) for bucket, pns in candidates.items()})
+    
+    print(f"  {search_requests} search requests and {page_requests} patent page requests "
+          f"for {len(matched_buckets)} unique candidates")
+    if isinstance(scraper.rate_limiter, AdaptiveRateLimiter):
+        print(f"  Google Patents requests: {scraper.rate_limiter.summary()}")
     
     # Extract relevant data
-    patents_data = []
-    for pn in unique_patents:
-        if pn in scraper.parsed_patents:
+    results = {}
+    for bucket in targets:
+        patents_data = []
+        for pn in accepted(bucket)[:limit]:
             parsed = scraper.parsed_patents[pn]
             
             # Filter by publication date if available
@@ -184,12 +229,23 @@ def scrape_patents_for_ipc(ipc_code: str, keywords: List[str], limit: int = MAX_
                 'title': parsed.get('title', ''),
                 'abstract': parsed.get('abstract_text', ''),
                 'publication_date': pub_date,
-                'ipc_code': ipc_code
+                'ipc_code': bucket,
+                'ipc_codes': matched_buckets[pn]
             }
             patents_data.append(patent_data)
-    
-    print(f"Successfully scraped {len(patents_data)} patents for {ipc_code}")
-    return patents_data
+        
+        print(f"Successfully scraped {len(patents_data)} patents for {bucket}")
+        results[bucket] = patents_data
+    return results
+
+def scrape_patents_for_ipc(ipc_code: str, keywords: List[str], limit: int = MAX_PATENTS_PER_IPC,
+                           max_workers: int = SCRAPING_MAX_WORKERS,
+                           journal: Optional[CrawlJournal] = None,
+                           parse_workers: int = PARSE_WORKERS, after: Optional[str] = None,
+                           before: Optional[str] = None) -> List[Dict]:
+    """Scrape patents for a specific IPC code using relevant keywords."""
+    return scrape_patents_for_ipcs({ipc_code: keywords}, limit, max_workers, journal, parse_workers,
+                                   after, before)[ipc_code]
 
 def analyze_patent_keywords(patents_data: List[Dict]) -> Dict[str, any]:
     """Analyze keywords and phrases from patent data."""
@@ -228,12 +284,26 @@ def analyze_patent_keywords(patents_data: List[Dict]) -> Dict[str, any]:
     }
 
 def run_tendency_analysis() -> Dict[str, any]:
-    """Run complete tendency analysis for all target IPC codes."""
+    """Run complete tendency analysis for all target IPC codes.
+    
+    Progress is journaled per IPC code, search page and patent, so rerunning the
+    analysis in the same month after an interruption resumes it.
+    """
     print("Starting patent tendency analysis...")
     
     start_date, end_date = get_date_range(MONTHS_LOOKBACK)
     print(f"Analyzing patents from {start_date} to {end_date}")
     
+    journal = CrawlJournal("tendency", {
+        'month': datetime.now().strftime("%Y%m"),
+        'ipc_codes': TARGET_IPC_CODES,
+        'max_patents_per_ipc': MAX_PATENTS_PER_IPC,
+        'months_back': MONTHS_LOOKBACK
+    })
+    completed_ipcs = journal.cursor.get('ipc_patents', {})
+    if journal.resumed:
+        print(f"Resuming tendency analysis ({len(completed_ipcs)} IPC codes already scraped)")
+    
     analysis_results = {
         'analysis_date': datetime.now().isoformat(),
         'date_range': {
@@ -246,17 +316,28 @@ def run_tendency_analysis() -> Dict[str, any]:
         'global_trends': {}
     }
     
-    all_patents = []
+    all_patents = {}
+    
+    # Scrape all IPC codes together, so patents shared between them are fetched once
+    pending_ipcs = {code: keywords for code, keywords in TARGET_IPC_CODES.items() if code not in completed_ipcs}
+    if pending_ipcs:
+        try:
+            completed_ipcs.update(scrape_patents_for_ipcs(pending_ipcs, MAX_PATENTS_PER_IPC, journal=journal,
+                                                          after=start_date, before=end_date))
+            journal.save_cursor(ipc_patents=completed_ipcs)
+        except Exception as e:
+            print(f"Error scraping patents: {e}")
     
     # Analyze each IPC code
-    for ipc_code, keywords in TARGET_IPC_CODES.items():
+    for ipc_code in TARGET_IPC_CODES:
         try:
-            patents_data = scrape_patents_for_ipc(ipc_code, keywords, MAX_PATENTS_PER_IPC)
+            patents_data = completed_ipcs.get(ipc_code, [])
             
             if patents_data:
                 ipc_analysis = analyze_patent_keywords(patents_data)
                 analysis_results['ipc_results'][ipc_code] = ipc_analysis
-                all_patents.extend(patents_data)
+                for patent in patents_data:
+                    all_patents.setdefault(patent['patent_number'], patent)
                 
                 print(f"IPC {ipc_code}: {ipc_analysis['total_patents']} patents, "
                       f"{ipc_analysis['unique_keywords']} unique keywords")
@@ -269,12 +350,13 @@ def run_tendency_analysis() -> Dict[str, any]:
     
     # Global trend analysis
     if all_patents:
-        global_analysis = analyze_patent_keywords(all_patents)
+        global_analysis = analyze_patent_keywords(list(all_patents.values()))
         analysis_results['global_trends'] = global_analysis
         
         print(f"\nGlobal analysis: {global_analysis['total_patents']} total patents, "
               f"{global_analysis['unique_keywords']} unique keywords")
     
+    journal.complete()
     return analysis_results
 
 def save_tendency_results(results: Dict[str, any], filename: str = None) -> str:
@@ -0,0 +1,22 @@
+"""The fast patent page extractor must return what get_scraped_data does on a full html.parser tree."""
+
+import os
+
+import pytest
+from bs4 import BeautifulSoup
+
+from src.scraper.extractor import build_patent_dict, extract_patent_data
+from src.scraper.parity import iter_saved_pages
+
+FIXTURE_PAGES = os.path.join(os.path.dirname(__file__), os.pardir, "fixtures", "google_patents", "patent")
+PAGES = list(iter_saved_pages(FIXTURE_PAGES))
+
+def test_fixture_pages_present():
+    assert len(PAGES) >= 30
+
+@pytest.mark.parametrize("fetch_full_text", [False, True])
+@pytest.mark.parametrize("name, html", PAGES, ids=[name for name, _ in PAGES])
+def test_extract_patent_data_matches_full_parse(name, html, fetch_full_text):
+    url = f"https://patents.google.com/patent/{name}/en"
+    full = build_patent_dict(BeautifulSoup(html, "html.parser"), name, url, fetch_full_text)
+    assert extract_patent_data(html, name, url, fetch_full_text) == full